@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BigCard Training - Teste de carga
+Inicia o server.py em uma pasta temporária e simula N funcionários fazendo
+a avaliação ao mesmo tempo: cada um abre o formulário, responde (tempo de
+leitura e digitação) e envia respostas criadas a partir do perguntas.txt
+
+Uso:
+    python benchmark.py --usuarios 100 --duracao 60
+    python benchmark.py --usuarios 200 --motor asyncio --comparar benchmark_anterior.json
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import server
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+ARQUIVOS_SERVIDOR = (server.QUESTIONS_FILE, server.CONFIG_FILE, 'server.py')
+PERCENTIS = (50, 95, 99)
+PIORA_TOLERADA = 0.10  # Diferença a partir da qual --comparar aponta uma piora
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def iniciar_servidor(pasta, porta, motor):
+    """Copia o servidor para pasta e o inicia, aguardando a porta abrir"""
+    for arquivo in ARQUIVOS_SERVIDOR:
+        shutil.copy(os.path.join(PASTA, arquivo), pasta)
+    shutil.copytree(os.path.join(PASTA, server.STATIC_DIR), os.path.join(pasta, server.STATIC_DIR))
+
+    comando = [sys.executable, 'server.py', '--porta', str(porta)]
+    if motor:
+        comando += ['--motor', motor]
+    log = open(os.path.join(pasta, 'servidor.log'), 'w')
+    processo = subprocess.Popen(comando, cwd=pasta, stdout=log, stderr=subprocess.STDOUT)
+
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            break
+        try:
+            socket.create_connection(('127.0.0.1', porta), timeout=1).close()
+            return processo, log
+        except OSError:
+            time.sleep(0.1)
+    processo.kill()
+    log.close()
+    with open(os.path.join(pasta, 'servidor.log'), encoding='utf-8', errors='replace') as f:
+        print(f.read()[-2000:])
+    raise SystemExit('❌ O servidor não iniciou')
+
+def parar_servidor(processo, log):
+    """CTRL+C no servidor, para que as respostas pendentes sejam gravadas"""
+    if os.name == 'posix':
+        processo.send_signal(signal.SIGINT)
+    else:
+        processo.terminate()
+    try:
+        processo.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        processo.kill()
+    log.close()
+
+def criar_envio(perguntas, aleatorio, numero):
+    """Respostas parecidas com as de um funcionário, a partir do perguntas.txt"""
+    respostas = []
+    for i in range(perguntas.get_total_questions()):
+        if perguntas.get_question_type(i) == 'multipla_escolha':
+            respostas.append(str(aleatorio.randrange(len(perguntas.get_alternativas(i)))))
+        else:
+            palavras = perguntas.get_question_text(i).split()
+            texto = ' '.join(aleatorio.choice(palavras) for _ in range(aleatorio.randint(5, 60)))
+            respostas.append(texto.capitalize() + '.')
+    return {'nome': f'Participante {numero:05d} Simulação', 'respostas': respostas,
+            'id_envio': f'{aleatorio.getrandbits(128):032x}'}
+
+class Usuario(threading.Thread):
+    """Funcionário simulado: abre o formulário, pensa e envia, até o fim do teste"""
+
+    def __init__(self, numero, porta, perguntas, pensar, fim, semente):
+        super().__init__(daemon=True)
+        self.numero = numero
+        self.porta = porta
+        self.perguntas = perguntas
+        self.pensar = pensar
+        self.fim = fim
+        self.aleatorio = random.Random(semente * 100003 + numero)
+        self.medicoes = []  # (rota, status, segundos)
+        self.envios = 0
+
+    def _requisitar(self, conexao, metodo, caminho, corpo=None):
+        cabecalhos = {'Accept-Encoding': 'gzip'}
+        if corpo is not None:
+            cabecalhos['Content-Type'] = 'application/json'
+        rota = f'{metodo} {caminho}'
+        inicio = time.perf_counter()
+        try:
+            conexao.request(metodo, caminho, corpo, cabecalhos)
+            resposta = conexao.getresponse()
+            resposta.read()
+            status = resposta.status
+        except (OSError, http.client.HTTPException):
+            conexao.close()  # Reconecta na próxima requisição
+            status = 'erro'
+        self.medicoes.append((rota, status, time.perf_counter() - inicio))
+        return status
+
+    def _esperar(self, segundos):
+        time.sleep(max(0, min(segundos, self.fim - time.monotonic())))
+
+    def run(self):
+        conexao = http.client.HTTPConnection('127.0.0.1', self.porta, timeout=30)
+        # Os funcionários não começam todos no mesmo instante
+        self._esperar(self.aleatorio.uniform(0, self.pensar))
+        while time.monotonic() < self.fim:
+            self._requisitar(conexao, 'GET', '/')
+            self._esperar(self.aleatorio.uniform(0.5 * self.pensar, 1.5 * self.pensar))
+            if time.monotonic() >= self.fim:
+                break
+            envio = criar_envio(self.perguntas, self.aleatorio, self.numero)
+            corpo = json.dumps(envio, ensure_ascii=False).encode('utf-8')
+            if self._requisitar(conexao, 'POST', '/enviar', corpo) == 200:
+                self.envios += 1
+        conexao.close()
+
+def percentil(ordenados, p):
+    """Percentil pelo método do posto mais próximo"""
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+def resumir_rota(medicoes):
+    duracoes = sorted(segundos * 1000 for _, status, segundos in medicoes)
+    por_status = {}
+    for _, status, _ in medicoes:
+        por_status[str(status)] = por_status.get(str(status), 0) + 1
+    resumo = {
+        'requisicoes': len(medicoes),
+        'erros': sum(1 for _, status, _ in medicoes if status != 200),
+        'por_status': por_status,
+        'media_ms': round(sum(duracoes) / len(duracoes), 2),
+        'max_ms': round(duracoes[-1], 2),
+    }
+    for p in PERCENTIS:
+        resumo[f'p{p}_ms'] = round(percentil(duracoes, p), 2)
+    return resumo
+
+def bytes_gravados(pasta):
+    """Tamanho dos arquivos de respostas criados pelo servidor"""
+    arquivos = {}
+    for nome in sorted(os.listdir(pasta)):
+        if nome.startswith('respostas.'):
+            arquivos[nome] = os.path.getsize(os.path.join(pasta, nome))
+    segmentos = os.path.join(pasta, server.SEGMENTS_DIR)
+    if os.path.isdir(segmentos):
+        for nome in sorted(os.listdir(segmentos)):
+            arquivos[f'{server.SEGMENTS_DIR}/{nome}'] = os.path.getsize(os.path.join(segmentos, nome))
+    return arquivos
+
+def versao():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=PASTA,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except OSError:
+        return None
+
+def comparar(atual, anterior):
+    """Mostra a variação em relação a um resultado anterior"""
+    print(f"\n🔍 Comparação com {anterior.get('versao')} ({anterior.get('data')})")
+    linhas = [('vazão (req/s)', anterior.get('vazao_rps'), atual['vazao_rps'], True)]
+    for rota, resumo in atual['rotas'].items():
+        antes = anterior.get('rotas', {}).get(rota, {})
+        for p in PERCENTIS:
+            linhas.append((f'{rota} p{p} (ms)', antes.get(f'p{p}_ms'), resumo[f'p{p}_ms'], False))
+    for nome, antes, depois, maior_melhor in linhas:
+        if not antes:
+            print(f"   {nome:<28} {depois:>10}   (sem valor anterior)")
+            continue
+        variacao = (depois - antes) / antes
+        piorou = variacao < -PIORA_TOLERADA if maior_melhor else variacao > PIORA_TOLERADA
+        print(f"   {nome:<28} {antes:>10} → {depois:<10} {variacao:+.0%}{'  ⚠️  PIOROU' if piorou else ''}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga do servidor de avaliação')
+    parser.add_argument('--usuarios', type=int, default=50, help='funcionários simultâneos (padrão: 50)')
+    parser.add_argument('--duracao', type=float, default=30, help='duração do teste em segundos (padrão: 30)')
+    parser.add_argument('--pensar', type=float, default=2.0,
+                        help='tempo médio em segundos entre abrir o formulário e enviar (padrão: 2)')
+    parser.add_argument('--motor', choices=server.MOTORES, help='motor do servidor (padrão: config.txt)')
+    parser.add_argument('--semente', type=int, default=1, help='semente das respostas aleatórias (padrão: 1)')
+    parser.add_argument('--saida', help='arquivo JSON com o resultado (padrão: benchmark_<data>.json)')
+    parser.add_argument('--comparar', metavar='JSON', help='resultado anterior para comparação')
+    args = parser.parse_args()
+
+    perguntas = server.QuestionLoader(os.path.join(PASTA, server.QUESTIONS_FILE))
+    config = server.ConfigLoader(os.path.join(PASTA, server.CONFIG_FILE))
+    porta = porta_livre()
+
+    with tempfile.TemporaryDirectory(prefix='bigcard_benchmark_') as pasta:
+        processo, log = iniciar_servidor(pasta, porta, args.motor)
+        print(f"🚀 {args.usuarios} funcionários por {args.duracao:.0f}s (servidor na porta {porta})")
+        try:
+            inicio = time.monotonic()
+            fim = inicio + args.duracao
+            usuarios = [Usuario(numero, porta, perguntas, args.pensar, fim, args.semente)
+                        for numero in range(args.usuarios)]
+            for usuario in usuarios:
+                usuario.start()
+            for usuario in usuarios:
+                usuario.join()
+            duracao = time.monotonic() - inicio
+        finally:
+            parar_servidor(processo, log)
+        arquivos = bytes_gravados(pasta)
+
+    medicoes = [medicao for usuario in usuarios for medicao in usuario.medicoes]
+    envios = sum(usuario.envios for usuario in usuarios)
+    rotas = {}
+    for medicao in medicoes:
+        rotas.setdefault(medicao[0], []).append(medicao)
+    total_bytes = sum(arquivos.values())
+
+    resultado = {
+        'versao': versao(),
+        'data': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'sistema': platform.platform(),
+        'parametros': {
+            'usuarios': args.usuarios,
+            'duracao_s': args.duracao,
+            'pensar_s': args.pensar,
+            'semente': args.semente,
+            'motor': args.motor or config.get_motor(),
+            'workers': config.get_workers(),
+            'armazenamento': config.get_armazenamento(),
+            'durabilidade': config.get_durabilidade(),
+            'questoes': perguntas.get_total_questions(),
+        },
+        'duracao_s': round(duracao, 2),
+        'requisicoes': len(medicoes),
+        'vazao_rps': round(len(medicoes) / duracao, 1),
+        'envios': envios,
+        'envios_por_s': round(envios / duracao, 1),
+        'rotas': {rota: resumir_rota(lista) for rota, lista in sorted(rotas.items())},
+        'bytes_gravados': arquivos,
+        'bytes_por_envio': round(total_bytes / envios) if envios else 0,
+    }
+
+    print('='*70)
+    print(f"📈 {resultado['requisicoes']} requisições em {resultado['duracao_s']}s: "
+          f"{resultado['vazao_rps']} req/s, {resultado['envios_por_s']} envios/s")
+    for rota, resumo in resultado['rotas'].items():
+        print(f"   {rota:<14} n={resumo['requisicoes']:<7} erros={resumo['erros']:<5} "
+              + '  '.join(f"p{p}={resumo[f'p{p}_ms']}ms" for p in PERCENTIS))
+    print(f"💾 {total_bytes / 1e6:.2f} MB gravados ({resultado['bytes_por_envio']} bytes por envio)")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(resultado, json.load(f))
+
+    saida = args.saida or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"📄 Resultado salvo em {saida}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BigCard Training - Teste de velocidade da formatação das respostas
+Compara formatar_resposta_txt (questões pré-compiladas, bytes) com a
+versão anterior (texto montado com += a cada resposta) em um exame
+gerado com muitas questões, e confere que as duas gravam o mesmo conteúdo
+
+Uso:
+    python benchmark_formatacao.py
+    python benchmark_formatacao.py --questoes 300 --envios 5000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import server
+
+def formatar_resposta_txt_anterior(registro, perguntas):
+    """Implementação anterior de formatar_resposta_txt (referência)"""
+    respostas = registro['respostas']
+
+    linha = f"\n{'='*100}\n"
+    linha += f"DATA/HORA: {registro['data_hora']}\n"
+    linha += f"NOME: {registro['nome']}\n"
+    linha += f"TOTAL DE RESPOSTAS: {len(respostas)}/{perguntas.get_total_questions()}\n"
+    linha += f"{'='*100}\n\n"
+
+    for i, resposta in enumerate(respostas):
+        pergunta_texto = perguntas.get_question_text(i)
+        tipo = perguntas.get_question_type(i)
+
+        linha += f"{pergunta_texto}\n"
+
+        if tipo == 'multipla_escolha':
+            alternativas = perguntas.get_alternativas(i)
+            if 0 <= int(resposta) < len(alternativas):
+                linha += f"RESPOSTA: {alternativas[int(resposta)]}\n\n"
+            else:
+                linha += f"RESPOSTA: [Alternativa inválida: {resposta}]\n\n"
+        else:
+            linha += f"RESPOSTA: {resposta}\n\n"
+
+    return linha.encode('utf-8')
+
+def gerar_perguntas(caminho, total, aleatorio):
+    """perguntas.txt com total questões, metade de múltipla escolha"""
+    with open(caminho, 'w', encoding='utf-8') as f:
+        for numero in range(1, total + 1):
+            if numero % 2:
+                f.write(f"{numero}. Descreva o procedimento número {numero} da operação de rotina\n\n")
+            else:
+                f.write(f"{numero}. [MULTIPLA_ESCOLHA] Qual a ação correta na situação {numero}?\n")
+                for letra in 'abcd'[:aleatorio.randint(2, 4)]:
+                    f.write(f"{letra}) Alternativa {letra.upper()} da questão {numero}\n")
+                f.write('\n')
+
+def gerar_envios(perguntas, total, aleatorio):
+    palavras = 'backup servidor rede usuário senha firewall chamado ação verificação'.split()
+    envios = []
+    for numero in range(total):
+        respostas = []
+        for i in range(perguntas.get_total_questions()):
+            if perguntas.get_question_type(i) == 'multipla_escolha':
+                respostas.append(str(aleatorio.randrange(len(perguntas.get_alternativas(i)))))
+            else:
+                respostas.append(' '.join(aleatorio.choice(palavras) for _ in range(aleatorio.randint(5, 40))))
+        envios.append({'data_hora': '2024-03-01 10:00:00', 'nome': f'Participante {numero} Conceição',
+                       'respostas': respostas})
+    return envios
+
+def medir(formatar, envios, perguntas, repeticoes):
+    """Melhor tempo (segundos por envio) entre as repetições"""
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for registro in envios:
+            formatar(registro, perguntas)
+        melhor = min(melhor, (time.perf_counter() - inicio) / len(envios))
+    return melhor
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara a formatação das respostas com a versão anterior')
+    parser.add_argument('--questoes', type=int, default=120, help='questões no exame gerado (padrão: 120)')
+    parser.add_argument('--envios', type=int, default=2000, help='envios formatados por medição (padrão: 2000)')
+    parser.add_argument('--repeticoes', type=int, default=5, help='medições de cada versão (padrão: 5)')
+    args = parser.parse_args()
+
+    aleatorio = random.Random(1)
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'perguntas.txt')
+        gerar_perguntas(caminho, args.questoes, aleatorio)
+        perguntas = server.QuestionLoader(caminho)
+    envios = gerar_envios(perguntas, args.envios, aleatorio)
+
+    for registro in envios:
+        if server.formatar_resposta_txt(registro, perguntas) != formatar_resposta_txt_anterior(registro, perguntas):
+            raise SystemExit(f"❌ Conteúdo diferente da versão anterior para {registro['nome']}")
+
+    anterior = medir(formatar_resposta_txt_anterior, envios, perguntas, args.repeticoes)
+    atual = medir(server.formatar_resposta_txt, envios, perguntas, args.repeticoes)
+
+    print('='*70)
+    print(f"📝 {args.questoes} questões, {args.envios} envios (conteúdo idêntico à versão anterior)")
+    print(f"   Versão anterior: {anterior * 1e6:8.1f} µs por envio")
+    print(f"   Pré-compilada:   {atual * 1e6:8.1f} µs por envio")
+    print(f"⚡ {anterior / atual:.1f}x mais rápido")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BigCard Training - Teste de velocidade da inicialização
+Mede, em processos novos, quanto tempo leva para importar o server.py,
+criar a aplicação (criar_aplicacao) e atender a primeira e a segunda
+requisição do formulário pela interface WSGI, sem abrir portas
+
+Uso:
+    python benchmark_inicio.py
+    python benchmark_inicio.py --repeticoes 20 --pasta exames/suporte
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Executado em um processo novo a cada repetição (importação "fria")
+MEDICAO = r'''
+import io, json, sys, time
+inicio = time.perf_counter()
+saida = sys.stdout
+sys.stdout = io.StringIO()
+import server
+importacao = time.perf_counter() - inicio
+impresso = sys.stdout.getvalue()
+
+def requisitar(aplicacao):
+    status = []
+    environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/', 'QUERY_STRING': '',
+               'wsgi.input': io.BytesIO()}
+    corpo = b''.join(aplicacao(environ, lambda s, h: status.append(s)))
+    return status[0], len(corpo)
+
+inicio = time.perf_counter()
+aplicacao = server.criar_aplicacao(sys.argv[1])
+criacao = time.perf_counter() - inicio
+inicio = time.perf_counter()
+status, tamanho = requisitar(aplicacao)
+primeira = time.perf_counter() - inicio
+inicio = time.perf_counter()
+requisitar(aplicacao)
+segunda = time.perf_counter() - inicio
+server.registro_exames.encerrar()
+sys.stdout = saida
+print(json.dumps({'importacao': importacao, 'criacao': criacao, 'primeira': primeira,
+                  'segunda': segunda, 'status': status, 'tamanho': tamanho,
+                  'impresso': impresso}))
+'''
+
+ETAPAS = (('importacao', 'import server'),
+          ('criacao', 'criar_aplicacao()'),
+          ('primeira', '1ª requisição GET /'),
+          ('segunda', '2ª requisição GET /'))
+
+def main():
+    parser = argparse.ArgumentParser(description='Mede o tempo de inicialização do servidor')
+    parser.add_argument('--pasta', default='.', help='pasta com config.txt e perguntas.txt (padrão: atual)')
+    parser.add_argument('--repeticoes', type=int, default=10, help='processos medidos (padrão: 10)')
+    args = parser.parse_args()
+
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    medicoes = []
+    for _ in range(args.repeticoes):
+        resultado = subprocess.run([sys.executable, '-c', MEDICAO, os.path.abspath(args.pasta)],
+                                   cwd=raiz, capture_output=True, text=True)
+        if resultado.returncode != 0:
+            raise SystemExit(f"❌ Falha ao medir a inicialização:\n{resultado.stderr}")
+        medicoes.append(json.loads(resultado.stdout))
+
+    ultima = medicoes[-1]
+    print('='*70)
+    print(f"🚀 Inicialização em {args.repeticoes} processos novos (melhor tempo)")
+    for chave, descricao in ETAPAS:
+        print(f"   {descricao:<22} {min(m[chave] for m in medicoes) * 1000:8.2f} ms")
+    print(f"📄 GET / → {ultima['status']} ({ultima['tamanho']} bytes)")
+    if ultima['impresso']:
+        print("⚠️  A importação imprimiu mensagens:")
+        print(ultima['impresso'].rstrip())
+    else:
+        print("✅ A importação não imprime nada nem acessa a rede")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BigCard Training - Comprovantes em lote
+Gera o comprovante de participação em PDF de todas as respostas enviadas,
+usando todos os núcleos do processador
+
+Uso:
+    python gerar_comprovantes.py
+    python gerar_comprovantes.py --exame suporte --destino comprovantes_suporte
+"""
+
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import server
+
+TAMANHO_LOTE = 64  # Comprovantes enviados de uma vez para cada processo
+LOTES_POR_PROCESSO = 2  # Lotes aguardando por processo (só eles ficam em memória)
+
+# Modelo do comprovante de cada processo, montado uma única vez
+_modelo = None
+_destino = None
+
+def _iniciar_processo(instituicao, cargo, cor_rgb, destino):
+    global _modelo, _destino
+    _modelo = server.ModeloComprovante(instituicao, cargo, cor_rgb)
+    _destino = destino
+
+def _gerar_lote(participantes):
+    for numero, nome, data_hora in participantes:
+        data_hora = datetime.strptime(data_hora, '%Y-%m-%d %H:%M:%S')
+        caminho = os.path.join(_destino, server.nome_arquivo_comprovante(nome, data_hora, numero))
+        with open(caminho, 'wb') as f:
+            f.write(_modelo.gerar(nome, data_hora))
+    return len(participantes)
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera os comprovantes em PDF de todas as respostas')
+    parser.add_argument('--exame', default=server.EXAME_PADRAO, metavar='ID',
+                        help=f'exame (subpasta de {server.EXAMS_DIR}/); padrão: exame principal')
+    parser.add_argument('--destino', default='comprovantes',
+                        help='pasta onde os PDFs são salvos (padrão: comprovantes)')
+    parser.add_argument('--processos', type=int, default=os.cpu_count(),
+                        help='processos em paralelo (padrão: número de núcleos)')
+    args = parser.parse_args()
+
+    exame = server.registro_exames.obter(args.exame)
+    if exame is None:
+        print(f"❌ Exame não encontrado: {args.exame}")
+        return
+    os.makedirs(args.destino, exist_ok=True)
+
+    # Só leitura: pode ser usado com o servidor recebendo respostas ao mesmo tempo
+    registros = server.ler_respostas_salvas(server.config_loader, server.registro_exames.pasta(exame.id),
+                                            lambda: exame.perguntas)
+    participantes = ((numero, registro['nome'], registro['data_hora'])
+                     for numero, registro in enumerate(registros, 1))
+    config = exame.config
+    total = 0
+    inicio = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=args.processos, initializer=_iniciar_processo,
+                             initargs=(config.get_instituicao(), config.get_cargo(),
+                                       config.get_cor_rgb(), args.destino)) as pool:
+        # Lê as respostas aos poucos: no máximo LOTES_POR_PROCESSO lotes por processo de cada vez
+        pendentes = set()
+        while True:
+            while len(pendentes) < args.processos * LOTES_POR_PROCESSO:
+                lote = list(itertools.islice(participantes, TAMANHO_LOTE))
+                if not lote:
+                    break
+                pendentes.add(pool.submit(_gerar_lote, lote))
+            if not pendentes:
+                break
+            prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            total += sum(futuro.result() for futuro in prontos)
+
+    duracao = time.perf_counter() - inicio
+    print('='*70)
+    print(f"📄 {total} comprovantes gerados em {args.destino}/")
+    print(f"⏱️  {duracao:.2f}s com {args.processos} processos"
+          + (f" ({total / duracao:.0f} comprovantes/s)" if duracao > 0 else ''))
+
+if __name__ == '__main__':
+    main()
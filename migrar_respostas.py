@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BigCard Training - Migração de respostas
+Converte arquivos respostas.txt antigos para o formato de registros
+(respostas.dat) ou para o banco SQLite (respostas.db). Vários arquivos são
+intercalados por data/hora, em qualquer ordem em que forem informados.
+
+Uso:
+    python migrar_respostas.py respostas.txt --destino sqlite
+    python migrar_respostas.py antigos/*.txt --destino registros --perguntas perguntas_2023.txt
+"""
+
+import argparse
+import heapq
+import mmap
+import os
+import re
+import time
+
+import server
+
+TAMANHO_LOTE = 1000
+RE_DATA_HORA = re.compile(re.escape(server.SEPARADOR_TXT) + rb'DATA/HORA: ([^\n]*)')
+
+def conferir_ordem(arquivo):
+    """Retorna (respostas, primeira data/hora, última data/hora) do arquivo
+
+    Só os cabeçalhos são procurados (sem interpretar as respostas). Sai com
+    erro se as respostas não estiverem em ordem de data/hora: a busca por
+    período do destino depende dessa ordem.
+    """
+    total, primeira, anterior = 0, None, b''
+    with open(arquivo, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return 0, None, None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for encontrado in RE_DATA_HORA.finditer(mm):
+                data_hora = encontrado.group(1)
+                if data_hora < anterior:
+                    raise SystemExit(f"❌ {arquivo}: a resposta {total + 1} ({data_hora.decode()}) é anterior "
+                                     f"à resposta {total} ({anterior.decode()}). Ordene o arquivo por data/hora "
+                                     "antes de migrar; nada foi gravado.")
+                primeira = primeira or data_hora
+                anterior = data_hora
+                total += 1
+    return total, primeira and primeira.decode(), anterior.decode()
+
+def main():
+    parser = argparse.ArgumentParser(description='Migra arquivos respostas.txt para outro formato')
+    parser.add_argument('arquivos', nargs='+', help='arquivos no formato do respostas.txt')
+    parser.add_argument('--destino', choices=('registros', 'sqlite'), required=True,
+                        help='formato de destino')
+    parser.add_argument('--perguntas', default=server.QUESTIONS_FILE,
+                        help='perguntas.txt usado quando as respostas foram coletadas')
+    args = parser.parse_args()
+
+    # As alternativas de múltipla escolha são convertidas de volta para o índice
+    perguntas = server.QuestionLoader(args.perguntas)
+
+    # Confere todos os arquivos antes de gravar qualquer resposta
+    total_bytes = 0
+    for arquivo in args.arquivos:
+        respostas, primeira, ultima = conferir_ordem(arquivo)
+        total_bytes += os.path.getsize(arquivo)
+        periodo = f" (de {primeira} a {ultima})" if respostas else ''
+        print(f"📄 {arquivo}: {respostas} respostas{periodo}")
+
+    if args.destino == 'registros':
+        destino = server.ArmazenamentoRegistros(server.RECORDS_FILE, server.INDEX_FILE, 'nenhuma')
+    else:
+        destino = server.ArmazenamentoSQLite(server.DATABASE_FILE, 'nenhuma', lambda: perguntas)
+
+    total_respostas = 0
+    inicio = time.perf_counter()
+
+    try:
+        # Cada arquivo já está em ordem: basta intercalá-los
+        registros = heapq.merge(*(server.ler_respostas_txt(arquivo, perguntas) for arquivo in args.arquivos),
+                                key=lambda registro: registro['data_hora'])
+        lote = []
+        for registro in registros:
+            lote.append(registro)
+            if len(lote) >= TAMANHO_LOTE:
+                destino.salvar_varios(lote)
+                total_respostas += len(lote)
+                lote = []
+        if lote:
+            destino.salvar_varios(lote)
+            total_respostas += len(lote)
+    finally:
+        destino.encerrar()
+
+    duracao = time.perf_counter() - inicio
+    print('='*70)
+    print(f"📦 {total_respostas} respostas migradas para {destino.caminho}")
+    print(f"⏱️  {total_bytes / 1e6:.1f} MB em {duracao:.2f}s ({_mb_por_segundo(total_bytes, duracao)})")
+
+def _mb_por_segundo(tamanho, duracao):
+    if duracao <= 0:
+        return '-- MB/s'
+    return f"{tamanho / 1e6 / duracao:.1f} MB/s"
+
+if __name__ == '__main__':
+    main()
@@ -8,14 +8,106 @@ Salva tudo em respostas.txt
 """
 
 from http.server import HTTPServer, BaseHTTPRequestHandler
+from http import HTTPStatus
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from urllib.parse import parse_qs, quote
 import json
 from datetime import datetime
 import os
+import re
+import argparse
+import atexit
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from array import array
+import bisect
+import csv
+import gzip
+import hashlib
+import hmac
+import heapq
+import io
+import itertools
+import math
+import mimetypes
+import mmap
+import queue
+import selectors
+import shutil
+import signal
+import socket
+import struct
+import sys
+import threading
+import time
+import traceback
+import unicodedata
+
+try:
+    import resource  # Não existe no Windows
+except ImportError:
+    resource = None
+
+try:
+    import fcntl  # Não existe no Windows
+except ImportError:
+    fcntl = None
+
+_numpy = False  # Ainda não importado
+
+def carregar_numpy():
+    """Módulo numpy, ou None se não estiver instalado
+
+    Opcional: acelera a correção de turmas grandes e a detecção de cópias.
+    Só é importado no primeiro uso, porque a importação leva dezenas de ms
+    e a maioria das execuções nunca precisa dele.
+    """
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy = numpy
+    return _numpy
 
 PORT = 3000
 DATA_FILE = "respostas.txt"
+EXPORT_FILE = "respostas_exportadas.txt"  # Sugerido para --exportar-txt (respostas.txt seria adotado como segmento)
+RECORDS_FILE = "respostas.dat"
+INDEX_FILE = "respostas.idx"
+DATABASE_FILE = "respostas.db"
+SUBMISSIONS_FILE = "envios.idx"
+SEARCH_FILE = "busca.idx"
+SEARCH_DOCS_FILE = "busca.doc"
+SIMILARITY_FILE = "copias.sig"
+DRAFTS_FILE = "rascunhos.jsonl"
+SEGMENTS_DIR = "respostas"  # Segmentos do respostas.txt quando há rotação
+MANIFEST_FILE = "manifesto.json"
 QUESTIONS_FILE = "perguntas.txt"
 CONFIG_FILE = "config.txt"
+EXAMS_DIR = "exames"
+STATIC_DIR = "static"
+STATIC_URL = "/static/"
+EXAME_PADRAO = ""  # Exame de perguntas.txt/config.txt da pasta do servidor
+MOTORES = ('threads', 'asyncio')
+DURABILIDADES = ('nenhuma', 'lote', 'cada')
+ARMAZENAMENTOS = ('texto', 'registros', 'sqlite')
+ROTACOES = ('nenhuma', 'diaria', 'tamanho')
+KEEPALIVE_TIMEOUT = 5  # Segundos que uma conexão pode ficar ociosa entre requisições (ou parada no meio de uma)
+MAX_CABECALHOS = 100  # Cabeçalhos por requisição (o mesmo limite do http.client)
+LIMITE_NOME = 200  # Caracteres máximos no nome do participante
+TENTAR_NOVAMENTE = 2  # Segundos informados no Retry-After quando o servidor está sobrecarregado
+LIMITE_BUSCA = 50  # Resultados de /buscar quando ?limite= não é informado
+LIMITE_BUSCA_MAXIMO = 500
+SIOCGIFADDR = 0x8915  # ioctl do Linux que retorna o endereço IPv4 de uma interface
+COPIA_PERMUTACOES = 64  # Valores da assinatura MinHash de cada resposta aberta
+COPIA_FAIXAS = 16  # Faixas do LSH (4 valores cada): respostas ~50% parecidas já viram candidatas
+COPIA_PALAVRAS = 3  # Palavras seguidas em cada trecho comparado
+COPIA_MINIMO_PALAVRAS = 8  # Respostas mais curtas ("não sei") não são comparadas
+COPIA_SIMILARIDADE = 0.7  # Semelhança mínima de /copias quando ?minimo= não é informado
+COPIA_BALDE_MAXIMO = 50  # Acima disso, o balde é comparado só com o primeiro da lista
 
 class ConfigLoader:
     """Carrega configurações do sistema do arquivo config.txt"""
@@ -26,6 +118,22 @@ class ConfigLoader:
         self.cor = "#0066cc"  # Azul padrão
         self.cor_rgb = (0, 102, 204)  # RGB para PDF
         self.cargo = "Operador de Sistemas de Informática"  # Valor padrão
+        self.workers = 16  # Conexões atendidas simultaneamente
+        self.processos = 1  # Processos atendendo na mesma porta (modo prefork quando maior que 1)
+        self.motor = 'threads'  # Motor do servidor: threads ou asyncio
+        self.durabilidade = 'lote'  # fsync das respostas: nenhuma, lote ou cada
+        self.armazenamento = 'texto'  # Formato das respostas: texto, registros ou sqlite
+        self.memoria_exames = 64  # MB para exames compilados em memória
+        self.limite_envio = 256  # KB máximos no corpo de um envio
+        self.limite_resposta = 5000  # Caracteres máximos em uma resposta aberta
+        self.max_requisicoes = 128  # Requisições em andamento antes de responder 503
+        self.fila_envios = 64  # Envios aguardando gravação antes de responder 503
+        self.rotacao = 'nenhuma'  # Divisão do respostas.txt em segmentos (nenhuma, diaria, tamanho)
+        self.tamanho_segmento = 64  # MB de cada segmento antes de começar outro
+        self.memoria_rascunhos = 16  # MB para rascunhos das avaliações em andamento
+        self.validade_rascunho = 12  # Horas que um rascunho sem alterações é mantido
+        self.intervalo_rascunhos = 10  # Segundos entre as gravações dos rascunhos
+        self.token_admin = ''  # Senha das rotas do instrutor fora do próprio computador (vazio: só localhost)
         self.load_config()
     
     def load_config(self):
@@ -55,9 +163,62 @@ class ConfigLoader:
                             self.cor_rgb = self._parse_color(value)
                         elif key == 'CARGO':
                             self.cargo = value
+                        elif key == 'WORKERS':
+                            self.workers = self._parse_int(value, self.workers)
+                        elif key == 'PROCESSOS':
+                            self.processos = self._parse_int(value, self.processos)
+                        elif key == 'MOTOR':
+                            if value.lower() in MOTORES:
+                                self.motor = value.lower()
+                            else:
+                                print(f"⚠️  Motor desconhecido em {self.filename}: {value}. Usando {self.motor}.")
+                        elif key == 'DURABILIDADE':
+                            if value.lower() in DURABILIDADES:
+                                self.durabilidade = value.lower()
+                            else:
+                                print(f"⚠️  Durabilidade desconhecida em {self.filename}: {value}. Usando {self.durabilidade}.")
+                        elif key == 'MEMORIA_EXAMES_MB':
+                            self.memoria_exames = self._parse_int(value, self.memoria_exames)
+                        elif key == 'LIMITE_ENVIO_KB':
+                            self.limite_envio = self._parse_int(value, self.limite_envio)
+                        elif key == 'LIMITE_RESPOSTA':
+                            self.limite_resposta = self._parse_int(value, self.limite_resposta)
+                        elif key == 'MAX_REQUISICOES':
+                            self.max_requisicoes = self._parse_int(value, self.max_requisicoes)
+                        elif key == 'FILA_ENVIOS':
+                            self.fila_envios = self._parse_int(value, self.fila_envios)
+                        elif key == 'ROTACAO':
+                            if value.lower() in ROTACOES:
+                                self.rotacao = value.lower()
+                            else:
+                                print(f"⚠️  Rotação desconhecida em {self.filename}: {value}. Usando {self.rotacao}.")
+                        elif key == 'TAMANHO_SEGMENTO_MB':
+                            self.tamanho_segmento = self._parse_int(value, self.tamanho_segmento)
+                        elif key == 'MEMORIA_RASCUNHOS_MB':
+                            self.memoria_rascunhos = self._parse_int(value, self.memoria_rascunhos)
+                        elif key == 'VALIDADE_RASCUNHO_H':
+                            self.validade_rascunho = self._parse_int(value, self.validade_rascunho)
+                        elif key == 'INTERVALO_RASCUNHOS_S':
+                            self.intervalo_rascunhos = self._parse_int(value, self.intervalo_rascunhos)
+                        elif key == 'TOKEN_ADMIN':
+                            self.token_admin = value
+                        elif key == 'ARMAZENAMENTO':
+                            if value.lower() in ARMAZENAMENTOS:
+                                self.armazenamento = value.lower()
+                            else:
+                                print(f"⚠️  Armazenamento desconhecido em {self.filename}: {value}. Usando {self.armazenamento}.")
         except Exception as e:
             print(f"⚠️  Erro ao ler {self.filename}: {e}. Usando valores padrão.")
     
+    def _parse_int(self, value, padrao, minimo=1):
+        """Converte um valor numérico da configuração, mantendo o padrão se inválido"""
+        try:
+            numero = int(value)
+        except ValueError:
+            print(f"⚠️  Valor inválido em {self.filename}: {value}. Usando {padrao}.")
+            return padrao
+        return max(numero, minimo)
+    
     def _parse_color(self, color_str):
         """Converte string de cor para RGB (para usar no PDF)"""
         color_str = color_str.strip()
@@ -107,10 +268,96 @@ class ConfigLoader:
     
     def get_cargo(self):
         return self.cargo
+    
+    def get_workers(self):
+        return self.workers
+    
+    def get_processos(self):
+        return self.processos
+    
+    def get_motor(self):
+        return self.motor
+    
+    def get_durabilidade(self):
+        return self.durabilidade
+    
+    def get_armazenamento(self):
+        return self.armazenamento
+    
+    def get_memoria_exames(self):
+        return self.memoria_exames
+    
+    def get_limite_envio(self):
+        return self.limite_envio
+    
+    def get_limite_resposta(self):
+        return self.limite_resposta
+    
+    def get_max_requisicoes(self):
+        return self.max_requisicoes
+    
+    def get_fila_envios(self):
+        return self.fila_envios
+    
+    def get_rotacao(self):
+        return self.rotacao
+    
+    def get_tamanho_segmento(self):
+        return self.tamanho_segmento
+    
+    def get_memoria_rascunhos(self):
+        return self.memoria_rascunhos
+    
+    def get_validade_rascunho(self):
+        return self.validade_rascunho
+    
+    def get_intervalo_rascunhos(self):
+        return self.intervalo_rascunhos
+    
+    def get_token_admin(self):
+        return self.token_admin
+
+class QuestaoCompilada:
+    """Partes fixas de uma questão no respostas.txt, já em bytes
+
+    O cabeçalho (texto da questão + "RESPOSTA: ") e as linhas de cada
+    alternativa são montados uma única vez ao carregar as perguntas.
+    """
+    __slots__ = ('cabecalho', 'alternativas')
+
+    def __init__(self, questao=None):
+        if questao is None:
+            # Resposta além da última questão (perguntas.txt mudou)
+            self.cabecalho = b'\nRESPOSTA: '
+            self.alternativas = None
+            return
+        self.cabecalho = f"{questao['numero']}. {questao['texto']}\nRESPOSTA: ".encode('utf-8')
+        self.alternativas = None
+        if questao['tipo'] == 'multipla_escolha':
+            # Índice enviado pela página ("0", "1", ...) → linha da alternativa
+            self.alternativas = {str(j): f"{alternativa}\n\n".encode('utf-8')
+                                 for j, alternativa in enumerate(questao.get('alternativas', []))}
+
+    def alternativa(self, resposta):
+        """Linha da alternativa escolhida (fora do caminho comum: índices como "02" ou inválidos)"""
+        linha = self.alternativas.get(resposta)
+        if linha is not None:
+            return linha
+        try:
+            indice = int(resposta)
+        except ValueError:
+            indice = -1
+        if 0 <= indice < len(self.alternativas):
+            return self.alternativas[str(indice)]
+        return f"[Alternativa inválida: {resposta}]\n\n".encode('utf-8')
+
+QUESTAO_SEM_TEXTO = QuestaoCompilada()
 
 class QuestionLoader:
     """Carrega e gerencia as perguntas do arquivo de texto"""
     
+    PESO = re.compile(r'\[PESO:?\s*(\d+(?:[.,]\d+)?)\]', re.IGNORECASE)
+    
     def __init__(self, filename):
         self.filename = filename
         self.questions = []
@@ -151,21 +398,38 @@ class QuestionLoader:
                 if is_multipla:
                     texto = texto.replace('[MULTIPLA_ESCOLHA]', '').strip()
                 
+                # Peso da questão na nota (ex: [PESO 2] ou [PESO 1,5]); padrão 1
+                peso = 1.0
+                marcacao = self.PESO.search(texto)
+                if marcacao:
+                    peso = float(marcacao.group(1).replace(',', '.'))
+                    texto = self.PESO.sub('', texto).strip()
+                
                 current_question = {
                     'numero': numero,
                     'texto': texto,
-                    'tipo': 'multipla_escolha' if is_multipla else 'aberta'
+                    'tipo': 'multipla_escolha' if is_multipla else 'aberta',
+                    'peso': peso,
+                    'corretas': [],
                 }
             
             # Detecta alternativas (linhas que começam com a), b), c), etc)
             elif line.strip() and line.strip()[0].lower() in 'abcdefghij' and line.strip()[1:3] == ') ':
-                alternativas.append(line.strip())
+                alternativa = line.strip()
+                # Gabarito: a alternativa correta termina com [CORRETA] (não aparece na página)
+                if '[CORRETA]' in alternativa and current_question:
+                    current_question['corretas'].append(len(alternativas))
+                    alternativa = alternativa.replace('[CORRETA]', '').strip()
+                alternativas.append(alternativa)
         
         # Adiciona última questão
         if current_question:
             if alternativas:
                 current_question['alternativas'] = alternativas
             self.questions.append(current_question)
+        
+        self.compiladas = tuple(QuestaoCompilada(q) for q in self.questions)
+        self.rodape_total = f"/{len(self.questions)}\n{'='*100}\n\n".encode('utf-8')
     
     def get_total_questions(self):
         return len(self.questions)
@@ -188,515 +452,4030 @@ class QuestionLoader:
         if 0 <= index < len(self.questions):
             return self.questions[index].get('alternativas', [])
         return []
+    
+    def get_corretas(self, index):
+        """Índices das alternativas marcadas com [CORRETA] (vazio se a questão não tem gabarito)"""
+        if 0 <= index < len(self.questions) and self.questions[index]['tipo'] == 'multipla_escolha':
+            return self.questions[index]['corretas']
+        return []
+    
+    def get_peso(self, index):
+        """Peso da questão na nota ([PESO n]; padrão 1)"""
+        if 0 <= index < len(self.questions):
+            return self.questions[index]['peso']
+        return 1.0
 
-# Carrega as configurações no início
-try:
-    config_loader = ConfigLoader(CONFIG_FILE)
-    print(f"✅ Configurações carregadas:")
-    print(f"   • Instituição: {config_loader.get_instituicao()}")
-    print(f"   • Cor: {config_loader.get_cor()} (RGB: {config_loader.get_cor_rgb()})")
-    print(f"   • Cargo: {config_loader.get_cargo()}")
-except Exception as e:
-    print(f"❌ ERRO ao carregar configurações: {e}")
-    exit(1)
+def assinatura_arquivos(arquivos):
+    """Tamanho e data de modificação dos arquivos, para detectar alterações"""
+    assinatura = []
+    for arquivo in arquivos:
+        try:
+            st = os.stat(arquivo)
+            assinatura.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            assinatura.append(None)
+    return tuple(assinatura)
 
-# Carrega as perguntas no início
-try:
-    question_loader = QuestionLoader(QUESTIONS_FILE)
-    print(f"✅ {question_loader.get_total_questions()} perguntas carregadas de {QUESTIONS_FILE}")
-except Exception as e:
-    print(f"❌ ERRO ao carregar perguntas: {e}")
-    print(f"   Certifique-se que o arquivo '{QUESTIONS_FILE}' existe no mesmo diretório.")
-    exit(1)
+def tem_caractere_controle(texto):
+    """Quebras de linha e outros controles no nome corromperiam os registros em texto"""
+    return any(c < ' ' or c == '\x7f' for c in texto)
 
-class BigCardHandler(BaseHTTPRequestHandler):
-    
-    def do_GET(self):
-        """Serve o formulário HTML"""
-        if self.path == '/' or self.path == '/formulario':
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html; charset=utf-8')
-            self.end_headers()
-            self.wfile.write(get_formulario_html().encode('utf-8'))
-        else:
-            self.send_error(404)
-    
-    def do_POST(self):
-        """Recebe e salva as respostas no TXT"""
-        if self.path == '/enviar':
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
-            
-            salvar_resposta(data)
-            
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({'success': True}).encode('utf-8'))
-        else:
-            self.send_error(404)
-    
-    def log_message(self, format, *args):
-        pass
+class EsquemaEnvio:
+    """Regras de validação de um envio, compiladas uma vez a partir das perguntas
 
-def salvar_resposta(data):
-    """Salva resposta formatada no arquivo TXT"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    linha = f"\n{'='*100}\n"
-    linha += f"DATA/HORA: {timestamp}\n"
-    linha += f"NOME: {data['nome']}\n"
-    linha += f"TOTAL DE RESPOSTAS: {len(data['respostas'])}/{question_loader.get_total_questions()}\n"
-    linha += f"{'='*100}\n\n"
-    
-    for i, resposta in enumerate(data['respostas']):
-        pergunta_texto = question_loader.get_question_text(i)
-        tipo = question_loader.get_question_type(i)
-        
-        linha += f"{pergunta_texto}\n"
-        
-        if tipo == 'multipla_escolha':
-            # Converte índice para texto da alternativa
-            alternativas = question_loader.get_alternativas(i)
-            if 0 <= int(resposta) < len(alternativas):
-                linha += f"RESPOSTA: {alternativas[int(resposta)]}\n\n"
+    Para cada questão guarda só o necessário para validar a resposta: o
+    conjunto de índices válidos (múltipla escolha) ou None (questão aberta,
+    limitada a limite_resposta caracteres).
+    """
+
+    def __init__(self, perguntas, limite_resposta):
+        self.limite_resposta = limite_resposta
+        self.questoes = tuple(
+            frozenset(str(j) for j in range(len(perguntas.get_alternativas(i))))
+            if perguntas.get_question_type(i) == 'multipla_escolha' else None
+            for i in range(perguntas.get_total_questions())
+        )
+
+    def validar(self, dados):
+        """Retorna {'nome', 'respostas', 'id_envio'} normalizado ou levanta ValueError com o motivo"""
+        if not isinstance(dados, dict):
+            raise ValueError('envio inválido')
+        nome = dados.get('nome')
+        if not isinstance(nome, str) or not nome.strip():
+            raise ValueError('nome não informado')
+        if len(nome) > LIMITE_NOME:
+            raise ValueError(f'nome com mais de {LIMITE_NOME} caracteres')
+        if tem_caractere_controle(nome):
+            raise ValueError('nome com caracteres de controle')
+        respostas = dados.get('respostas')
+        if not isinstance(respostas, list) or len(respostas) != len(self.questoes):
+            raise ValueError(f'são esperadas {len(self.questoes)} respostas')
+
+        normalizadas = [self._validar_resposta(numero, validas, resposta)
+                        for numero, (validas, resposta) in enumerate(zip(self.questoes, respostas), 1)]
+        id_envio = dados.get('id_envio')
+        if id_envio is not None and (not isinstance(id_envio, str)
+                                     or not 0 < len(id_envio) <= IndiceEnvios.TAMANHO_MAXIMO_ID):
+            raise ValueError('identificador do envio inválido')
+        return {'nome': nome.strip(), 'respostas': normalizadas, 'id_envio': id_envio}
+
+    def validar_rascunho(self, dados):
+        """Como validar(), mas aceita questões sem resposta ('') e exige o id_envio"""
+        if not isinstance(dados, dict):
+            raise ValueError('rascunho inválido')
+        id_envio = dados.get('id_envio')
+        if not isinstance(id_envio, str) or not 0 < len(id_envio) <= IndiceEnvios.TAMANHO_MAXIMO_ID:
+            raise ValueError('identificador do envio inválido')
+        nome = dados.get('nome')
+        if not isinstance(nome, str) or len(nome) > LIMITE_NOME or tem_caractere_controle(nome):
+            raise ValueError('nome inválido')
+        respostas = dados.get('respostas')
+        if not isinstance(respostas, list) or len(respostas) != len(self.questoes):
+            raise ValueError(f'são esperadas {len(self.questoes)} respostas')
+        normalizadas = [self._validar_resposta(numero, validas, resposta) if resposta not in (None, '') else ''
+                        for numero, (validas, resposta) in enumerate(zip(self.questoes, respostas), 1)]
+        return {'nome': nome.strip(), 'respostas': normalizadas, 'id_envio': id_envio}
+
+    def _validar_resposta(self, numero, validas, resposta):
+        if validas is not None:
+            # Alternativas chegam como índice ("0", "1", ...)
+            resposta = str(resposta) if isinstance(resposta, (str, int)) else None
+            if resposta not in validas:
+                raise ValueError(f'alternativa inválida na questão {numero}')
+        elif not isinstance(resposta, str):
+            raise ValueError(f'resposta inválida na questão {numero}')
+        elif len(resposta) > self.limite_resposta:
+            raise ValueError(f'resposta da questão {numero} com mais de {self.limite_resposta} caracteres')
+        return resposta
+
+class Exame:
+    """Exame compilado: perguntas, configurações e formulário já renderizado
+
+    O HTML é gerado uma única vez e mantido em bytes, junto com a versão
+    compactada com gzip; o exame só é compilado de novo quando perguntas.txt
+    ou config.txt mudam.
+    """
+
+    def __init__(self, exame_id, arquivo_perguntas, arquivo_config):
+        self.id = exame_id
+        self.arquivos = (arquivo_perguntas, arquivo_config)
+        self.assinatura = assinatura_arquivos(self.arquivos)
+        self.config = ConfigLoader(arquivo_config)
+        self.perguntas = QuestionLoader(arquivo_perguntas)
+        self.base = f'/exame/{exame_id}' if exame_id else ''
+        self.corpo = get_formulario_html(self.config, self.perguntas, self.base).encode('utf-8')
+        self.corpo_gzip = compactar(self.corpo)
+        self.comprovante = ModeloComprovante.de_config(self.config)
+        self.esquema = EsquemaEnvio(self.perguntas, self.config.get_limite_resposta())
+        self.etag, self.etag_gzip = etags(hashlib.sha1(self.corpo).hexdigest())
+        # Estimativa da memória ocupada (HTML + textos das perguntas)
+        textos = sum(len(q['texto']) + sum(len(a) for a in q.get('alternativas', []))
+                     for q in self.perguntas.questions)
+        self.tamanho = len(self.corpo) + len(self.corpo_gzip or b'') + 2 * textos
+
+    def atualizado(self):
+        return assinatura_arquivos(self.arquivos) == self.assinatura
+
+class _EnvioPendente:
+    """Envio sendo gravado; repetições simultâneas esperam pelo resultado"""
+    __slots__ = ('evento', 'data_hora')
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.data_hora = None
+
+class IndiceEnvios:
+    """Identificadores dos envios já gravados, para ignorar envios repetidos
+
+    A página gera um identificador para cada avaliação e o repete quando o
+    funcionário tenta enviar de novo (ex: Wi-Fi caiu antes da confirmação).
+    O arquivo envios.idx guarda uma entrada de tamanho fixo por envio (hash
+    de 64 bits do identificador e data/hora). A memória usada não cresce com
+    o número de envios: a data/hora dos envios mais recentes fica em uma
+    lista LRU limitada e todos os hashes gravados ficam em um filtro de
+    Bloom de tamanho fixo. Só um identificador que o filtro indica como já
+    visto e que não está entre os recentes (envio antigo repetido, ou um
+    falso positivo raro) é procurado no arquivo, fora do lock. Um envio
+    repetido recebe a mesma confirmação do original, sem ser gravado de novo.
+    """
+
+    ENTRADA = struct.Struct('<Q19s')  # hash do identificador, data/hora
+    TAMANHO_MAXIMO_ID = 64
+    BITS_FILTRO = 1 << 23  # Filtro de 1 MB: ~2% de falsos positivos com 1 milhão de envios
+    SONDAS = 4  # Bits marcados no filtro por envio
+    ENTRADAS_POR_LEITURA = 4096
+
+    def __init__(self, caminho, capacidade=4096):
+        self.caminho = caminho
+        self.capacidade = capacidade
+        self._lock = threading.Lock()
+        self._recentes = OrderedDict()  # hash -> data/hora
+        self._pendentes = {}  # hash -> _EnvioPendente
+        self._filtro = bytearray(self.BITS_FILTRO // 8)
+        tamanho = os.path.getsize(caminho) if os.path.exists(caminho) else 0
+        tamanho -= tamanho % self.ENTRADA.size
+        if tamanho:
+            with open(caminho, 'rb') as f:
+                self._marcar_todos(chave for chave, _ in self._entradas(f))
+                # Os envios mais recentes são os que costumam ser repetidos
+                f.seek(max(0, tamanho - capacidade * self.ENTRADA.size))
+                for chave, data_hora in self._entradas(f):
+                    self._lembrar(chave, data_hora.decode('ascii'))
+        self._arquivo = open(caminho, 'ab', buffering=0)
+        # Descarta uma entrada incompleta no final do arquivo (ex: queda de energia)
+        self._arquivo.truncate(tamanho)
+
+    @staticmethod
+    def chave(id_envio):
+        digest = hashlib.blake2b(id_envio.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little')
+
+    def _entradas(self, f):
+        """(hash, data/hora) das entradas completas a partir da posição atual, lidas em blocos"""
+        while True:
+            dados = f.read(self.ENTRADA.size * self.ENTRADAS_POR_LEITURA)
+            dados = dados[:len(dados) - len(dados) % self.ENTRADA.size]
+            if not dados:
+                return
+            yield from self.ENTRADA.iter_unpack(dados)
+
+    def _posicoes(self, chave):
+        # Duas metades do hash combinadas geram as SONDAS posições (double hashing)
+        base, passo = chave & 0xFFFFFFFF, (chave >> 32) | 1
+        return [(base + i * passo) % self.BITS_FILTRO for i in range(self.SONDAS)]
+
+    def _marcar(self, chave):
+        for posicao in self._posicoes(chave):
+            self._filtro[posicao >> 3] |= 1 << (posicao & 7)
+
+    def _marcar_todos(self, chaves):
+        """_marcar de muitos hashes (ao abrir o envios.idx), sem uma chamada por hash"""
+        filtro, bits, sondas = self._filtro, self.BITS_FILTRO, range(self.SONDAS)
+        for chave in chaves:
+            base, passo = chave & 0xFFFFFFFF, (chave >> 32) | 1
+            for i in sondas:
+                posicao = (base + i * passo) % bits
+                filtro[posicao >> 3] |= 1 << (posicao & 7)
+
+    def _talvez_gravado(self, chave):
+        """False garante que o envio é novo; True pede a confirmação no arquivo"""
+        return all(self._filtro[posicao >> 3] >> (posicao & 7) & 1 for posicao in self._posicoes(chave))
+
+    def _procurar_no_arquivo(self, chave):
+        """Data/hora do envio original no envios.idx, ou None se o identificador é novo"""
+        with open(self.caminho, 'rb') as f:
+            for chave_arquivo, data_hora in self._entradas(f):
+                if chave_arquivo == chave:
+                    return data_hora.decode('ascii')
+        return None
+
+    def _lembrar(self, chave, data_hora):
+        self._recentes[chave] = data_hora
+        self._recentes.move_to_end(chave)
+        if len(self._recentes) > self.capacidade:
+            self._recentes.popitem(last=False)
+
+    def executar_uma_vez(self, id_envio, salvar):
+        """Chama salvar() (que retorna a data/hora gravada) só na primeira vez
+
+        Retorna (data/hora, repetido).
+        """
+        chave = self.chave(id_envio)
+        while True:
+            with self._lock:
+                data_hora = self._recentes.get(chave)
+                if data_hora is not None:
+                    self._recentes.move_to_end(chave)
+                    return data_hora, True
+                pendente = self._pendentes.get(chave)
+                if pendente is None:
+                    pendente = self._pendentes[chave] = _EnvioPendente()
+                    talvez_gravado = self._talvez_gravado(chave)
+                    break
+            # O mesmo envio está sendo conferido ou gravado por outra requisição
+            pendente.evento.wait()
+            if pendente.data_hora is not None:
+                return pendente.data_hora, True
+
+        try:
+            # Fora do lock: os outros envios não esperam a leitura do arquivo,
+            # e as repetições deste aguardam em pendente
+            data_hora = self._procurar_no_arquivo(chave) if talvez_gravado else None
+            repetido = data_hora is not None
+            if not repetido:
+                data_hora = salvar()
+            pendente.data_hora = data_hora
+            with self._lock:
+                if not repetido:
+                    self._arquivo.write(self.ENTRADA.pack(chave, data_hora.encode('ascii')))
+                    self._marcar(chave)
+                self._lembrar(chave, data_hora)
+            return data_hora, repetido
+        finally:
+            with self._lock:
+                del self._pendentes[chave]
+            pendente.evento.set()
+
+    def encerrar(self):
+        self._arquivo.close()
+
+PALAVRAS_IGNORADAS = frozenset(
+    'a ao aos as com da das de do dos e ela ele em entre era essa esse esta este eu foi ha isso '
+    'ja mais mas me mesmo muito na nao nas nem no nos o os ou para pela pelo por qual quando que '
+    'se sem ser seu sua so sao tambem tem um uma umas uns voce'.split())
+
+RE_TERMO = re.compile(r'[a-z0-9]+')
+
+def sem_acentos(texto):
+    """Texto em minúsculas e sem acentos ("Ação" → "acao")"""
+    return unicodedata.normalize('NFKD', texto.casefold()).encode('ascii', 'ignore').decode('ascii')
+
+def contar_termos(texto):
+    """Palavras do texto (sem acentos, sem as muito comuns) e quantas vezes cada uma aparece"""
+    contagem = Counter(RE_TERMO.findall(sem_acentos(texto)))
+    for termo in PALAVRAS_IGNORADAS.intersection(contagem):
+        del contagem[termo]
+    return contagem
+
+class IndiceBusca:
+    """Índice invertido das respostas abertas, para a busca por palavras (/buscar)
+
+    Cada envio é indexado ao ser salvo: as respostas abertas vão para
+    busca.doc (data/hora, nome e textos, usados para mostrar os resultados)
+    e cada palavra ganha uma entrada na sua lista de ocorrências, um
+    array('Q') com envio, questão e número de repetições em 8 bytes. Ao
+    parar o servidor as listas são gravadas em busca.idx; na inicialização
+    elas são carregadas de uma vez e só os envios gravados depois disso são
+    indexados de novo. Os dois arquivos podem ser apagados: o índice é
+    refeito a partir das respostas.
+    """
+
+    DOCUMENTO = struct.Struct('<I')  # Tamanho de cada envio em busca.doc
+    CABECALHO = struct.Struct('<8sII')  # Versão, envios indexados, termos
+    TERMO = struct.Struct('<HI')  # Tamanho do termo, ocorrências
+    VERSAO = b'BUSCA001'
+
+    def __init__(self, pasta, obter_perguntas):
+        self.caminho = os.path.join(pasta, SEARCH_FILE)
+        self.caminho_documentos = os.path.join(pasta, SEARCH_DOCS_FILE)
+        self.obter_perguntas = obter_perguntas
+        self._lock = threading.Lock()
+        self._ocorrencias = {}  # termo -> array('Q') de (envio << 24 | questão << 8 | repetições)
+        self._posicoes = array('Q')  # Posição de cada envio em busca.doc
+        self._trechos = 0  # Respostas abertas indexadas (para o peso de cada termo)
+        self._carregar_documentos()
+        indexados = self._carregar_indice()
+        self._documentos = open(self.caminho_documentos, 'ab', buffering=0)
+        # Envios gravados em busca.doc depois do último busca.idx (ex: queda de energia)
+        with open(self.caminho_documentos, 'rb') as f:
+            for envio in range(indexados, len(self._posicoes)):
+                _, _, textos = self._ler_documento(f, envio)
+                self._indexar(envio, textos)
+
+    @property
+    def total(self):
+        return len(self._posicoes)
+
+    def _carregar_documentos(self):
+        """Posição de cada envio em busca.doc, descartando um envio incompleto no final"""
+        if not os.path.exists(self.caminho_documentos):
+            return
+        tamanho_arquivo = os.path.getsize(self.caminho_documentos)
+        posicao = 0
+        with open(self.caminho_documentos, 'rb') as f:
+            while posicao + self.DOCUMENTO.size <= tamanho_arquivo:
+                tamanho, = self.DOCUMENTO.unpack(f.read(self.DOCUMENTO.size))
+                if posicao + self.DOCUMENTO.size + tamanho > tamanho_arquivo:
+                    break
+                self._posicoes.append(posicao)
+                posicao += self.DOCUMENTO.size + tamanho
+                f.seek(posicao)
+        if posicao < tamanho_arquivo:
+            with open(self.caminho_documentos, 'r+b') as f:
+                f.truncate(posicao)
+
+    def _carregar_indice(self):
+        """Carrega busca.idx e retorna quantos envios ele já cobre"""
+        if not os.path.exists(self.caminho):
+            return 0
+        try:
+            with open(self.caminho, 'rb') as f:
+                versao, indexados, termos = self.CABECALHO.unpack(f.read(self.CABECALHO.size))
+                if versao != self.VERSAO or indexados > len(self._posicoes):
+                    return 0
+                trechos, = self.DOCUMENTO.unpack(f.read(self.DOCUMENTO.size))
+                ocorrencias = {}
+                for _ in range(termos):
+                    tamanho, quantidade = self.TERMO.unpack(f.read(self.TERMO.size))
+                    termo = f.read(tamanho).decode('ascii')
+                    lista = array('Q')
+                    lista.frombytes(f.read(quantidade * lista.itemsize))
+                    ocorrencias[termo] = lista
+        except (OSError, struct.error, UnicodeDecodeError, ValueError) as e:
+            print(f"⚠️  Índice de busca inválido ({e}); refazendo a partir de {SEARCH_DOCS_FILE}")
+            return 0
+        self._ocorrencias = ocorrencias
+        self._trechos = trechos
+        return indexados
+
+    def _salvar_indice(self):
+        """Grava as listas de ocorrências em busca.idx (arquivo temporário + rename)"""
+        temporario = self.caminho + '.tmp'
+        with open(temporario, 'wb') as f:
+            f.write(self.CABECALHO.pack(self.VERSAO, len(self._posicoes), len(self._ocorrencias)))
+            f.write(self.DOCUMENTO.pack(self._trechos))
+            for termo, lista in self._ocorrencias.items():
+                f.write(self.TERMO.pack(len(termo), len(lista)))
+                f.write(termo.encode('ascii'))
+                f.write(lista.tobytes())
+        os.replace(temporario, self.caminho)
+
+    def _ler_documento(self, f, envio):
+        f.seek(self._posicoes[envio])
+        tamanho, = self.DOCUMENTO.unpack(f.read(self.DOCUMENTO.size))
+        data_hora, nome, textos = json.loads(f.read(tamanho))
+        return data_hora, nome, {int(questao): texto for questao, texto in textos.items()}
+
+    def _indexar(self, envio, textos):
+        ocorrencias = self._ocorrencias
+        for questao, texto in textos.items():
+            contagem = contar_termos(texto)
+            if not contagem:
+                continue
+            self._trechos += 1
+            base = envio << 24 | questao << 8
+            for termo, vezes in contagem.items():
+                lista = ocorrencias.get(termo)
+                if lista is None:
+                    lista = ocorrencias[termo] = array('Q')
+                lista.append(base | (vezes if vezes < 255 else 255))
+
+    def registrar(self, registro):
+        """Indexa as respostas abertas de um envio recém-salvo e retorna o número do envio"""
+        perguntas = self.obter_perguntas()
+        textos = {i: resposta for i, resposta in enumerate(registro['respostas'])
+                  if perguntas.get_question_type(i) != 'multipla_escolha' and resposta.strip()}
+        documento = json.dumps([registro['data_hora'], registro['nome'], textos],
+                               ensure_ascii=False).encode('utf-8')
+        with self._lock:
+            envio = len(self._posicoes)
+            self._posicoes.append(self._documentos.tell())
+            self._documentos.write(self.DOCUMENTO.pack(len(documento)) + documento)
+            self._indexar(envio, textos)
+        return envio
+
+    def documentos(self, envios):
+        """(data/hora, nome, textos) de cada envio, lendo busca.doc uma única vez"""
+        with open(self.caminho_documentos, 'rb') as f:
+            return {envio: self._ler_documento(f, envio) for envio in sorted(set(envios))}
+
+    def reconstruir(self, registros, inicio=0):
+        """Indexa os envios de registros a partir do número inicio (os anteriores já estão no índice)"""
+        for numero, registro in enumerate(registros):
+            if numero >= inicio:
+                self.registrar(registro)
+
+    def buscar(self, consulta, questao=None, limite=50):
+        """Respostas abertas com as palavras da consulta, as mais relevantes primeiro
+
+        Uma resposta que contém mais palavras da consulta, ou palavras mais
+        raras, ou as repete mais vezes, fica na frente. questao (índice a
+        partir de 0) limita a busca a uma questão. Retorna (total, resultados).
+        """
+        termos = list(contar_termos(consulta))
+        pontuacoes = {}
+        with self._lock:
+            trechos = max(self._trechos, 1)
+            for termo in termos:
+                lista = self._ocorrencias.get(termo)
+                if not lista:
+                    continue
+                # Pontos por número de repetições (1 a 255), calculados uma vez por termo
+                peso = math.log(1 + trechos / len(lista))
+                pontos = [0.0] + [peso * (1 + math.log(vezes)) for vezes in range(1, 256)]
+                obter = pontuacoes.get
+                for valor in lista:
+                    chave = valor >> 8
+                    if questao is None or chave & 0xFFFF == questao:
+                        pontuacoes[chave] = obter(chave, 0.0) + pontos[valor & 0xFF]
+        melhores = heapq.nlargest(limite, pontuacoes.items(), key=lambda item: (item[1], item[0]))
+
+        resultados = []
+        with open(self.caminho_documentos, 'rb') as f:
+            for chave, pontuacao in melhores:
+                envio, numero_questao = chave >> 16, chave & 0xFFFF
+                data_hora, nome, textos = self._ler_documento(f, envio)
+                texto = textos.get(numero_questao, '')
+                resultados.append({
+                    'nome': nome,
+                    'data_hora': data_hora,
+                    'questao': numero_questao + 1,
+                    'pontuacao': round(pontuacao, 3),
+                    'trecho': trecho_busca(texto, termos),
+                })
+        return len(pontuacoes), resultados
+
+    def encerrar(self):
+        with self._lock:
+            self._documentos.close()
+            self._salvar_indice()
+
+def trecho_busca(texto, termos, tamanho=160):
+    """Parte do texto em volta da primeira palavra encontrada"""
+    if len(texto) <= tamanho:
+        return texto
+    # Conversão letra a letra, para manter as posições do texto original
+    convertido = ''.join((sem_acentos(letra) or ' ')[0] for letra in texto)
+    posicoes = [m.start() for termo in termos for m in [re.search(rf'\b{termo}\b', convertido)] if m]
+    inicio = max(0, min(posicoes, default=0) - tamanho // 4)
+    fim = inicio + tamanho
+    return ('…' if inicio else '') + texto[inicio:fim].strip() + ('…' if fim < len(texto) else '')
+
+def assinatura_minhash(texto):
+    """Assinatura MinHash dos trechos de 3 palavras da resposta, ou None se ela for curta demais
+
+    Cada trecho vira 64 valores de 32 bits de uma vez (SHAKE-128, que gera
+    quantos bytes forem pedidos), e a assinatura guarda o menor valor de cada
+    posição. A fração de valores iguais entre duas assinaturas estima a
+    semelhança (Jaccard) entre os conjuntos de trechos das duas respostas.
+    """
+    palavras = RE_TERMO.findall(sem_acentos(texto))
+    if len(palavras) < COPIA_MINIMO_PALAVRAS:
+        return None
+    trechos = {' '.join(palavras[i:i + COPIA_PALAVRAS]) for i in range(len(palavras) - COPIA_PALAVRAS + 1)}
+    valores = [hashlib.shake_128(trecho.encode('ascii')).digest(COPIA_PERMUTACOES * 4) for trecho in trechos]
+    numpy = carregar_numpy()
+    if numpy is not None:
+        menores = numpy.frombuffer(b''.join(valores), dtype=numpy.uint32).reshape(-1, COPIA_PERMUTACOES).min(axis=0)
+        return array('I', menores.tobytes())
+    return array('I', map(min, zip(*(array('I', valor) for valor in valores))))
+
+class IndiceCopias:
+    """Respostas abertas muito parecidas entre participantes (/copias)
+
+    Cada resposta aberta ganha uma assinatura MinHash de 64 valores, guardada
+    em um array('I') único (256 bytes por resposta) e em copias.sig. A
+    assinatura é dividida em 16 faixas; respostas da mesma questão com uma
+    faixa idêntica caem no mesmo balde e viram candidatas, e só elas são
+    comparadas, em vez de todos os pares da turma.
+
+    As assinaturas são calculadas por uma thread própria a partir de
+    busca.doc, na ordem dos envios, sem atrasar o salvamento. copias.sig pode
+    ser apagado: as assinaturas são refeitas a partir do índice de busca.
+    """
+
+    REGISTRO = struct.Struct(f'<IH{COPIA_PERMUTACOES}I')  # Envio, questão, assinatura
+
+    def __init__(self, pasta, busca):
+        self.caminho = os.path.join(pasta, SIMILARITY_FILE)
+        self.busca = busca
+        self._lock = threading.Lock()
+        self._envios = array('I')
+        self._questoes = array('H')
+        self._assinaturas = array('I')  # COPIA_PERMUTACOES valores por resposta
+        self._baldes = {}  # hash (questão, faixa, valores) -> resposta, ou lista de respostas
+        proximo = self._carregar()
+        self._arquivo = open(self.caminho, 'ab', buffering=0)
+        self._fila = queue.Queue()
+        for envio in range(proximo, busca.total):
+            self._fila.put(envio)
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._calcular, name='copias', daemon=True)
+        self._thread.start()
+
+    def _carregar(self):
+        """Carrega copias.sig e retorna o próximo envio a calcular"""
+        if not os.path.exists(self.caminho):
+            return 0
+        with open(self.caminho, 'rb') as f:
+            dados = f.read()
+        completo = len(dados) - len(dados) % self.REGISTRO.size
+        registros = list(self.REGISTRO.iter_unpack(dados[:completo]))
+        if registros and registros[-1][0] >= self.busca.total:
+            # Índice de busca refeito: os números dos envios podem ter mudado
+            print(f"⚠️  {SIMILARITY_FILE} não corresponde a {SEARCH_DOCS_FILE}; refazendo as assinaturas")
+            registros, completo = [], 0
+        if completo < len(dados):
+            with open(self.caminho, 'r+b') as f:
+                f.truncate(completo)
+        for envio, questao, *assinatura in registros:
+            self._adicionar(envio, questao, assinatura)
+        return registros[-1][0] + 1 if registros else 0
+
+    def _adicionar(self, envio, questao, assinatura):
+        numero = len(self._envios)
+        self._envios.append(envio)
+        self._questoes.append(questao)
+        self._assinaturas.extend(assinatura)
+        linhas = COPIA_PERMUTACOES // COPIA_FAIXAS
+        baldes = self._baldes
+        for faixa in range(COPIA_FAIXAS):
+            chave = hash((questao, faixa, tuple(assinatura[faixa * linhas:(faixa + 1) * linhas])))
+            balde = baldes.get(chave)
+            if balde is None:
+                baldes[chave] = numero
+            elif type(balde) is int:
+                baldes[chave] = [balde, numero]
+            else:
+                balde.append(numero)
+
+    def _calcular(self):
+        while not self._parar.is_set():
+            envio = self._fila.get()
+            if envio is None:
+                break
+            _, _, textos = self.busca.documentos([envio])[envio]
+            for questao, texto in sorted(textos.items()):
+                assinatura = assinatura_minhash(texto)
+                if assinatura is None:
+                    continue
+                self._arquivo.write(self.REGISTRO.pack(envio, questao, *assinatura))
+                with self._lock:
+                    self._adicionar(envio, questao, assinatura)
+
+    def registrar(self, envio):
+        """Agenda o cálculo das assinaturas de um envio já indexado para a busca"""
+        self._fila.put(envio)
+
+    @property
+    def pendentes(self):
+        return self._fila.qsize()
+
+    def _semelhanca(self, a, b):
+        assinaturas = self._assinaturas
+        inicio_a, inicio_b = a * COPIA_PERMUTACOES, b * COPIA_PERMUTACOES
+        iguais = sum(x == y for x, y in zip(assinaturas[inicio_a:inicio_a + COPIA_PERMUTACOES],
+                                            assinaturas[inicio_b:inicio_b + COPIA_PERMUTACOES]))
+        return iguais / COPIA_PERMUTACOES
+
+    def grupos(self, questao=None, minimo=COPIA_SIMILARIDADE):
+        """Grupos de respostas da mesma questão com semelhança estimada >= minimo
+
+        Os pares candidatos saem dos baldes do LSH; os que passam do mínimo
+        são unidos (union-find), de modo que A~B e B~C formam um só grupo.
+        Retorna (respostas comparadas, grupos), os maiores primeiros.
+        """
+        with self._lock:
+            total = len(self._envios)
+            pai = {}
+
+            def raiz(x):
+                while pai.get(x, x) != x:
+                    x = pai[x]
+                return x
+
+            semelhanca = {}
+            comparados = set()
+            for balde in self._baldes.values():
+                if type(balde) is int or (questao is not None and self._questoes[balde[0]] != questao):
+                    continue
+                if len(balde) <= COPIA_BALDE_MAXIMO:
+                    pares = ((a, b) for i, a in enumerate(balde) for b in balde[i + 1:])
+                else:
+                    pares = ((balde[0], b) for b in balde[1:])
+                for a, b in pares:
+                    if (a, b) in comparados or self._envios[a] == self._envios[b]:
+                        continue
+                    comparados.add((a, b))
+                    valor = self._semelhanca(a, b)
+                    if valor < minimo:
+                        continue
+                    ra, rb = raiz(a), raiz(b)
+                    if ra != rb:
+                        pai[rb] = ra
+                    semelhanca[a] = max(semelhanca.get(a, 0.0), valor)
+                    semelhanca[b] = max(semelhanca.get(b, 0.0), valor)
+
+            membros = {}
+            for numero in semelhanca:
+                membros.setdefault(raiz(numero), []).append(numero)
+            grupos = [(self._questoes[lista[0]], max(semelhanca[n] for n in lista),
+                       [(self._envios[n], semelhanca[n]) for n in sorted(lista)])
+                      for lista in membros.values()]
+        grupos.sort(key=lambda grupo: (-len(grupo[2]), -grupo[1], grupo[0]))
+        return total, grupos
+
+    def encerrar(self):
+        self._parar.set()
+        self._fila.put(None)
+        self._thread.join()
+        self._arquivo.close()
+
+class Rascunhos:
+    """Rascunhos das avaliações em andamento (/rascunho)
+
+    A página envia as respostas parciais alguns segundos depois que o
+    participante para de digitar; se o navegador recarregar a página, elas
+    são recuperadas pelo identificador da avaliação. Os rascunhos ficam em
+    memória em uma lista LRU, limitada por memória e pela validade (os
+    parados há mais tempo saem primeiro), já na linha JSON que vai para o
+    disco. A cada intervalo segundos uma thread acrescenta a rascunhos.jsonl
+    só os rascunhos alterados desde a última gravação: dezenas de alterações
+    do mesmo rascunho viram uma única linha. Quando o arquivo fica com mais
+    que o dobro de linhas necessárias, ele é reescrito só com as atuais.
+    """
+
+    LINHAS_MINIMAS = 1000  # Linhas antigas toleradas no arquivo antes de reescrevê-lo
+
+    def __init__(self, caminho, limite_memoria, validade, intervalo):
+        self.caminho = caminho
+        self.limite_memoria = limite_memoria
+        self.validade = validade
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._rascunhos = OrderedDict()  # id_envio -> (atualizado, linha JSON), o mais antigo primeiro
+        self._memoria = 0
+        self._alterados = set()  # Gravados na próxima vez (sem rascunho em memória: removido)
+        self._arquivo = None
+        self._carregar()
+        self._reescrever([linha for _, linha in self._rascunhos.values()])
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._gravar_periodicamente, name='rascunhos', daemon=True)
+        self._thread.start()
+
+    def _carregar(self):
+        """Lê rascunhos.jsonl: vale a última linha de cada rascunho"""
+        if not os.path.exists(self.caminho):
+            return
+        with open(self.caminho, encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    dados = json.loads(linha)
+                except ValueError:  # Linha incompleta (ex: queda de energia)
+                    continue
+                self._remover(dados['id'])
+                if 'respostas' in dados:
+                    self._guardar(dados['id'], dados['atualizado'], linha.rstrip('\n'))
+        self._expirar(time.time())
+        self._alterados.clear()
+
+    def _guardar(self, id_envio, atualizado, linha):
+        self._rascunhos[id_envio] = (atualizado, linha)
+        self._memoria += len(linha)
+        self._alterados.add(id_envio)
+        while self._memoria > self.limite_memoria and len(self._rascunhos) > 1:
+            id_antigo, _ = next(iter(self._rascunhos.items()))
+            self._remover(id_antigo)
+
+    def _remover(self, id_envio):
+        rascunho = self._rascunhos.pop(id_envio, None)
+        if rascunho is not None:
+            self._memoria -= len(rascunho[1])
+            self._alterados.add(id_envio)
+
+    def _expirar(self, agora):
+        limite = agora - self.validade
+        while self._rascunhos:
+            id_envio, (atualizado, _) = next(iter(self._rascunhos.items()))
+            if atualizado >= limite:
+                break
+            self._remover(id_envio)
+
+    def salvar(self, id_envio, nome, respostas):
+        atualizado = time.time()
+        linha = json.dumps({'id': id_envio, 'atualizado': atualizado, 'nome': nome, 'respostas': respostas},
+                           ensure_ascii=False)
+        with self._lock:
+            self._remover(id_envio)
+            self._guardar(id_envio, atualizado, linha)
+
+    def obter(self, id_envio):
+        """{'nome', 'respostas', 'atualizado'} do rascunho, ou None se não existe (ou expirou)"""
+        with self._lock:
+            self._expirar(time.time())
+            rascunho = self._rascunhos.get(id_envio)
+        if rascunho is None:
+            return None
+        dados = json.loads(rascunho[1])
+        del dados['id']
+        dados['atualizado'] = datetime.fromtimestamp(dados['atualizado']).strftime('%Y-%m-%d %H:%M:%S')
+        return dados
+
+    def remover(self, id_envio):
+        """Descarta o rascunho de uma avaliação já enviada"""
+        with self._lock:
+            self._remover(id_envio)
+
+    def _gravar_periodicamente(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self._gravar()
+            except OSError as e:
+                print(f"⚠️  Erro ao gravar os rascunhos: {e}")
+
+    def _gravar(self):
+        """Grava os rascunhos alterados desde a última vez (chamado só por uma thread de cada vez)"""
+        with self._lock:
+            self._expirar(time.time())
+            if not self._alterados:
+                return
+            # Na ordem da lista LRU, que a leitura do arquivo reconstrói
+            linhas = [json.dumps({'id': id_envio}) for id_envio in self._alterados if id_envio not in self._rascunhos]
+            linhas += [linha for id_envio, (_, linha) in self._rascunhos.items() if id_envio in self._alterados]
+            self._alterados.clear()
+            if self._linhas + len(linhas) > 2 * len(self._rascunhos) + self.LINHAS_MINIMAS:
+                linhas, reescrever = [linha for _, linha in self._rascunhos.values()], True
             else:
-                linha += f"RESPOSTA: [Alternativa inválida: {resposta}]\n\n"
+                reescrever = False
+        if reescrever:
+            self._reescrever(linhas)
         else:
-            linha += f"RESPOSTA: {resposta}\n\n"
-    
-    with open(DATA_FILE, 'a', encoding='utf-8') as f:
-        f.write(linha)
-    
-    print(f"✅ Nova resposta salva: {data['nome']}")
+            self._arquivo.write(''.join(linha + '\n' for linha in linhas))
+            self._arquivo.flush()
+            self._linhas += len(linhas)
 
-def get_formulario_html():
-    """Gera o HTML do formulário dinamicamente com base nas perguntas carregadas"""
-    
-    # Obtém configurações
-    instituicao = config_loader.get_instituicao()
-    cor = config_loader.get_cor()
-    cor_rgb = config_loader.get_cor_rgb()
-    cargo = config_loader.get_cargo()
-    
-    # Gera o HTML das questões
-    questions_html = ""
-    for i in range(question_loader.get_total_questions()):
-        tipo = question_loader.get_question_type(i)
-        texto = question_loader.get_question_text(i)
+    def _reescrever(self, linhas):
+        """Substitui rascunhos.jsonl só pelos rascunhos atuais (arquivo temporário + rename)"""
+        temporario = self.caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            f.write(''.join(linha + '\n' for linha in linhas))
+        os.replace(temporario, self.caminho)
+        if self._arquivo is not None:
+            self._arquivo.close()
+        self._arquivo = open(self.caminho, 'a', encoding='utf-8')
+        self._linhas = len(linhas)
+
+    def encerrar(self):
+        self._parar.set()
+        self._thread.join()
+        self._gravar()
+        self._arquivo.close()
+
+class DadosExame:
+    """Armazenamento, estatísticas, correção, envios já recebidos, índices e rascunhos de um exame"""
+
+    def __init__(self, armazenamento, estatisticas, correcao, envios, busca, copias, rascunhos):
+        self.armazenamento = armazenamento
+        self.estatisticas = estatisticas
+        self.correcao = correcao
+        self.envios = envios
+        self.busca = busca
+        self.copias = copias
+        self.rascunhos = rascunhos
+        self.ultimo_uso = time.monotonic()
+
+    def encerrar(self):
+        """Grava o que estiver pendente e fecha os arquivos"""
+        self.armazenamento.encerrar()
+        self.envios.encerrar()
+        self.copias.encerrar()
+        self.rascunhos.encerrar()
+        self.busca.encerrar()
+
+class RegistroExames:
+    """Exames disponíveis no servidor, carregados sob demanda
+
+    O exame padrão usa perguntas.txt e config.txt da pasta raiz (a pasta do
+    servidor) e é servido em /. Cada subpasta de exames/ com um perguntas.txt (e,
+    opcionalmente, um config.txt próprio) é servida em /exame/<pasta>, com
+    as respostas gravadas dentro da própria subpasta.
+
+    Os exames são compilados no primeiro acesso e mantidos em uma lista LRU
+    limitada por memória: quando o limite é ultrapassado, os exames usados
+    há mais tempo são descartados e compilados de novo quando voltarem a ser
+    acessados. Alterações nos arquivos são aplicadas sem reiniciar o servidor.
+    As respostas e os índices de um exame (DadosExame) são abertos no
+    primeiro uso e fechados depois de DADOS_OCIOSOS segundos sem uso (menos
+    os do exame padrão, que ficam sempre abertos).
+    """
+
+    ID_VALIDO = re.compile(r'^[A-Za-z0-9_-]+$')
+    DADOS_OCIOSOS = 15 * 60  # Segundos sem uso até fechar os dados de um exame
+    VERIFICAR_OCIOSOS = 60  # Intervalo mínimo entre duas procuras por dados ociosos
+
+    def __init__(self, diretorio, config, raiz='.'):
+        self.diretorio = diretorio
+        self.config = config
+        self.limite_memoria = config.get_memoria_exames() * 1024 * 1024
+        self.raiz = raiz
+        self._compilados = OrderedDict()
+        self._memoria = 0
+        self._lock = threading.Lock()
+        self._dados = {}
+        self._abrindo = {}  # exame_id -> Lock de quem está abrindo os dados do exame
+        self._lock_dados = threading.Lock()
+        self._proxima_verificacao = time.monotonic() + self.VERIFICAR_OCIOSOS
+
+    def pasta(self, exame_id):
+        """Pasta dos arquivos e das respostas do exame"""
+        return os.path.join(self.diretorio, exame_id) if exame_id else self.raiz
+
+    def _arquivos(self, exame_id):
+        config_padrao = os.path.join(self.raiz, CONFIG_FILE)
+        if not exame_id:
+            return os.path.join(self.raiz, QUESTIONS_FILE), config_padrao
+        if not self.ID_VALIDO.match(exame_id):
+            return None
+        perguntas = os.path.join(self.pasta(exame_id), QUESTIONS_FILE)
+        if not os.path.isfile(perguntas):
+            return None
+        config = os.path.join(self.pasta(exame_id), CONFIG_FILE)
+        return perguntas, (config if os.path.isfile(config) else config_padrao)
+
+    def obter(self, exame_id):
+        """Retorna o exame compilado, ou None se ele não existir"""
+        arquivos = self._arquivos(exame_id)
+        if arquivos is None:
+            return None
         
-        if tipo == 'multipla_escolha':
-            # Questão de múltipla escolha
-            alternativas = question_loader.get_alternativas(i)
-            questions_html += f'''
-      <div class="question">
-        <div class="question-title">{texto}</div>
-'''
-            for j, alt in enumerate(alternativas):
-                letra = alt[0].lower()
-                questions_html += f'''
-        <div class="radio-option">
-          <input type="radio" name="q{i}" value="{j}" id="q{i}{letra}">
-          <label for="q{i}{letra}">{alt}</label>
-        </div>
-'''
-            questions_html += '      </div>\n'
-        else:
-            # Questão aberta
-            questions_html += f'''
-      <div class="question">
-        <div class="question-title">{texto}</div>
-        <textarea id="q{i}" class="form-input" placeholder="Digite sua resposta..."></textarea>
-      </div>
-'''
-    
-    # Template HTML completo
-    return f'''<!DOCTYPE html>
-<html lang="pt-BR">
-<head>
-  <meta charset="UTF-8">
-  <meta name="viewport" content="width=device-width, initial-scale=1.0">
-  <title>BigCard - Avaliação de Treinamento</title>
-  <script src="https://cdn.tailwindcss.com"></script>
-  <script src="https://cdnjs.cloudflare.com/ajax/libs/jspdf/2.5.1/jspdf.umd.min.js"></script>
-  <style>
-    * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-    body {{ 
-      font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-      background: #f8f9fa;
-      color: #2c3e50;
-    }}
-    .container {{
-      max-width: 900px;
-      margin: 0 auto;
-      padding: 20px;
-    }}
-    .header {{
-      background: white;
-      padding: 40px;
-      text-align: center;
-      border-bottom: 3px solid {cor};
-      margin-bottom: 30px;
-    }}
-    .logo {{
-      font-size: 32px;
-      font-weight: 700;
-      color: {cor};
-      margin-bottom: 10px;
-      letter-spacing: -0.5px;
-    }}
-    .subtitle {{
-      color: #6c757d;
-      font-size: 16px;
-    }}
-    .card {{
-      background: white;
-      border: 1px solid #e0e0e0;
-      border-radius: 8px;
-      padding: 30px;
-      margin-bottom: 20px;
-      box-shadow: 0 2px 4px rgba(0,0,0,0.05);
-    }}
-    .question {{
-      background: white;
-      border: 1px solid #e0e0e0;
-      border-radius: 8px;
-      padding: 25px;
-      margin-bottom: 20px;
-      transition: border-color 0.3s;
-    }}
-    .question:hover {{
-      border-color: {cor};
-    }}
-    .question-title {{
-      font-size: 16px;
-      font-weight: 600;
-      color: #2c3e50;
-      margin-bottom: 15px;
-      line-height: 1.6;
-    }}
-    .form-label {{
-      display: block;
-      font-weight: 600;
-      color: #495057;
-      margin-bottom: 8px;
-      font-size: 14px;
-    }}
-    .form-input {{
-      width: 100%;
-      padding: 12px 16px;
-      border: 2px solid #e0e0e0;
-      border-radius: 6px;
-      font-size: 15px;
-      transition: border-color 0.3s;
-      background: #fafafa;
-    }}
-    .form-input:focus {{
-      outline: none;
-      border-color: {cor};
-      background: white;
-    }}
-    textarea.form-input {{
-      resize: vertical;
-      min-height: 120px;
-      font-family: inherit;
-      line-height: 1.5;
-    }}
-    .radio-option {{
-      display: flex;
-      align-items: flex-start;
-      padding: 14px;
-      margin-bottom: 10px;
-      border: 2px solid #e0e0e0;
-      border-radius: 6px;
-      cursor: pointer;
-      transition: all 0.3s;
-      background: #fafafa;
-    }}
-    .radio-option:hover {{
-      border-color: {cor};
-      background: white;
-    }}
-    .radio-option input[type="radio"] {{
-      margin-right: 12px;
-      margin-top: 3px;
-      cursor: pointer;
-    }}
-    .radio-option label {{
-      cursor: pointer;
-      color: #495057;
-      line-height: 1.5;
-      flex: 1;
-    }}
-    .btn {{
-      width: 100%;
-      padding: 16px;
-      border: none;
-      border-radius: 6px;
-      font-size: 16px;
-      font-weight: 600;
-      cursor: pointer;
-      transition: all 0.3s;
-      text-transform: uppercase;
-      letter-spacing: 0.5px;
-    }}
-    .btn-primary {{
-      background: {cor};
-      color: white;
-    }}
-    .btn-primary:hover {{
-      background: {cor};
-      opacity: 0.9;
-      transform: translateY(-2px);
-      box-shadow: 0 4px 12px rgba({cor_rgb[0]}, {cor_rgb[1]}, {cor_rgb[2]}, 0.3);
-    }}
-    .btn-success {{
-      background: #28a745;
-      color: white;
-    }}
-    .btn-success:hover {{
-      background: #218838;
-      transform: translateY(-2px);
-      box-shadow: 0 4px 12px rgba(40, 167, 69, 0.3);
-    }}
-    .hidden {{
-      display: none;
-    }}
-    .result-container {{
-      text-align: center;
-      padding: 50px 30px;
-    }}
-    .result-icon {{
-      width: 80px;
-      height: 80px;
-      margin: 0 auto 20px;
-      background: #28a745;
-      border-radius: 50%;
-      display: flex;
-      align-items: center;
-      justify-content: center;
-      color: white;
-    }}
-    .result-icon svg {{
-      width: 50px;
-      height: 50px;
-    }}
-    .result-title {{
-      font-size: 28px;
-      font-weight: 700;
-      color: #2c3e50;
-      margin-bottom: 10px;
-    }}
-    .result-subtitle {{
-      font-size: 16px;
-      color: #6c757d;
-      margin-bottom: 30px;
-    }}
-  </style>
-</head>
-<body>
-  <div class="header">
-    <div class="logo">{instituicao}</div>
-    <div class="subtitle">Avaliação de Treinamento Técnico</div>
-  </div>
+        with self._lock:
+            exame = self._compilados.get(exame_id)
+            if exame is not None:
+                self._compilados.move_to_end(exame_id)
+        if exame is not None and exame.arquivos == arquivos and exame.atualizado():
+            return exame
+        
+        try:
+            novo = Exame(exame_id, *arquivos)
+        except Exception as e:
+            if exame is None:
+                raise
+            print(f"⚠️  Erro ao recarregar o exame '{exame_id or 'padrão'}': {e}. Mantendo versão anterior.")
+            return exame
+        
+        with self._lock:
+            anterior = self._compilados.pop(exame_id, None)
+            if anterior is not None:
+                self._memoria -= anterior.tamanho
+            self._compilados[exame_id] = novo
+            self._memoria += novo.tamanho
+            while self._memoria > self.limite_memoria and len(self._compilados) > 1:
+                _, removido = self._compilados.popitem(last=False)
+                self._memoria -= removido.tamanho
+        
+        if exame is not None:
+            print(f"🔄 Exame '{exame_id or 'padrão'}' recarregado: {novo.perguntas.get_total_questions()} perguntas")
+        return novo
 
-  <div class="container">
-    <!-- Formulário Inicial -->
-    <div id="formSection" class="card">
-      <h2 style="font-size: 24px; color: #2c3e50; margin-bottom: 20px;">Identificação</h2>
-      <label class="form-label">Nome Completo</label>
-      <input type="text" id="nome" class="form-input" placeholder="Digite seu nome completo">
-      <button onclick="iniciarAvaliacao()" class="btn btn-primary" style="margin-top: 20px;">
-        Iniciar Avaliação
-      </button>
-    </div>
+    def dados(self, exame_id):
+        """Armazenamento e estatísticas do exame, abertos no primeiro uso"""
+        agora = time.monotonic()
+        if agora >= self._proxima_verificacao:
+            self._fechar_ociosos(agora)
+        dados = self._dados.get(exame_id)
+        if dados is None:
+            # Só quem abre este exame espera (contar as respostas pode demorar); os outros exames seguem
+            with self._lock_dados:
+                lock = self._abrindo.setdefault(exame_id, threading.Lock())
+            with lock:
+                dados = self._dados.get(exame_id)
+                if dados is None:
+                    dados = self._abrir(exame_id)
+                    with self._lock_dados:
+                        self._dados[exame_id] = dados
+                        self._abrindo.pop(exame_id, None)
+        dados.ultimo_uso = agora
+        return dados
 
-    <!-- Questionário -->
-    <div id="quizSection" class="hidden">
-      <div class="card" style="background: rgba({cor_rgb[0]}, {cor_rgb[1]}, {cor_rgb[2]}, 0.1); border-color: {cor};">
-        <p style="margin: 0; color: {cor}; font-weight: 600;">
-          📝 Responda todas as {question_loader.get_total_questions()} questões abaixo
-        </p>
-      </div>
+    def _perguntas(self, exame_id):
+        """Função que retorna as perguntas atuais do exame (as últimas conhecidas, se ele for removido)"""
+        ultimas = self.obter(exame_id).perguntas
 
-{questions_html}
+        def obter_perguntas():
+            nonlocal ultimas
+            exame = self.obter(exame_id)
+            if exame is not None:
+                ultimas = exame.perguntas
+            return ultimas
+        return obter_perguntas
 
-      <div class="card">
-        <button onclick="enviarRespostas()" class="btn btn-success">
-          Enviar Respostas
-        </button>
-      </div>
-    </div>
+    def _abrir(self, exame_id):
+        config = self.config
+        pasta = self.pasta(exame_id)
+        obter_perguntas = self._perguntas(exame_id)
+        armazenamento = criar_armazenamento(config, pasta, obter_perguntas)
+        estatisticas = EstatisticasRespostas(obter_perguntas)
+        correcao = CorrecaoRespostas(obter_perguntas)
+        for registro in armazenamento.iterar():
+            estatisticas.registrar(registro)
+            correcao.registrar(registro)
+        envios = IndiceEnvios(os.path.join(pasta, SUBMISSIONS_FILE))
+        busca = IndiceBusca(pasta, obter_perguntas)
+        if busca.total < estatisticas.total:
+            # Respostas anteriores ao índice (ou não indexadas por uma queda de energia)
+            print(f"🔎 Indexando {estatisticas.total - busca.total} respostas para a busca...")
+            busca.reconstruir(armazenamento.iterar(), busca.total)
+        copias = IndiceCopias(pasta, busca)
+        rascunhos = Rascunhos(os.path.join(pasta, DRAFTS_FILE),
+                              config.get_memoria_rascunhos() * 1024 * 1024,
+                              config.get_validade_rascunho() * 3600,
+                              config.get_intervalo_rascunhos())
+        return DadosExame(armazenamento, estatisticas, correcao, envios, busca, copias, rascunhos)
 
-    <!-- Resultado -->
-    <div id="resultSection" class="hidden">
-      <div class="card result-container">
-        <div class="result-icon">
-          <svg fill="none" stroke="currentColor" viewBox="0 0 24 24">
-            <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M5 13l4 4L19 7"/>
-          </svg>
-        </div>
-        <div class="result-title">Avaliação Enviada com Sucesso!</div>
-        <div class="result-subtitle">Suas respostas foram registradas e serão analisadas.</div>
-        <button onclick="baixarComprovante()" class="btn btn-primary">
-          📄 Baixar Comprovante em PDF
-        </button>
-      </div>
-    </div>
+    def _fechar_ociosos(self, agora):
+        """Fecha os dados dos exames sem uso há mais de DADOS_OCIOSOS segundos"""
+        with self._lock_dados:
+            if agora < self._proxima_verificacao:
+                return  # Outra thread acabou de verificar
+            self._proxima_verificacao = agora + self.VERIFICAR_OCIOSOS
+            fechando = []
+            for exame_id, dados in list(self._dados.items()):
+                if exame_id == EXAME_PADRAO or agora - dados.ultimo_uso <= self.DADOS_OCIOSOS:
+                    continue
+                # Quem pedir o exame enquanto ele fecha espera, para não abrir os mesmos arquivos duas vezes
+                lock = self._abrindo.setdefault(exame_id, threading.Lock())
+                if lock.acquire(blocking=False):
+                    fechando.append((self._dados.pop(exame_id), lock))
+        for dados, lock in fechando:
+            try:
+                dados.encerrar()
+            finally:
+                lock.release()
 
-  </div>
+    def encerrar(self):
+        """Grava as respostas pendentes de todos os exames abertos"""
+        with self._lock_dados:
+            abertos = list(self._dados.values())
+            self._dados.clear()
+        for dados in abertos:
+            dados.encerrar()
 
-  <script>
-    const TOTAL_QUESTIONS = {question_loader.get_total_questions()};
-    const QUESTION_TYPES = {json.dumps([question_loader.get_question_type(i) for i in range(question_loader.get_total_questions())])};
-    let userData = {{}};
-
-    function iniciarAvaliacao() {{
-      const nome = document.getElementById('nome').value.trim();
-      
-      if (!nome) {{
-        alert('⚠️ Por favor, preencha seu nome completo!');
-        return;
-      }}
-      
-      userData = {{ nome }};
-      document.getElementById('formSection').classList.add('hidden');
-      document.getElementById('quizSection').classList.remove('hidden');
-      window.scrollTo(0, 0);
-    }}
-
-    async function enviarRespostas() {{
-      const respostas = [];
-      
-      for (let i = 0; i < TOTAL_QUESTIONS; i++) {{
-        if (QUESTION_TYPES[i] === 'multipla_escolha') {{
-          const radio = document.querySelector(`input[name="q${{i}}"]:checked`);
-          if (!radio) {{
-            alert(`⚠️ Por favor, responda a questão ${{i + 1}}!`);
-            window.scrollTo(0, document.querySelector(`.question:nth-child(${{i + 2}})`).offsetTop - 100);
-            return;
-          }}
-          respostas.push(radio.value);
-        }} else {{
-          const resposta = document.getElementById(`q${{i}}`).value.trim();
-          if (!resposta || resposta.length < 10) {{
-            alert(`⚠️ Por favor, responda completamente a questão ${{i + 1}}!`);
-            window.scrollTo(0, document.getElementById(`q${{i}}`).offsetTop - 100);
-            return;
-          }}
-          respostas.push(resposta);
-        }}
-      }}
-
-      try {{
-        const response = await fetch('/enviar', {{
-          method: 'POST',
-          headers: {{ 'Content-Type': 'application/json' }},
-          body: JSON.stringify({{
-            nome: userData.nome,
-            respostas: respostas
-          }})
-        }});
-
-        if (response.ok) {{
-          mostrarResultado();
-        }} else {{
-          alert('❌ Erro ao enviar. Tente novamente!');
-        }}
-      }} catch (error) {{
-        alert('❌ Erro de conexão. Verifique se o servidor está rodando!');
-        console.error(error);
-      }}
-    }}
-
-    function mostrarResultado() {{
-      document.getElementById('quizSection').classList.add('hidden');
-      document.getElementById('resultSection').classList.remove('hidden');
-      window.scrollTo(0, 0);
-    }}
-
-    function baixarComprovante() {{
-      const {{ jsPDF }} = window.jspdf;
-      const pdf = new jsPDF();
-      
-      // Cabeçalho com cor configurável
-      pdf.setFillColor({cor_rgb[0]}, {cor_rgb[1]}, {cor_rgb[2]});
-      pdf.rect(0, 0, 210, 35, 'F');
-      
-      pdf.setTextColor(255, 255, 255);
-      pdf.setFontSize(26);
-      pdf.setFont(undefined, 'bold');
-      pdf.text('{instituicao}', 105, 20, {{ align: 'center' }});
-      
-      pdf.setFontSize(12);
-      pdf.setFont(undefined, 'normal');
-      pdf.text('Comprovante de Avaliação', 105, 28, {{ align: 'center' }});
-      
-      // Corpo
-      pdf.setTextColor(0, 0, 0);
-      pdf.setFontSize(14);
-      pdf.text('COMPROVANTE DE PARTICIPAÇÃO', 105, 55, {{ align: 'center' }});
-      
-      pdf.setFontSize(11);
-      pdf.setFont(undefined, 'normal');
-      pdf.text('Certificamos que', 105, 75, {{ align: 'center' }});
-      
-      pdf.setFontSize(16);
-      pdf.setFont(undefined, 'bold');
-      pdf.text(userData.nome, 105, 90, {{ align: 'center' }});
-      
-      pdf.setFontSize(11);
-      pdf.setFont(undefined, 'normal');
-      pdf.text('concluiu e enviou as respostas da', 105, 105, {{ align: 'center' }});
-      pdf.text('Avaliação de Treinamento Técnico', 105, 113, {{ align: 'center' }});
-      pdf.text('{cargo}', 105, 121, {{ align: 'center' }});
-      
-      // Info
-      pdf.setFontSize(10);
-      pdf.setTextColor(100, 100, 100);
-      pdf.text(`Data: ${{new Date().toLocaleDateString('pt-BR')}}`, 105, 145, {{ align: 'center' }});
-      pdf.text(`Horário: ${{new Date().toLocaleTimeString('pt-BR')}}`, 105, 152, {{ align: 'center' }});
-      
-      // Rodapé
-      pdf.setFontSize(9);
-      pdf.text('As respostas estão sendo analisadas.', 105, 170, {{ align: 'center' }});
-      pdf.text('Este documento é apenas um comprovante de participação.', 105, 176, {{ align: 'center' }});
-      
-      pdf.setDrawColor({cor_rgb[0]}, {cor_rgb[1]}, {cor_rgb[2]});
-      pdf.line(20, 190, 190, 190);
-      
-      pdf.setFontSize(8);
-      pdf.text('{instituicao} - Sistema de Avaliação de Treinamento', 105, 195, {{ align: 'center' }});
-      
-      // Salvar
-      pdf.save(`Comprovante_${{userData.nome.replace(/\\s+/g, '_')}}.pdf`);
-    }}
-  </script>
-</body>
-</html>'''
+def etags(resumo):
+    """ETags da versão original e da compactada: são bytes diferentes, então as ETags também"""
+    return f'"{resumo}"', f'"{resumo}-gz"'
 
-def main():
-    import socket
-    
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    try:
-        s.connect(('8.8.8.8', 80))
-        local_ip = s.getsockname()[0]
-    except:
-        local_ip = '127.0.0.1'
-    finally:
-        s.close()
+def etag_corresponde(if_none_match, etag):
+    """Verifica se o cabeçalho If-None-Match do navegador contém a ETag atual"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return etag in [tag.strip() for tag in if_none_match.split(',')]
+
+class Histograma:
+    """Contagem de valores por faixa (histograma do Prometheus)"""
+    __slots__ = ('limites', 'contagens', 'soma', 'total')
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)  # A última faixa é +Inf
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect.bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def copia(self):
+        copia = Histograma(self.limites)
+        copia.contagens = self.contagens[:]
+        copia.soma, copia.total = self.soma, self.total
+        return copia
+
+    def somar(self, outro):
+        """Acrescenta as contagens de outro histograma com os mesmos limites"""
+        self.contagens = [a + b for a, b in zip(self.contagens, outro.contagens)]
+        self.soma += outro.soma
+        self.total += outro.total
+
+    def linhas(self, nome, rotulos):
+        """Linhas no formato texto do Prometheus (faixas acumuladas)"""
+        separador = ',' if rotulos else ''
+        acumulado = 0
+        for limite, contagem in zip(self.limites + ('+Inf',), self.contagens):
+            acumulado += contagem
+            yield f'{nome}_bucket{{{rotulos}{separador}le="{limite}"}} {acumulado}'
+        yield f'{nome}_sum{{{rotulos}}} {self.soma}'
+        yield f'{nome}_count{{{rotulos}}} {self.total}'
+
+def memoria_processo():
+    """(memória residente atual, pico) do processo em bytes, ou None se o sistema não informar"""
+    atual = pico = None
+    try:
+        with open('/proc/self/statm') as f:
+            atual = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux informa em KB, macOS em bytes
+        pico *= 1 if sys.platform == 'darwin' else 1024
+    return atual, pico
+
+class Metricas:
+    """Métricas do servidor expostas em /metrics no formato do Prometheus
+
+    Cada requisição só incrementa contadores já existentes (um histograma
+    por rota e status, criado na primeira ocorrência); o texto é montado
+    apenas quando /metrics é consultado. No modo prefork, o processo
+    principal soma os contadores de todos os workers (outros_processos).
+    """
+
+    LIMITES_TEMPO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+    LIMITES_BYTES = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152)
+    ETAPAS_SALVAR = ('formatacao', 'gravacao', 'total')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._duracao = {}  # rota -> status -> Histograma
+        self._recebidos = {}  # rota -> Histograma do corpo da requisição
+        self._enviados = {}  # rota -> Histograma do corpo da resposta
+        self._salvar = {etapa: Histograma(self.LIMITES_TEMPO) for etapa in self.ETAPAS_SALVAR}
+        self._conexoes = 0
+        self._inicio = time.time()
+        self.outros_processos = None  # Função que retorna o estado() dos workers (modo prefork)
+
+    def registrar_requisicao(self, rota, status, duracao, recebidos, enviados):
+        with self._lock:
+            por_status = self._duracao.get(rota)
+            if por_status is None:
+                por_status = self._duracao[rota] = {}
+                self._recebidos[rota] = Histograma(self.LIMITES_BYTES)
+                self._enviados[rota] = Histograma(self.LIMITES_BYTES)
+            histograma = por_status.get(status)
+            if histograma is None:
+                histograma = por_status[status] = Histograma(self.LIMITES_TEMPO)
+            histograma.observar(duracao)
+            self._recebidos[rota].observar(recebidos)
+            self._enviados[rota].observar(enviados)
+
+    def registrar_salvar(self, etapa, duracao):
+        """Tempo de uma etapa de salvar_resposta (formatacao, gravacao ou total)"""
+        with self._lock:
+            self._salvar[etapa].observar(duracao)
+
+    def conexao_aberta(self):
+        with self._lock:
+            self._conexoes += 1
+
+    def conexao_fechada(self):
+        with self._lock:
+            self._conexoes -= 1
+
+    def estado(self):
+        """Cópia dos contadores e do uso de memória e CPU deste processo"""
+        with self._lock:
+            estado = {
+                'duracao': {rota: {status: histograma.copia() for status, histograma in por_status.items()}
+                            for rota, por_status in self._duracao.items()},
+                'recebidos': {rota: histograma.copia() for rota, histograma in self._recebidos.items()},
+                'enviados': {rota: histograma.copia() for rota, histograma in self._enviados.items()},
+                'salvar': {etapa: histograma.copia() for etapa, histograma in self._salvar.items()},
+                'conexoes': self._conexoes,
+            }
+        estado['memoria'], estado['pico'] = memoria_processo()
+        estado['cpu'] = time.process_time()
+        return estado
+
+    @staticmethod
+    def _somar(total, estado):
+        """Acrescenta a total (resultado de estado()) os números de outro processo"""
+        for rota, por_status in estado['duracao'].items():
+            destino = total['duracao'].setdefault(rota, {})
+            for status, histograma in por_status.items():
+                if status in destino:
+                    destino[status].somar(histograma)
+                else:
+                    destino[status] = histograma
+        for chave in ('recebidos', 'enviados', 'salvar'):
+            for nome, histograma in estado[chave].items():
+                if nome in total[chave]:
+                    total[chave][nome].somar(histograma)
+                else:
+                    total[chave][nome] = histograma
+        for chave in ('conexoes', 'memoria', 'pico', 'cpu'):
+            if estado[chave] is not None:
+                total[chave] = estado[chave] if total[chave] is None else total[chave] + estado[chave]
+
+    def exportar(self):
+        """Todas as métricas no formato texto do Prometheus"""
+        estado = self.estado()
+        if self.outros_processos is not None:
+            for outro in self.outros_processos():
+                self._somar(estado, outro)
+        linhas = []
+
+        def metrica(nome, tipo, descricao):
+            linhas.append(f'# HELP {nome} {descricao}')
+            linhas.append(f'# TYPE {nome} {tipo}')
+
+        metrica('bigcard_http_requisicao_segundos', 'histogram',
+                'Tempo para atender a requisição, por rota e status')
+        for rota, por_status in sorted(estado['duracao'].items()):
+            for status, histograma in sorted(por_status.items()):
+                linhas.extend(histograma.linhas('bigcard_http_requisicao_segundos',
+                                                f'rota="{rota}",status="{status}"'))
+        for nome, descricao, histogramas in (
+                ('bigcard_http_requisicao_bytes', 'Tamanho do corpo das requisições, por rota', estado['recebidos']),
+                ('bigcard_http_resposta_bytes', 'Tamanho do corpo das respostas, por rota', estado['enviados'])):
+            metrica(nome, 'histogram', descricao)
+            for rota, histograma in sorted(histogramas.items()):
+                linhas.extend(histograma.linhas(nome, f'rota="{rota}"'))
+        metrica('bigcard_salvar_resposta_segundos', 'histogram',
+                'Tempo para salvar uma resposta: formatação, gravação em disco e total')
+        for etapa, histograma in estado['salvar'].items():
+            linhas.extend(histograma.linhas('bigcard_salvar_resposta_segundos', f'etapa="{etapa}"'))
+        metrica('bigcard_conexoes_abertas', 'gauge', 'Conexões de navegadores abertas no momento')
+        linhas.append(f'bigcard_conexoes_abertas {estado["conexoes"]}')
+
+        # No modo prefork, somas de todos os processos
+        if estado['memoria'] is not None:
+            metrica('process_resident_memory_bytes', 'gauge', 'Memória residente do processo')
+            linhas.append(f'process_resident_memory_bytes {estado["memoria"]}')
+        if estado['pico'] is not None:
+            metrica('process_max_resident_memory_bytes', 'gauge', 'Pico de memória residente do processo')
+            linhas.append(f'process_max_resident_memory_bytes {estado["pico"]}')
+        metrica('process_cpu_seconds_total', 'counter', 'Tempo de CPU usado pelo processo')
+        linhas.append(f'process_cpu_seconds_total {estado["cpu"]}')
+        metrica('process_start_time_seconds', 'gauge', 'Horário de início do processo (Unix)')
+        linhas.append(f'process_start_time_seconds {self._inicio}')
+        return '\n'.join(linhas) + '\n'
+
+metricas = Metricas()
+
+class ServidorConcorrente(HTTPServer):
+    """HTTPServer que atende as conexões em um pool limitado de threads
+
+    Um cliente lento (ex: celular enviando uma resposta longa) ocupa apenas
+    um worker, sem bloquear os demais. Entre uma requisição e outra, as
+    conexões keep-alive ociosas voltam para um seletor (uma única thread) e
+    só ocupam um worker de novo quando a próxima requisição chega; ficam
+    abertas até KEEPALIVE_TIMEOUT segundos. Até max_conexoes conexões ficam
+    sendo atendidas ou aguardando um worker; acima disso, cada requisição
+    nova recebe na hora um 503 com Retry-After, escrito pela thread que
+    aceita as conexões (ou pelo seletor), que nunca fica parada esperando
+    uma vaga.
+    """
+
+    request_queue_size = 128  # Conexões aguardando accept() (o padrão é 5)
+
+    def __init__(self, endereco, handler, workers, reutilizar_porta=False, max_conexoes=None):
+        self.reutilizar_porta = reutilizar_porta
+        # Antes do bind: se a porta estiver ocupada, server_close() já encerra o pool
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='worker')
+        self._vagas = threading.BoundedSemaphore(max(workers, max_conexoes or workers * 2))
+        super().__init__(endereco, handler)
+        self._seletor = selectors.DefaultSelector()
+        self._ociosas = OrderedDict()  # socket -> (endereço, prazo), na ordem em que ficaram ociosas
+        self._devolvidas = queue.SimpleQueue()  # Conexões que os workers devolveram ao seletor
+        self._despertador, self._despertar = socket.socketpair()
+        self._seletor.register(self._despertador, selectors.EVENT_READ)
+        self._encerrando = False
+        self._vigia = threading.Thread(target=self._vigiar_ociosas, name='keep-alive', daemon=True)
+        self._vigia.start()
+
+    def server_bind(self):
+        if self.reutilizar_porta:
+            # Modo prefork: cada processo abre a mesma porta e o sistema divide as conexões
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+    def process_request(self, request, client_address):
+        metricas.conexao_aberta()
+        self._despachar(request, client_address)
+
+    def _despachar(self, request, client_address):
+        """Entrega a conexão com uma requisição chegando a um worker, ou recusa se não houver vaga"""
+        if not self._vagas.acquire(blocking=False):
+            self._recusar(request)
+            metricas.conexao_fechada()
+            return
+        self.pool.submit(self._atender, request, client_address)
+
+    def _recusar(self, request):
+        """Responde 503 sem ocupar um worker e fecha a conexão"""
+        try:
+            # Só o que já chegou: a thread que aceita as conexões não espera o cliente
+            request.setblocking(False)
+            try:
+                inicio = request.recv(65536)
+            except BlockingIOError:
+                inicio = b''
+            resposta = admissao.recusar('POST' if inicio.startswith(b'POST') else 'GET')
+            request.settimeout(1)
+            request.sendall(serializar_resposta(resposta, False))
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+
+    def _atender(self, request, client_address):
+        manter = False
+        try:
+            # O handler atende as requisições que já chegaram e diz se a conexão continua aberta
+            manter = not self.RequestHandlerClass(request, client_address, self).close_connection
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self._vagas.release()
+            if manter:
+                self._devolvidas.put((request, client_address))
+                self._acordar_vigia()
+            else:
+                self.shutdown_request(request)
+                metricas.conexao_fechada()
+
+    def _acordar_vigia(self):
+        try:
+            self._despertar.send(b'\0')
+        except OSError:
+            pass  # Servidor encerrado
+
+    def _vigiar_ociosas(self):
+        """Thread do seletor: repassa aos workers as conexões ociosas que receberem uma requisição"""
+        while not self._encerrando:
+            espera = None
+            if self._ociosas:
+                _, prazo = next(iter(self._ociosas.values()))
+                espera = max(0.0, prazo - time.monotonic())
+            eventos = self._seletor.select(espera)
+            agora = time.monotonic()
+            for chave, _ in eventos:
+                if chave.fileobj is self._despertador:
+                    self._despertador.recv(4096)
+                    continue
+                request = chave.fileobj
+                self._seletor.unregister(request)
+                endereco, _ = self._ociosas.pop(request)
+                self._despachar(request, endereco)
+            while not self._devolvidas.empty():
+                request, endereco = self._devolvidas.get()
+                self._seletor.register(request, selectors.EVENT_READ)
+                self._ociosas[request] = (endereco, agora + KEEPALIVE_TIMEOUT)
+            # Todas têm o mesmo prazo: as mais antigas estão no começo
+            while self._ociosas:
+                request, (_, prazo) = next(iter(self._ociosas.items()))
+                if prazo > agora:
+                    break
+                self._fechar_ociosa(request)
+        for request in list(self._ociosas):
+            self._fechar_ociosa(request)
+        while not self._devolvidas.empty():
+            request, _ = self._devolvidas.get()
+            self.shutdown_request(request)
+            metricas.conexao_fechada()
+        self._seletor.close()
+
+    def _fechar_ociosa(self, request):
+        del self._ociosas[request]
+        self._seletor.unregister(request)
+        self.shutdown_request(request)
+        metricas.conexao_fechada()
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+        self._encerrando = True
+        self._acordar_vigia()
+        self._vigia.join()
+        self._despertador.close()
+        self._despertar.close()
+
+class Requisicao:
+    """Requisição HTTP independente do motor de servidor utilizado"""
+    __slots__ = ('metodo', 'caminho', 'query', 'cabecalhos', 'corpo', 'cliente')
+
+    def __init__(self, metodo, alvo, cabecalhos, corpo=b'', cliente=''):
+        self.metodo = metodo
+        self.caminho, _, query = alvo.partition('?')
+        self.query = {chave: valores[-1] for chave, valores in parse_qs(query).items()}
+        self.cabecalhos = cabecalhos  # Chaves em minúsculas
+        self.corpo = corpo
+        self.cliente = cliente  # Endereço IP de quem fez a requisição
+
+class Resposta:
+    """Resposta HTTP produzida pelas rotas e enviada pelo motor de servidor
+
+    O corpo é bytes ou, para respostas grandes geradas aos poucos, um
+    gerador de partes em bytes, enviado com Transfer-Encoding: chunked.
+    """
+    __slots__ = ('status', 'cabecalhos', 'corpo')
+
+    def __init__(self, status, cabecalhos=None, corpo=b''):
+        self.status = status
+        self.cabecalhos = cabecalhos or []
+        self.corpo = corpo
+
+    @classmethod
+    def json(cls, dados, status=200):
+        return cls(status, [('Content-type', 'application/json')], json.dumps(dados).encode('utf-8'))
+
+    @classmethod
+    def erro(cls, status):
+        return cls(status, [('Content-type', 'text/plain; charset=utf-8')],
+                   f"{status} {HTTPStatus(status).phrase}".encode('utf-8'))
+
+def serializar_resposta(resposta, manter_conexao):
+    """Linha de status e cabeçalhos HTTP/1.1 (mais o corpo, se for bytes) prontos para o socket"""
+    status = resposta.status
+    transmitir = not isinstance(resposta.corpo, bytes)
+    linhas = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+              f"Date: {formatdate(usegmt=True)}",
+              f"Connection: {'keep-alive' if manter_conexao else 'close'}"]
+    linhas += [f"{chave}: {valor}" for chave, valor in resposta.cabecalhos]
+    if transmitir:
+        if manter_conexao:
+            linhas.append("Transfer-Encoding: chunked")
+    elif status != 304:
+        linhas.append(f"Content-Length: {len(resposta.corpo)}")
+    cabecalho = ('\r\n'.join(linhas) + '\r\n\r\n').encode('latin-1')
+    return cabecalho if transmitir else cabecalho + resposta.corpo
+
+def aceita_gzip(req):
+    """Indica se o navegador aceita respostas compactadas com gzip"""
+    for codificacao in req.cabecalhos.get('accept-encoding', '').split(','):
+        nome, _, parametros = codificacao.strip().partition(';')
+        if nome.strip().lower() in ('gzip', '*'):
+            return parametros.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+def compactar(corpo):
+    """Versão gzip do conteúdo, ou None se não ficar menor (gerada uma única vez)"""
+    compactado = gzip.compress(corpo, compresslevel=9, mtime=0)
+    return compactado if len(compactado) < len(corpo) else None
+
+class ArquivoEstatico:
+    """Arquivo da pasta static/ carregado em memória, já compactado"""
+    __slots__ = ('nome', 'url', 'tipo', 'corpo', 'corpo_gzip', 'etag', 'etag_gzip')
+
+    def __init__(self, nome, corpo):
+        self.nome = nome
+        resumo = hashlib.sha1(corpo).hexdigest()
+        raiz, extensao = os.path.splitext(nome)
+        # O hash no nome muda a URL a cada alteração, então o navegador pode
+        # guardar o arquivo para sempre sem nunca ficar com uma versão velha
+        self.url = f"{STATIC_URL}{raiz}.{resumo[:8]}{extensao}"
+        self.tipo = mimetypes.guess_type(nome)[0] or 'application/octet-stream'
+        if self.tipo.startswith('text/') or self.tipo == 'application/javascript':
+            self.tipo += '; charset=utf-8'
+        self.corpo = corpo
+        self.corpo_gzip = compactar(corpo)
+        self.etag, self.etag_gzip = etags(resumo)
+
+class ArquivosEstaticos:
+    """CSS e JavaScript do formulário servidos pelo próprio servidor
+
+    Cada arquivo é lido e compactado uma única vez e servido em uma URL com
+    o hash do conteúdo (ex: /static/formulario.3f2a9c1d.css), com cache de
+    um ano no navegador. A página não depende de CDNs externas.
+    Alterações nos arquivos são aplicadas ao reiniciar o servidor.
+    """
+
+    CACHE = 'public, max-age=31536000, immutable'
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self._lock = threading.Lock()
+        self._por_nome = {}
+        self._por_url = {}
+
+    def _carregar(self, nome):
+        with open(os.path.join(self.diretorio, *nome.split('/')), 'rb') as f:
+            arquivo = ArquivoEstatico(nome, f.read())
+        self._por_nome[nome] = arquivo
+        self._por_url[arquivo.url] = arquivo
+        return arquivo
+
+    def url(self, nome):
+        """URL com hash do conteúdo de static/<nome>"""
+        with self._lock:
+            arquivo = self._por_nome.get(nome) or self._carregar(nome)
+        return arquivo.url
+
+    def responder(self, req):
+        """Serve /static/<nome>.<hash>.<ext>"""
+        arquivo = self._por_url.get(req.caminho)
+        if arquivo is None or req.metodo != 'GET':
+            return Resposta.erro(404)
+        return responder_variante(req, arquivo, [('Cache-Control', self.CACHE)], arquivo.tipo)
+
+def responder_variante(req, origem, cabecalhos, tipo):
+    """Escolhe entre corpo e corpo_gzip de origem (exame ou arquivo estático) e responde 200 ou 304
+
+    Cada variante tem sua ETag, para que um cache intermediário nunca
+    entregue a versão compactada a quem não aceita gzip (e vice-versa).
+    """
+    compactado = origem.corpo_gzip is not None and aceita_gzip(req)
+    etag = origem.etag_gzip if compactado else origem.etag
+    cabecalhos = [('ETag', etag)] + cabecalhos + [('Vary', 'Accept-Encoding')]
+    # Navegador já possui a versão atual
+    if etag_corresponde(req.cabecalhos.get('if-none-match'), etag):
+        return Resposta(304, cabecalhos)
+    cabecalhos.insert(0, ('Content-type', tipo))
+    if compactado:
+        return Resposta(200, cabecalhos + [('Content-Encoding', 'gzip')], origem.corpo_gzip)
+    return Resposta(200, cabecalhos, origem.corpo)
+
+# Junto do server.py, e não da pasta atual, para funcionar também embutido em outra aplicação
+arquivos_estaticos = ArquivosEstaticos(os.path.join(os.path.dirname(os.path.abspath(__file__)), STATIC_DIR))
+
+def rota_formulario(req, exame):
+    """Serve o formulário HTML"""
+    return responder_variante(req, exame, [('Cache-Control', 'no-cache')], 'text/html; charset=utf-8')
+
+def rota_enviar(req, exame):
+    """Recebe e salva as respostas do exame"""
+    try:
+        dados = json.loads(req.corpo)
+    except ValueError:  # JSON ou UTF-8 inválido
+        dados = None
+    try:
+        data = exame.esquema.validar(dados)
+    except ValueError as erro:
+        return Resposta.json({'success': False, 'erro': str(erro)}, 400)
+    try:
+        data_hora = gravar_envio(data, exame.id)
+    except ServidorOcupado:
+        return admissao.recusar('POST')
+    return Resposta.json({'success': True, 'data_hora': data_hora})
+
+def gravar_envio(data, exame_id):
+    """Grava um envio já validado uma única vez por id_envio e retorna a data/hora gravada
+
+    No modo prefork os workers repassam o envio ao processo principal, o
+    único que grava as respostas.
+    """
+    if escritor is not None:
+        return escritor.gravar_envio(data, exame_id)
+    with admissao.envio():
+        if data['id_envio'] is None:
+            # Página antiga, sem identificador: não há como reconhecer repetições
+            return salvar_resposta(data, exame_id)['data_hora']
+        dados = registro_exames.dados(exame_id)
+        data_hora, repetido = dados.envios.executar_uma_vez(
+            data['id_envio'], lambda: salvar_resposta(data, exame_id)['data_hora'])
+    if repetido:
+        print(f"🔁 Envio repetido ignorado: {data['nome']}")
+    dados.rascunhos.remover(data['id_envio'])
+    return data_hora
+
+def rota_salvar_rascunho(req, exame):
+    """Guarda as respostas parciais de uma avaliação em andamento"""
+    try:
+        dados = json.loads(req.corpo)
+    except ValueError:
+        dados = None
+    try:
+        rascunho = exame.esquema.validar_rascunho(dados)
+    except ValueError as erro:
+        return Resposta.json({'success': False, 'erro': str(erro)}, 400)
+    registro_exames.dados(exame.id).rascunhos.salvar(rascunho['id_envio'], rascunho['nome'], rascunho['respostas'])
+    return Resposta.json({'success': True})
+
+def rota_obter_rascunho(req, exame):
+    """Respostas parciais de uma avaliação em andamento (?id=<id_envio>)"""
+    rascunho = registro_exames.dados(exame.id).rascunhos.obter(req.query.get('id', ''))
+    resposta = Resposta.json(rascunho) if rascunho else Resposta.json({'erro': 'rascunho não encontrado'}, 404)
+    resposta.cabecalhos.append(('Cache-Control', 'no-store'))
+    return resposta
+
+def rota_comprovante(req, exame):
+    """Comprovante de participação em PDF (?nome=...&data_hora=AAAA-MM-DD HH:MM:SS)"""
+    nome = req.query.get('nome', '').strip()
+    if not nome:
+        return Resposta.erro(400)
+    try:
+        data_hora = datetime.strptime(req.query['data_hora'], '%Y-%m-%d %H:%M:%S')
+    except KeyError:
+        data_hora = datetime.now()
+    except ValueError:
+        return Resposta.erro(400)
+    arquivo = nome_arquivo_comprovante(nome)
+    return Resposta(200, [
+        ('Content-type', 'application/pdf'),
+        ('Content-Disposition', f'attachment; filename="{arquivo}"'),
+        ('Cache-Control', 'no-store'),
+    ], exame.comprovante.gerar(nome, data_hora))
+
+def rota_estatisticas(req, exame):
+    """Distribuição das respostas de múltipla escolha e envios por hora"""
+    return Resposta.json(registro_exames.dados(exame.id).estatisticas.resumo())
+
+def rota_exportar(req, exame):
+    """Respostas em CSV ou JSON Lines (?formato=csv|jsonl&desde=AAAA-MM-DD&ate=AAAA-MM-DD)
+
+    O arquivo é gerado enquanto é enviado (Transfer-Encoding: chunked): as
+    respostas são lidas do armazenamento aos poucos e a memória usada não
+    depende de quantas respostas existem.
+    """
+    formato = req.query.get('formato', 'csv').lower()
+    if formato not in FORMATOS_EXPORTACAO:
+        return Resposta.erro(400)
+    try:
+        inicio, fim = interpretar_periodo(req.query.get('desde'), req.query.get('ate'))
+    except ValueError:
+        return Resposta.erro(400)
+    registros = registro_exames.dados(exame.id).armazenamento.buscar_por_periodo(inicio, fim)
+    exportar = exportar_csv if formato == 'csv' else exportar_jsonl
+    arquivo = f"respostas_{exame.id or 'avaliacao'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{formato}"
+    return Resposta(200, [
+        ('Content-type', FORMATOS_EXPORTACAO[formato]),
+        ('Content-Disposition', f'attachment; filename="{arquivo}"'),
+        ('Cache-Control', 'no-store'),
+    ], exportar(registros, exame.perguntas))
+
+def rota_buscar(req, exame):
+    """Respostas abertas com as palavras procuradas (?q=backup firewall&questao=3&limite=50)"""
+    consulta = req.query.get('q', '').strip()
+    if not consulta:
+        return Resposta.json({'erro': 'informe as palavras em ?q='}, 400)
+    try:
+        questao = int(req.query['questao']) - 1 if req.query.get('questao') else None
+        limite = min(max(int(req.query.get('limite', LIMITE_BUSCA)), 1), LIMITE_BUSCA_MAXIMO)
+    except ValueError:
+        return Resposta.json({'erro': 'questao e limite devem ser números'}, 400)
+    inicio = time.perf_counter()
+    total, resultados = registro_exames.dados(exame.id).busca.buscar(consulta, questao, limite)
+    return Resposta.json({
+        'consulta': consulta,
+        'total': total,
+        'tempo_ms': round((time.perf_counter() - inicio) * 1000, 2),
+        'resultados': resultados,
+    })
+
+def rota_notas(req, exame):
+    """Notas da turma pelo gabarito do perguntas.txt e análise de cada questão"""
+    notas = registro_exames.dados(exame.id).correcao.corrigir()
+    if notas is None:
+        return Resposta.json({'erro': 'nenhuma alternativa marcada com [CORRETA] no perguntas.txt'}, 404)
+    return Resposta.json(notas)
+
+def rota_copias(req, exame):
+    """Grupos de respostas abertas muito parecidas entre si (?questao=3&minimo=0.8)"""
+    try:
+        questao = int(req.query['questao']) - 1 if req.query.get('questao') else None
+        minimo = float(req.query.get('minimo', COPIA_SIMILARIDADE))
+    except ValueError:
+        return Resposta.json({'erro': 'questao e minimo devem ser números'}, 400)
+    if not 0 < minimo <= 1:
+        return Resposta.json({'erro': 'minimo deve estar entre 0 e 1 (ex: 0.8)'}, 400)
+    inicio = time.perf_counter()
+    dados = registro_exames.dados(exame.id)
+    comparadas, grupos = dados.copias.grupos(questao, minimo)
+    documentos = dados.busca.documentos(envio for _, _, membros in grupos for envio, _ in membros)
+    return Resposta.json({
+        'minimo': minimo,
+        'respostas_comparadas': comparadas,
+        'pendentes': dados.copias.pendentes,
+        'tempo_ms': round((time.perf_counter() - inicio) * 1000, 2),
+        'grupos': [{
+            'questao': numero_questao + 1,
+            'semelhanca': round(semelhanca, 3),
+            'participantes': [{
+                'nome': documentos[envio][1],
+                'data_hora': documentos[envio][0],
+                'semelhanca': round(valor, 3),
+                'trecho': trecho_busca(documentos[envio][2].get(numero_questao, ''), []),
+            } for envio, valor in membros],
+        } for numero_questao, semelhanca, membros in grupos],
+    })
+
+# Rotas de cada exame: / e /formulario servem o exame padrão,
+# /exame/<id> e /exame/<id>/formulario servem o exame <id>, e assim por diante
+ROTAS = {
+    ('GET', '/'): rota_formulario,
+    ('GET', '/formulario'): rota_formulario,
+    ('POST', '/enviar'): rota_enviar,
+    ('GET', '/estatisticas'): rota_estatisticas,
+    ('GET', '/comprovante'): rota_comprovante,
+    ('GET', '/exportar'): rota_exportar,
+    ('GET', '/buscar'): rota_buscar,
+    ('GET', '/notas'): rota_notas,
+    ('GET', '/copias'): rota_copias,
+    ('POST', '/rascunho'): rota_salvar_rascunho,
+    ('GET', '/rascunho'): rota_obter_rascunho,
+}
+
+# Rotas do instrutor: expõem as respostas e as notas de todos os participantes,
+# então só atendem o próprio computador do servidor ou quem informar o TOKEN_ADMIN
+ROTAS_ADMIN = frozenset((rota_estatisticas, rota_exportar, rota_buscar, rota_notas, rota_copias))
+
+def acesso_admin(req):
+    """Indica se a requisição pode usar as rotas do instrutor (ROTAS_ADMIN)
+
+    Sempre liberado em localhost. De outros computadores, só com o
+    TOKEN_ADMIN do config.txt em ?token= ou no cabeçalho X-Token-Admin.
+    """
+    if req.cliente.startswith(('127.', '::ffff:127.')) or req.cliente == '::1':
+        return True
+    token = config_loader.get_token_admin()
+    informado = req.cabecalhos.get('x-token-admin') or req.query.get('token', '')
+    return bool(token) and hmac.compare_digest(informado.encode('utf-8'), token.encode('utf-8'))
+
+# Rotas que consultam ou alteram as respostas: no modo prefork são
+# atendidas pelo processo principal (os workers não abrem esses arquivos)
+ROTAS_DADOS = frozenset((rota_estatisticas, rota_exportar, rota_buscar, rota_notas, rota_copias,
+                         rota_salvar_rascunho, rota_obter_rascunho))
+
+def tamanho_corpo(cabecalhos):
+    """Confere o Content-Length antes de ler o corpo
+
+    Retorna (tamanho, None) ou (None, resposta de erro); nesse caso o corpo
+    não é lido e a conexão deve ser fechada.
+    """
+    valor = cabecalhos.get('content-length', '0').strip()
+    # isdigit() sozinho aceita dígitos Unicode ('²') que int() recusa
+    if 'transfer-encoding' in cabecalhos or not (valor.isascii() and valor.isdigit() and len(valor) <= 12):
+        erro = Resposta.erro(400)
+    elif int(valor) > config_loader.get_limite_envio() * 1024:
+        erro = Resposta.erro(413)
+    else:
+        return int(valor), None
+    metricas.registrar_requisicao('rejeitada', erro.status, 0.0, 0, len(erro.corpo))
+    return None, erro
+
+class ServidorOcupado(Exception):
+    """A fila de gravação das respostas está cheia (FILA_ENVIOS)"""
+
+class ControleAdmissao:
+    """Limita o trabalho aceito pelo servidor (usado por todos os motores)
+
+    Quando há max_requisicoes em andamento, ou max_envios aguardando a
+    gravação, as novas requisições recebem na hora um 503 com Retry-After
+    em vez de entrar em uma fila sem fim: quem já foi aceito continua
+    rápido e a página tenta de novo sozinha alguns segundos depois. Só os
+    envios que vão para o diário de respostas ocupam a fila de gravação;
+    rascunhos e outras rotas POST não.
+    """
+
+    def __init__(self, max_requisicoes, max_envios):
+        self._requisicoes = threading.BoundedSemaphore(max_requisicoes)
+        self._envios = threading.BoundedSemaphore(max_envios)
+
+    def entrar(self):
+        """Ocupa a vaga da requisição; False se o servidor está sobrecarregado"""
+        return self._requisicoes.acquire(blocking=False)
+
+    def sair(self):
+        self._requisicoes.release()
+
+    @contextmanager
+    def envio(self):
+        """Ocupa uma vaga da fila de gravação enquanto o envio é gravado (ServidorOcupado se cheia)"""
+        if not self._envios.acquire(blocking=False):
+            raise ServidorOcupado()
+        try:
+            yield
+        finally:
+            self._envios.release()
+
+    def recusar(self, metodo):
+        """Resposta 503 para o servidor sobrecarregado (a página recarrega ou reenvia sozinha)"""
+        cabecalhos = [('Retry-After', str(TENTAR_NOVAMENTE)), ('Cache-Control', 'no-store')]
+        if metodo == 'GET':
+            resposta = Resposta(503, cabecalhos + [('Content-type', 'text/html; charset=utf-8')], (
+                f'<!DOCTYPE html><meta charset="utf-8"><meta http-equiv="refresh" content="{TENTAR_NOVAMENTE}">'
+                '<p>Servidor ocupado. A página será carregada em instantes...</p>').encode('utf-8'))
+        else:
+            resposta = Resposta.json({'success': False, 'erro': 'servidor ocupado'}, 503)
+            resposta.cabecalhos += cabecalhos
+        metricas.registrar_requisicao('sobrecarga', 503, 0.0, 0, len(resposta.corpo))
+        return resposta
+
+def rota_metricas(req):
+    """Métricas do servidor no formato do Prometheus"""
+    return Resposta(200, [('Content-type', 'text/plain; version=0.0.4; charset=utf-8')],
+                    metricas.exportar().encode('utf-8'))
+
+def atender_requisicao(req):
+    """Encaminha a requisição para a rota correspondente (usado pelos dois motores)"""
+    inicio = time.perf_counter()
+    rota, resposta = _encaminhar(req)
+    if isinstance(resposta.corpo, bytes):
+        metricas.registrar_requisicao(rota, resposta.status, time.perf_counter() - inicio,
+                                      len(req.corpo), len(resposta.corpo))
+    else:
+        resposta.corpo = _medir_transmissao(resposta.corpo, rota, resposta.status, inicio, len(req.corpo))
+    return resposta
+
+def _medir_transmissao(partes, rota, status, inicio, recebidos):
+    """Repassa um corpo gerado aos poucos e registra as métricas quando o envio termina"""
+    enviados = 0
+    try:
+        for parte in partes:
+            enviados += len(parte)
+            yield parte
+    finally:
+        partes.close()
+        metricas.registrar_requisicao(rota, status, time.perf_counter() - inicio, recebidos, enviados)
+
+def separar_exame(caminho):
+    """(id do exame, caminho da rota): /exame/<id>/estatisticas → ('<id>', '/estatisticas')"""
+    if caminho.startswith('/exame/'):
+        exame_id, _, resto = caminho[len('/exame/'):].partition('/')
+        return exame_id, '/' + resto
+    return EXAME_PADRAO, caminho
+
+def atendida_da_memoria(req):
+    """Indica se a requisição é de um arquivo estático ou do formulário (respostas prontas em memória)"""
+    if req.caminho.startswith(STATIC_URL):
+        return True
+    return ROTAS.get((req.metodo, separar_exame(req.caminho)[1])) is rota_formulario
+
+def _encaminhar(req):
+    """Retorna (rota usada nas métricas, resposta)"""
+    caminho = req.caminho
+    if caminho.startswith(STATIC_URL):
+        return STATIC_URL, arquivos_estaticos.responder(req)
+    if caminho == '/metrics':
+        if escritor is not None:
+            # Modo prefork: o processo principal soma as métricas de todos os workers
+            return caminho, escritor.encaminhar(req)
+        return caminho, rota_metricas(req)
+    exame_id, caminho = separar_exame(caminho)
+    
+    rota = ROTAS.get((req.metodo, caminho))
+    if rota is None:
+        # Caminhos desconhecidos ficam juntos, para não criar uma métrica por URL
+        return 'desconhecida', Resposta.erro(404)
+    try:
+        exame = registro_exames.obter(exame_id)
+        if exame is None:
+            return caminho, Resposta.erro(404)
+        if rota in ROTAS_ADMIN and not acesso_admin(req):
+            return caminho, Resposta.erro(403)
+        if escritor is not None and rota in ROTAS_DADOS:
+            # Modo prefork: as respostas dos exames ficam no processo principal
+            return caminho, escritor.encaminhar(req)
+        return caminho, rota(req, exame)
+    except Exception:
+        traceback.print_exc()
+        return caminho, Resposta.erro(500)
+
+class BigCardHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 mantém a conexão aberta entre requisições (keep-alive)
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
+    # Cabeçalhos e corpo saem em duas escritas: com o algoritmo de Nagle, a
+    # segunda esperaria o ACK atrasado do cliente (cerca de 40 ms)
+    disable_nagle_algorithm = True
+    
+    def handle(self):
+        """Atende as requisições que já chegaram pela conexão
+
+        Sem outra requisição à espera, retorna com close_connection falso e
+        ServidorConcorrente aguarda a próxima sem ocupar este worker.
+        """
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and self._requisicao_pendente():
+            self.handle_one_request()
+
+    def _requisicao_pendente(self):
+        """Indica, sem esperar, se a próxima requisição já chegou (está no buffer ou no socket)"""
+        self.connection.setblocking(False)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            self.close_connection = True
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def do_GET(self):
+        self._processar('GET')
+    
+    def do_POST(self):
+        self._processar('POST')
+    
+    def _processar(self, metodo):
+        cabecalhos = {chave.lower(): valor for chave, valor in self.headers.items()}
+        tamanho, resposta = 0, None
+        if metodo == 'POST':
+            tamanho, resposta = tamanho_corpo(cabecalhos)
+        if resposta is None and not admissao.entrar():
+            resposta = admissao.recusar(metodo)
+        
+        if resposta is None:
+            try:
+                corpo = self.rfile.read(tamanho)
+                resposta = atender_requisicao(Requisicao(metodo, self.path, cabecalhos, corpo,
+                                                         self.client_address[0]))
+            finally:
+                admissao.sair()
+        elif metodo == 'POST':
+            # O corpo recusado não foi lido: a conexão não pode ser reaproveitada
+            resposta.cabecalhos.append(('Connection', 'close'))
+        
+        self.send_response(resposta.status)
+        for chave, valor in resposta.cabecalhos:
+            self.send_header(chave, valor)
+        if not isinstance(resposta.corpo, bytes):
+            self._transmitir(resposta.corpo)
+            return
+        if resposta.status != 304:
+            self.send_header('Content-Length', str(len(resposta.corpo)))
+        self.end_headers()
+        self.wfile.write(resposta.corpo)
+    
+    def _transmitir(self, partes):
+        """Envia as partes à medida que são geradas (chunked; HTTP/1.0 até fechar a conexão)"""
+        em_partes = self.request_version == 'HTTP/1.1'
+        if em_partes:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        try:
+            for parte in partes:
+                if parte:
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(parte), parte) if em_partes else parte)
+            if em_partes:
+                self.wfile.write(b'0\r\n\r\n')
+        except ConnectionError:
+            self.close_connection = True  # Cliente desistiu do download
+        except Exception:
+            # Sem a parte final o cliente percebe que o arquivo ficou incompleto
+            traceback.print_exc()
+            self.close_connection = True
+        finally:
+            partes.close()
+    
+    def log_message(self, format, *args):
+        pass
+
+class ServidorAsyncio:
+    """Motor de servidor baseado em asyncio
+
+    Atende milhares de conexões simultâneas em uma única thread (sem uma
+    thread do sistema por conexão). Só os arquivos estáticos e o formulário,
+    que já estão em memória, são respondidos no próprio loop de eventos; as
+    demais rotas (gravação, estatísticas, notas, comprovantes...) rodam em
+    um pool de threads separado, sem atrasar as outras conexões.
+    """
+
+    def __init__(self, endereco, workers, reutilizar_porta=False):
+        self.endereco = endereco
+        self.reutilizar_porta = reutilizar_porta
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='disco')
+
+    def serve_forever(self):
+        import asyncio  # Só quando este motor é usado (a importação leva dezenas de ms)
+        asyncio.run(self._executar())
+
+    def server_close(self):
+        self.pool.shutdown(wait=True)
+
+    async def _executar(self):
+        import asyncio
+        host, porta = self.endereco
+        servidor = await asyncio.start_server(self._atender_conexao, host, porta, backlog=1024,
+                                              reuse_port=self.reutilizar_porta or None)
+        async with servidor:
+            await servidor.serve_forever()
+
+    async def _atender_conexao(self, reader, writer):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        cliente = (writer.get_extra_info('peername') or ('',))[0]
+        metricas.conexao_aberta()
+        try:
+            while True:
+                linha = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+                if not linha.strip():
+                    break
+                # Cabeçalhos enviados aos poucos também não podem prender a conexão
+                erro, metodo, alvo, versao, cabecalhos = await asyncio.wait_for(
+                    self._ler_cabecalhos(linha, reader), KEEPALIVE_TIMEOUT)
+                if erro is not None:
+                    # Mesmas recusas do motor de threads (BaseHTTPRequestHandler)
+                    writer.write(serializar_resposta(Resposta.erro(erro), False))
+                    await writer.drain()
+                    break
+                
+                manter_conexao = (versao == 'HTTP/1.1'
+                                  and cabecalhos.get('connection', '').lower() != 'close')
+                tamanho, resposta = 0, None
+                if metodo == 'POST':
+                    tamanho, resposta = tamanho_corpo(cabecalhos)
+                if resposta is None and not admissao.entrar():
+                    resposta = admissao.recusar(metodo)
+                
+                if resposta is None:
+                    try:
+                        corpo = await reader.readexactly(tamanho) if tamanho else b''
+                        req = Requisicao(metodo, alvo, cabecalhos, corpo, cliente)
+                        if atendida_da_memoria(req):
+                            resposta = atender_requisicao(req)
+                        else:
+                            # Disco, CPU ou espera pelo processo principal (prefork): fora do loop
+                            resposta = await loop.run_in_executor(self.pool, atender_requisicao, req)
+                    finally:
+                        admissao.sair()
+                elif metodo == 'POST':
+                    # O corpo recusado não foi lido: a conexão não pode ser reaproveitada
+                    manter_conexao = False
+                
+                writer.write(serializar_resposta(resposta, manter_conexao))
+                await writer.drain()
+                if not isinstance(resposta.corpo, bytes):
+                    await self._transmitir(writer, resposta.corpo, manter_conexao)
+                if not manter_conexao:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            metricas.conexao_fechada()
+            writer.close()
+
+    @staticmethod
+    async def _ler_cabecalhos(linha, reader):
+        """Retorna (status de erro ou None, método, alvo, versão, cabeçalhos)"""
+        partes = linha.decode('latin-1').split()
+        if len(partes) != 3 or not partes[2].startswith('HTTP/'):
+            return 400, None, None, None, None
+        metodo, alvo, versao = partes
+        cabecalhos = {}
+        while True:
+            linha = await reader.readline()
+            if linha in (b'\r\n', b'\n', b''):
+                break
+            if len(cabecalhos) >= MAX_CABECALHOS:
+                return 431, None, None, None, None
+            chave, _, valor = linha.decode('latin-1').partition(':')
+            cabecalhos[chave.strip().lower()] = valor.strip()
+        if metodo not in ('GET', 'POST'):
+            return 501, None, None, None, None
+        return None, metodo, alvo, versao, cabecalhos
+
+    async def _transmitir(self, writer, partes, em_partes):
+        """Envia as partes à medida que são geradas (chunked; HTTP/1.0 até fechar a conexão)"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                # O gerador lê o disco: roda no pool, fora do loop de eventos
+                parte = await loop.run_in_executor(self.pool, next, partes, None)
+                if parte is None:
+                    break
+                if parte:
+                    writer.write(b'%x\r\n%s\r\n' % (len(parte), parte) if em_partes else parte)
+                    # Só gera a próxima parte depois que o cliente recebeu esta
+                    await writer.drain()
+            if em_partes:
+                writer.write(b'0\r\n\r\n')
+                await writer.drain()
+        except Exception as e:
+            if not isinstance(e, ConnectionError):
+                traceback.print_exc()
+            raise ConnectionError('transmissão interrompida') from e
+        finally:
+            partes.close()
+
+JANELA_TRANSMISSAO = 8  # Partes de uma resposta longa enviadas ao worker antes de ele confirmar
+
+class CanalEscritor:
+    """Ligação de um worker do modo prefork com o processo principal
+
+    Cada chamada ganha um número e uma fila; uma thread recebe as respostas
+    do pipe e as entrega na fila certa, então várias requisições do worker
+    esperam o processo principal ao mesmo tempo. Respostas geradas aos
+    poucos (ex: /exportar) chegam em partes: o worker confirma cada parte
+    recebida e o processo principal só se adianta JANELA_TRANSMISSAO partes.
+    """
+
+    def __init__(self, conexao):
+        self._conexao = conexao
+        self._lock = threading.Lock()
+        self._numeros = itertools.count()
+        self._pendentes = {}  # número da chamada -> queue.Queue
+        threading.Thread(target=self._receber, name='escritor', daemon=True).start()
+
+    def _enviar(self, mensagem):
+        with self._lock:
+            self._conexao.send(mensagem)
+
+    def _chamar(self, tipo, *argumentos):
+        fila = queue.Queue()
+        with self._lock:
+            numero = next(self._numeros)
+            self._pendentes[numero] = fila
+            self._conexao.send((tipo, numero) + argumentos)
+        return numero, fila
+
+    def _receber(self):
+        try:
+            while True:
+                numero, *mensagem = self._conexao.recv()
+                if numero is None:
+                    # Pedido do processo principal: os contadores deste worker para /metrics
+                    self._enviar(('metricas', mensagem[0], metricas.estado()))
+                    continue
+                fila = self._pendentes.get(numero)
+                if fila is not None:
+                    fila.put(mensagem)
+        except (EOFError, OSError):
+            # Processo principal encerrado: o worker não tem mais onde gravar
+            os._exit(1)
+
+    def avisar_pronto(self):
+        self._enviar(('pronto', None))
+
+    def gravar_envio(self, data, exame_id):
+        numero, fila = self._chamar('enviar', data, exame_id)
+        try:
+            tipo, valor = fila.get()
+        finally:
+            del self._pendentes[numero]
+        if tipo == 'ocupado':
+            raise ServidorOcupado()
+        if tipo == 'erro':
+            raise RuntimeError(f'processo principal: {valor}')
+        return valor
+
+    def encaminhar(self, req):
+        """Resposta do processo principal para uma rota de ROTAS_DADOS"""
+        numero, fila = self._chamar('rota', req)
+        tipo, *mensagem = fila.get()
+        if tipo == 'inicio':
+            status, cabecalhos = mensagem
+            return Resposta(status, cabecalhos, self._partes(numero, fila))
+        del self._pendentes[numero]
+        if tipo == 'erro':
+            raise RuntimeError(f'processo principal: {mensagem[0]}')
+        return Resposta(*mensagem)
+
+    def _partes(self, numero, fila):
+        terminou = False
+        try:
+            while True:
+                tipo, *mensagem = fila.get()
+                if tipo != 'parte':
+                    terminou = True
+                    return
+                self._enviar(('continuar', numero))
+                yield mensagem[0]
+        finally:
+            del self._pendentes[numero]
+            if not terminou:
+                # Cliente desconectou: o processo principal para de gerar as partes
+                self._enviar(('cancelar', numero))
+
+escritor = None  # CanalEscritor nos workers do modo prefork
+
+class _Transmissao:
+    """Resposta gerada aos poucos sendo repassada a um worker"""
+    __slots__ = ('janela', 'cancelada')
+
+    def __init__(self):
+        self.janela = threading.Semaphore(JANELA_TRANSMISSAO)
+        self.cancelada = False
+
+    def cancelar(self):
+        self.cancelada = True
+        self.janela.release()
+
+def executar_worker(conexao, pasta, endereco, motor, workers):
+    """Processo worker do modo prefork (iniciado por ServidorPrefork)"""
+    global escritor
+    criar_aplicacao(pasta)
+    # Ctrl+C chega a todos os processos: quem encerra os workers é o processo principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: signal.default_int_handler(signal.SIGINT, None))
+    escritor = CanalEscritor(conexao)
+    server = criar_servidor(motor, endereco, workers, reutilizar_porta=True)
+    escritor.avisar_pronto()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+class ServidorPrefork:
+    """Vários processos atendendo na mesma porta, com um único processo gravando
+
+    Por causa do GIL, um processo Python usa um núcleo de cada vez para
+    montar páginas e comprovantes e decodificar JSON. Neste modo, cada
+    processo worker roda o motor configurado e abre a mesma porta
+    (SO_REUSEPORT), e o sistema divide as conexões entre eles. Os workers
+    validam os envios e os repassam por um pipe a este processo, o único que
+    abre os arquivos de respostas: ele grava na ordem em que os envios
+    chegam e também atende as rotas de ROTAS_DADOS. Um worker que terminar
+    inesperadamente é iniciado de novo.
+    """
+
+    ESPERA_REINICIO = 1  # Segundos antes de iniciar um worker que terminou
+    ESPERA_METRICAS = 1  # Segundos esperando os contadores de cada worker para /metrics
+
+    def __init__(self, endereco, motor, workers, processos):
+        self.endereco = endereco
+        self.motor = motor
+        self.workers = workers
+        self.processos = processos
+        self.pool = ThreadPoolExecutor(max_workers=workers * processos, thread_name_prefix='escritor')
+        import multiprocessing  # Só no modo prefork
+        # spawn: os workers começam do zero, sem herdar as threads deste processo
+        self._contexto = multiprocessing.get_context('spawn')
+        self._filhos = [None] * processos  # (processo, evento "pronto")
+        self._canais = [None] * processos  # (pipe, lock de envio) de cada worker
+        self._numeros = itertools.count()
+        self._pedidos_metricas = {}  # número do pedido -> queue.Queue com o estado() de cada worker
+
+    def _iniciar_worker(self, posicao):
+        local, remoto = self._contexto.Pipe()
+        processo = self._contexto.Process(target=executar_worker, name=f'worker-{posicao + 1}', daemon=True,
+                                          args=(remoto, registro_exames.raiz, self.endereco, self.motor,
+                                                self.workers))
+        processo.start()
+        remoto.close()
+        pronto = threading.Event()
+        lock = threading.Lock()
+        threading.Thread(target=self._atender_worker, args=(local, lock, pronto),
+                         name=f'escritor-{posicao + 1}', daemon=True).start()
+        self._filhos[posicao] = (processo, pronto)
+        self._canais[posicao] = (local, lock)
+
+    def estados_workers(self):
+        """metricas.estado() de cada worker (os que responderem em ESPERA_METRICAS segundos)"""
+        numero = next(self._numeros)
+        fila = self._pedidos_metricas[numero] = queue.Queue()
+        pedidos = 0
+        for conexao, lock in filter(None, self._canais):
+            try:
+                with lock:
+                    conexao.send((None, numero))
+                pedidos += 1
+            except OSError:
+                pass  # Worker terminando; será iniciado de novo
+        estados = []
+        limite = time.monotonic() + self.ESPERA_METRICAS
+        try:
+            while len(estados) < pedidos:
+                estados.append(fila.get(timeout=max(0, limite - time.monotonic())))
+        except queue.Empty:
+            pass
+        finally:
+            del self._pedidos_metricas[numero]
+        return estados
+
+    def serve_forever(self):
+        import multiprocessing.connection
+        metricas.outros_processos = self.estados_workers
+        for posicao in range(self.processos):
+            self._iniciar_worker(posicao)
+        for processo, pronto in self._filhos:
+            while not pronto.wait(0.1):
+                if not processo.is_alive():
+                    print(f"❌ O worker {processo.pid} não conseguiu abrir a porta {self.endereco[1]} "
+                          f"(código {processo.exitcode})")
+                    return
+        while True:
+            multiprocessing.connection.wait([processo.sentinel for processo, _ in self._filhos])
+            for posicao, (processo, _) in enumerate(self._filhos):
+                if not processo.is_alive():
+                    print(f"⚠️  Worker {processo.pid} terminou inesperadamente (código {processo.exitcode}); "
+                          f"iniciando outro")
+                    time.sleep(self.ESPERA_REINICIO)
+                    self._iniciar_worker(posicao)
+
+    def server_close(self):
+        for processo, _ in filter(None, self._filhos):
+            if processo.is_alive():
+                processo.terminate()
+        for processo, _ in filter(None, self._filhos):
+            processo.join()
+        self.pool.shutdown(wait=True)
+
+    def _atender_worker(self, conexao, lock, pronto):
+        """Recebe as chamadas de um worker até ele terminar"""
+        transmissoes = {}
+        try:
+            while True:
+                tipo, numero, *argumentos = conexao.recv()
+                if tipo == 'pronto':
+                    pronto.set()
+                elif tipo == 'metricas':
+                    fila = self._pedidos_metricas.get(numero)
+                    if fila is not None:
+                        fila.put(argumentos[0])
+                elif tipo in ('continuar', 'cancelar'):
+                    transmissao = transmissoes.get(numero)
+                    if transmissao is None:
+                        continue  # A resposta já terminou
+                    if tipo == 'continuar':
+                        transmissao.janela.release()
+                    else:
+                        transmissao.cancelar()
+                else:
+                    if tipo == 'rota':
+                        transmissoes[numero] = _Transmissao()
+                    self.pool.submit(self._executar, conexao, lock, transmissoes, tipo, numero, argumentos)
+        except (EOFError, OSError):
+            pass
+        finally:
+            for transmissao in list(transmissoes.values()):
+                transmissao.cancelar()
+            conexao.close()
+
+    def _executar(self, conexao, lock, transmissoes, tipo, numero, argumentos):
+        def responder(*mensagem):
+            with lock:
+                conexao.send((numero,) + mensagem)
+
+        try:
+            if tipo == 'enviar':
+                try:
+                    responder('ok', gravar_envio(*argumentos))
+                except ServidorOcupado:
+                    responder('ocupado', None)
+                return
+            transmissao = transmissoes[numero]
+            _, resposta = _encaminhar(*argumentos)
+            if isinstance(resposta.corpo, bytes):
+                responder('resposta', resposta.status, resposta.cabecalhos, resposta.corpo)
+                return
+            responder('inicio', resposta.status, resposta.cabecalhos)
+            try:
+                for parte in resposta.corpo:
+                    transmissao.janela.acquire()
+                    if transmissao.cancelada:
+                        return
+                    responder('parte', parte)
+                responder('fim')
+            finally:
+                resposta.corpo.close()
+        except (EOFError, OSError):
+            pass  # Worker terminou no meio da resposta
+        except Exception as e:
+            traceback.print_exc()
+            try:
+                responder('erro', str(e))
+            except OSError:
+                pass
+        finally:
+            transmissoes.pop(numero, None)
+
+def criar_servidor(motor, endereco, workers, reutilizar_porta=False):
+    """Servidor HTTP do motor escolhido (threads ou asyncio), ainda sem atender conexões"""
+    if 'registro_exames' not in globals():
+        criar_aplicacao()
+    if motor == 'asyncio':
+        return ServidorAsyncio(endereco, workers, reutilizar_porta)
+    return ServidorConcorrente(endereco, BigCardHandler, workers, reutilizar_porta,
+                               config_loader.get_max_requisicoes())
+
+def criar_aplicacao(pasta='.'):
+    """Prepara o servidor com o config.txt, o perguntas.txt e os exames de pasta
+
+    Só lê as configurações: os exames são compilados e as respostas abertas
+    no primeiro acesso, então a importação do módulo e esta função não
+    imprimem nada (além de avisos sobre o config.txt), não encerram o
+    processo nem acessam a rede. Chamar de novo (ex: em testes) grava as
+    respostas pendentes e recomeça com as novas configurações.
+
+    Retorna a aplicação WSGI; para os motores embutidos use criar_servidor().
+    """
+    global config_loader, registro_exames, admissao
+    anterior = globals().get('registro_exames')
+    if anterior is not None:
+        anterior.encerrar()
+    else:
+        # Servidores WSGI não chamam encerrar(): grava o que estiver pendente ao sair
+        atexit.register(lambda: registro_exames.encerrar())
+    config_loader = ConfigLoader(os.path.join(pasta, CONFIG_FILE))
+    registro_exames = RegistroExames(os.path.join(pasta, EXAMS_DIR), config_loader, pasta)
+    admissao = ControleAdmissao(config_loader.get_max_requisicoes(), config_loader.get_fila_envios())
+    return aplicacao_wsgi
+
+def __getattr__(nome):
+    # Scripts que usam server.registro_exames ou server.config_loader direto
+    # recebem a aplicação da pasta atual, criada no primeiro acesso
+    if nome in ('config_loader', 'registro_exames', 'admissao'):
+        criar_aplicacao()
+        return globals()[nome]
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+def aplicacao_wsgi(environ, start_response):
+    """As mesmas rotas dos motores embutidos como aplicação WSGI (PEP 3333)
+
+    Permite rodar o formulário em outro servidor ou chamá-lo direto em
+    testes, sem abrir portas. Só um processo pode atender cada pasta de
+    respostas (ex: gunicorn --workers 1 --threads 16 server:aplicacao_wsgi):
+    o diário, os índices e os rascunhos de cada processo gravariam nos
+    mesmos arquivos sem nenhuma coordenação. Para usar vários núcleos, use
+    o modo prefork (--processos), em que só o processo principal grava.
+    """
+    if 'registro_exames' not in globals():
+        criar_aplicacao()
+    metodo = environ['REQUEST_METHOD']
+    cabecalhos = {chave[5:].replace('_', '-').lower(): valor
+                  for chave, valor in environ.items() if chave.startswith('HTTP_')}
+    for chave in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+        if environ.get(chave):
+            cabecalhos[chave.replace('_', '-').lower()] = environ[chave]
+    alvo = environ.get('PATH_INFO') or '/'
+    if environ.get('QUERY_STRING'):
+        alvo += '?' + environ['QUERY_STRING']
+
+    tamanho, resposta = 0, None
+    if metodo == 'POST':
+        tamanho, resposta = tamanho_corpo(cabecalhos)
+    if resposta is None and not admissao.entrar():
+        resposta = admissao.recusar(metodo)
+    if resposta is None:
+        try:
+            corpo = environ['wsgi.input'].read(tamanho) if tamanho else b''
+            resposta = atender_requisicao(Requisicao(metodo, alvo, cabecalhos, corpo,
+                                                     environ.get('REMOTE_ADDR', '')))
+        finally:
+            admissao.sair()
+
+    cabecalhos_resposta = list(resposta.cabecalhos)
+    corpo = resposta.corpo
+    if isinstance(corpo, bytes):
+        if resposta.status != 304:
+            cabecalhos_resposta.append(('Content-Length', str(len(corpo))))
+        corpo = [corpo]
+    start_response(f'{resposta.status} {HTTPStatus(resposta.status).phrase}', cabecalhos_resposta)
+    return corpo
+
+class _PedidoGravacao:
+    """Resposta aguardando gravação pelo diário"""
+    __slots__ = ('dados', 'meta', 'concluido', 'erro')
+
+    def __init__(self, dados, meta):
+        self.dados = dados
+        self.meta = meta
+        self.concluido = threading.Event()
+        self.erro = None
+
+class DiarioRespostas:
+    """Grava as respostas em segundo plano, agrupadas em lotes (group commit)
+
+    As threads de atendimento apenas enfileiram os bytes e aguardam. Uma
+    única thread de gravação junta tudo o que chegou enquanto o lote anterior
+    era gravado e escreve o lote inteiro de uma vez. Cada requisição só é
+    confirmada depois que o seu lote foi gravado, conforme a durabilidade:
+
+    - nenhuma: uma escrita por lote, sem fsync (o sistema operacional decide
+      quando os dados vão para o disco)
+    - lote: uma escrita e um fsync por lote
+    - cada: uma escrita e um fsync por resposta
+
+    Se informado, apos_lote(posicao, pedidos) é chamado na thread de gravação
+    logo após cada lote, com a posição do arquivo onde o lote começou.
+    """
+
+    def __init__(self, caminho, durabilidade='lote', tamanho_lote=256, apos_lote=None):
+        self.caminho = caminho
+        self.durabilidade = durabilidade
+        self.tamanho_lote = tamanho_lote
+        self.apos_lote = apos_lote
+        self._fila = queue.Queue()
+        self._thread = threading.Thread(target=self._executar, name='diario', daemon=True)
+        self._thread.start()
+
+    def gravar(self, dados, meta=None):
+        """Enfileira os bytes e aguarda até que estejam gravados no arquivo"""
+        self.gravar_varios([(dados, meta)])
+
+    def gravar_varios(self, itens):
+        """Enfileira vários (dados, meta) de uma vez e aguarda a gravação de todos"""
+        pedidos = [_PedidoGravacao(dados, meta) for dados, meta in itens]
+        for pedido in pedidos:
+            self._fila.put(pedido)
+        for pedido in pedidos:
+            pedido.concluido.wait()
+            if pedido.erro is not None:
+                raise pedido.erro
+
+    def encerrar(self):
+        """Grava tudo o que ainda está na fila e finaliza a thread de gravação"""
+        self._fila.put(None)
+        self._thread.join()
+
+    def _executar(self):
+        arquivo = None
+        encerrando = False
+        while not encerrando:
+            pedido = self._fila.get()
+            lote = []
+            while pedido is not None:
+                lote.append(pedido)
+                if len(lote) >= self.tamanho_lote:
+                    break
+                try:
+                    pedido = self._fila.get_nowait()
+                except queue.Empty:
+                    break
+            encerrando = pedido is None
+            if lote:
+                arquivo = self._gravar_lote(arquivo, lote)
+        if arquivo is not None:
+            arquivo.close()
+
+    def _arquivo_do_lote(self, arquivo, lote):
+        """Arquivo onde o lote será gravado (o diário segmentado troca de arquivo aqui)"""
+        return arquivo or open(self.caminho, 'ab', buffering=0)
+
+    def _gravar_lote(self, arquivo, lote):
+        """Grava o lote e retorna o arquivo aberto para os próximos lotes"""
+        try:
+            arquivo = self._arquivo_do_lote(arquivo, lote)
+            posicao = arquivo.tell()
+            if self.durabilidade == 'cada':
+                for pedido in lote:
+                    self._escrever(arquivo, pedido.dados)
+                    os.fsync(arquivo.fileno())
+            else:
+                self._escrever(arquivo, b''.join(pedido.dados for pedido in lote))
+                if self.durabilidade == 'lote':
+                    os.fsync(arquivo.fileno())
+            if self.apos_lote is not None:
+                self.apos_lote(posicao, lote)
+        except OSError as e:
+            for pedido in lote:
+                pedido.erro = e
+        for pedido in lote:
+            pedido.concluido.set()
+        return arquivo
+
+    def _escrever(self, arquivo, dados):
+        visao = memoryview(dados)
+        while visao:
+            visao = visao[arquivo.write(visao):]
+
+class SegmentosRespostas:
+    """Respostas em texto divididas em segmentos (um arquivo por dia ou por tamanho)
+
+    O manifesto (manifesto.json) lista os segmentos na ordem de gravação,
+    com a data/hora da primeira e da última resposta, o número de respostas
+    e o tamanho de cada um. Só o último segmento recebe respostas novas; ao
+    trocar de segmento, o anterior é selado e compactado com gzip por uma
+    thread em segundo plano. A leitura de um período abre apenas os
+    segmentos que o cobrem, e um backup só precisa copiar os segmentos novos.
+
+    Com somente_leitura, só lê o manifesto e os segmentos (não compacta,
+    não apaga nem grava nada), para ler as respostas com o servidor rodando.
+    """
+
+    def __init__(self, pasta, rotacao, tamanho_maximo, somente_leitura=False):
+        self.pasta = pasta
+        self.rotacao = rotacao
+        self.tamanho_maximo = tamanho_maximo
+        self.caminho_manifesto = os.path.join(pasta, MANIFEST_FILE)
+        self.somente_leitura = somente_leitura
+        self._lock = threading.Lock()
+        if somente_leitura:
+            self._segmentos = self._carregar_manifesto()
+            return
+        os.makedirs(pasta, exist_ok=True)
+        self._segmentos = self._carregar_manifesto()
+        self._compactacao = queue.Queue()
+        self._thread = threading.Thread(target=self._compactar_selados, name='compactacao', daemon=True)
+        self._thread.start()
+        for segmento in self._segmentos:
+            if segmento['selado'] and not segmento['arquivo'].endswith('.gz'):
+                self._compactacao.put(segmento)
+
+    def _caminho(self, arquivo):
+        return os.path.join(self.pasta, arquivo)
+
+    def _carregar_manifesto(self):
+        if not os.path.exists(self.caminho_manifesto):
+            return []
+        with open(self.caminho_manifesto, encoding='utf-8') as f:
+            segmentos = json.load(f)['segmentos']
+        arquivos = {segmento['arquivo'] for segmento in segmentos}
+        for segmento in segmentos:
+            arquivo = segmento['arquivo']
+            if (not self.somente_leitura and arquivo.endswith('.gz') and arquivo[:-3] not in arquivos
+                    and os.path.exists(self._caminho(arquivo[:-3]))):
+                # A compactação terminou mas o original não chegou a ser apagado
+                os.remove(self._caminho(arquivo[:-3]))
+        if segmentos and not segmentos[-1]['selado']:
+            # O período do segmento ativo só é gravado ao trocar de segmento
+            # ou ao parar o servidor: confere o arquivo (ex: queda de energia)
+            segmentos[-1].update(self._periodo(self._caminho(segmentos[-1]['arquivo'])))
+        return segmentos
+
+    def _salvar_manifesto(self):
+        """Grava o manifesto de forma atômica (arquivo temporário + rename)"""
+        temporario = self.caminho_manifesto + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'segmentos': self._segmentos}, f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.caminho_manifesto)
+
+    def _periodo(self, caminho):
+        """Primeira e última data/hora, respostas e bytes de um segmento em texto"""
+        periodo = {'inicio': None, 'fim': None, 'respostas': 0, 'bytes': 0}
+        if not os.path.exists(caminho) or os.path.getsize(caminho) == 0:
+            return periodo
+        with open(caminho, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            periodo['bytes'] = len(mm)
+            marcador = SEPARADOR_TXT + b'DATA/HORA: '
+            posicao = mm.find(marcador)
+            while posicao != -1:
+                inicio = posicao + len(marcador)
+                data_hora = mm[inicio:inicio + 19].decode('ascii', 'replace')
+                periodo['inicio'] = min(periodo['inicio'] or data_hora, data_hora)
+                periodo['fim'] = max(periodo['fim'] or data_hora, data_hora)
+                periodo['respostas'] += 1
+                posicao = mm.find(marcador, inicio)
+        return periodo
+
+    def _proximo_numero(self):
+        return max((int(segmento['arquivo'][:6]) for segmento in self._segmentos), default=0) + 1
+
+    def adotar(self, caminho):
+        """Move um respostas.txt existente para a pasta como um segmento selado
+
+        O segmento entra na ordem da data/hora da sua primeira resposta: um
+        respostas.txt de antes da rotação fica antes dos segmentos, e um
+        gravado enquanto a rotação esteve desligada, depois deles.
+        """
+        with self._lock:
+            arquivo = f"{self._proximo_numero():06d}-anterior.txt"
+            os.replace(caminho, self._caminho(arquivo))
+            segmento = {'arquivo': arquivo, 'selado': True, **self._periodo(self._caminho(arquivo))}
+            posicao = len(self._segmentos)
+            if segmento['inicio'] is not None:
+                posicao = 0
+                for i, outro in enumerate(self._segmentos):
+                    if outro['inicio'] is not None and outro['inicio'] <= segmento['inicio']:
+                        posicao = i + 1
+            if posicao == len(self._segmentos) and self._segmentos and not self._segmentos[-1]['selado']:
+                # As próximas respostas vão para um segmento novo, depois do adotado
+                self._segmentos[-1]['selado'] = True
+                self._compactacao.put(self._segmentos[-1])
+            self._segmentos.insert(posicao, segmento)
+            self._salvar_manifesto()
+        self._compactacao.put(segmento)
+        print(f"📦 {caminho} movido para {self._caminho(arquivo)} ({segmento['respostas']} respostas)")
+
+    def arquivo_para(self, arquivo, data_hora):
+        """Arquivo do segmento ativo para um lote que começa em data_hora (troca de segmento se preciso)"""
+        with self._lock:
+            ativo = self._segmentos[-1] if self._segmentos and not self._segmentos[-1]['selado'] else None
+            if ativo is not None and not self._precisa_trocar(ativo, data_hora):
+                return arquivo or open(self._caminho(ativo['arquivo']), 'ab', buffering=0)
+            if arquivo is not None:
+                arquivo.close()
+            if ativo is not None:
+                ativo['selado'] = True
+                self._compactacao.put(ativo)
+            ativo = {'arquivo': f"{self._proximo_numero():06d}-{data_hora[:10]}.txt", 'selado': False,
+                     'inicio': None, 'fim': None, 'respostas': 0, 'bytes': 0}
+            self._segmentos.append(ativo)
+            self._salvar_manifesto()
+            return open(self._caminho(ativo['arquivo']), 'ab', buffering=0)
+
+    def _precisa_trocar(self, ativo, data_hora):
+        if self.rotacao == 'nenhuma':
+            return False
+        if ativo['bytes'] >= self.tamanho_maximo:
+            return True
+        return self.rotacao == 'diaria' and ativo['inicio'] is not None and ativo['inicio'][:10] != data_hora[:10]
+
+    def registrar_lote(self, posicao, lote):
+        """Chamado pelo diário após gravar um lote: atualiza o período do segmento ativo"""
+        with self._lock:
+            ativo = self._segmentos[-1]
+            for pedido in lote:
+                ativo['inicio'] = min(ativo['inicio'] or pedido.meta, pedido.meta)
+                ativo['fim'] = max(ativo['fim'] or pedido.meta, pedido.meta)
+                ativo['bytes'] += len(pedido.dados)
+            ativo['respostas'] += len(lote)
+
+    def _compactar_selados(self):
+        while True:
+            segmento = self._compactacao.get()
+            if segmento is None:
+                return
+            try:
+                self._compactar(segmento)
+            except OSError as e:
+                print(f"⚠️  Erro ao compactar {segmento['arquivo']}: {e}")
+
+    def _compactar(self, segmento):
+        original = self._caminho(segmento['arquivo'])
+        compactado = original + '.gz'
+        with open(original, 'rb') as entrada, gzip.open(compactado + '.tmp', 'wb') as saida:
+            shutil.copyfileobj(entrada, saida, 1024 * 1024)
+        os.replace(compactado + '.tmp', compactado)
+        with self._lock:
+            segmento['arquivo'] += '.gz'
+            self._salvar_manifesto()
+        try:
+            os.remove(original)
+        except OSError:
+            pass  # Ex: Windows com o arquivo aberto por um leitor; removido na próxima inicialização
+
+    def iterar(self, perguntas, inicio=None, fim=None):
+        """Gera as respostas dos segmentos que têm data/hora entre inicio e fim (texto ou None)"""
+        with self._lock:
+            segmentos = [dict(segmento) for segmento in self._segmentos]
+        for segmento in segmentos:
+            if segmento['inicio'] is None:
+                continue
+            if inicio is not None and segmento['fim'] < inicio and segmento['selado']:
+                continue
+            if fim is not None and segmento['inicio'] > fim:
+                continue
+            for registro in self._ler(segmento['arquivo'], perguntas):
+                if (inicio is None or registro['data_hora'] >= inicio) and (fim is None or registro['data_hora'] <= fim):
+                    yield registro
+
+    def _ler(self, arquivo, perguntas):
+        caminho = self._caminho(arquivo)
+        if not arquivo.endswith('.gz'):
+            try:
+                yield from ler_respostas_txt(caminho, perguntas)
+                return
+            except FileNotFoundError:
+                caminho += '.gz'  # Compactado enquanto a leitura começava
+        with gzip.open(caminho, 'rb') as f:
+            yield from _ler_blocos_arquivo(f, perguntas)
+
+    def encerrar(self):
+        """Grava o período do segmento ativo e aguarda as compactações pendentes"""
+        if self.somente_leitura:
+            return
+        with self._lock:
+            self._salvar_manifesto()
+        self._compactacao.put(None)
+        self._thread.join()
+
+class DiarioSegmentado(DiarioRespostas):
+    """Diário que grava no segmento ativo e troca de segmento entre lotes
+
+    O meta de cada pedido é a data/hora da resposta; a troca de segmento
+    (por dia ou por tamanho) nunca divide um lote entre dois arquivos.
+    """
+
+    def __init__(self, segmentos, durabilidade):
+        self.segmentos = segmentos
+        super().__init__(segmentos.pasta, durabilidade, apos_lote=segmentos.registrar_lote)
+
+    def _arquivo_do_lote(self, arquivo, lote):
+        return self.segmentos.arquivo_para(arquivo, lote[0].meta)
+
+class ArmazenamentoTexto:
+    """Grava as respostas em respostas.txt, legível no Bloco de Notas
+
+    Com rotação (ROTACAO em config.txt), as respostas vão para segmentos na
+    pasta respostas/ (ver SegmentosRespostas); um respostas.txt existente
+    passa a ser o primeiro segmento.
+    """
+
+    def __init__(self, caminho, durabilidade, obter_perguntas, rotacao='nenhuma', tamanho_segmento=0):
+        self.obter_perguntas = obter_perguntas
+        self.arquivo = caminho
+        pasta = os.path.join(os.path.dirname(caminho), SEGMENTS_DIR)
+        self.segmentos = None
+        if rotacao != 'nenhuma' or os.path.exists(os.path.join(pasta, MANIFEST_FILE)):
+            self.segmentos = SegmentosRespostas(pasta, rotacao, tamanho_segmento)
+        if rotacao == 'nenhuma':
+            self.caminho = caminho
+            self.diario = DiarioRespostas(caminho, durabilidade)
+        else:
+            if os.path.exists(caminho):
+                self.segmentos.adotar(caminho)
+            self.caminho = pasta
+            self.diario = DiarioSegmentado(self.segmentos, durabilidade)
+
+    def salvar(self, registro):
+        self.salvar_varios([registro])
+
+    def salvar_varios(self, registros):
+        inicio = time.perf_counter()
+        perguntas = self.obter_perguntas()
+        itens = [(formatar_resposta_txt(r, perguntas), r['data_hora']) for r in registros]
+        formatado = time.perf_counter()
+        self.diario.gravar_varios(itens)
+        metricas.registrar_salvar('formatacao', formatado - inicio)
+        metricas.registrar_salvar('gravacao', time.perf_counter() - formatado)
+
+    def iterar(self):
+        """Gera todas as respostas na ordem em que foram enviadas"""
+        return self.buscar_por_periodo(None)
+
+    def buscar_por_periodo(self, inicio, fim=None):
+        """Gera as respostas com data/hora entre inicio e fim (datetime ou None)
+
+        Com segmentos, só os segmentos que cobrem o período são lidos.
+        """
+        inicio = inicio.strftime('%Y-%m-%d %H:%M:%S') if inicio else None
+        fim = fim.strftime('%Y-%m-%d %H:%M:%S') if fim else None
+        perguntas = self.obter_perguntas()
+        if self.segmentos is not None:
+            yield from self.segmentos.iterar(perguntas, inicio, fim)
+        if os.path.exists(self.arquivo):
+            for registro in ler_respostas_txt(self.arquivo, perguntas):
+                if (inicio is None or registro['data_hora'] >= inicio) and (fim is None or registro['data_hora'] <= fim):
+                    yield registro
+
+    def encerrar(self):
+        self.diario.encerrar()
+        if self.segmentos is not None:
+            self.segmentos.encerrar()
+
+class ArmazenamentoRegistros:
+    """Grava as respostas em um arquivo de registros com índice de posições
+
+    respostas.dat só recebe acréscimos: cada registro é um JSON precedido do
+    seu tamanho (4 bytes). respostas.idx guarda uma entrada de tamanho fixo
+    por registro (data/hora, hash do nome, posição e tamanho), o que permite
+    contar registros sem ler o arquivo, localizar um período por busca
+    binária e ler cada registro direto da sua posição. A busca binária só é
+    usada enquanto as datas do índice estão em ordem (ex: um relógio
+    atrasado ou uma migração fora de ordem desfazem isso); fora de ordem, o
+    índice é percorrido inteiro.
+    """
+
+    ENTRADA = struct.Struct('<dQQI')  # data/hora, hash do nome, posição, tamanho
+    PREFIXO = struct.Struct('<I')
+    ENTRADAS_POR_LEITURA = 4096  # Entradas do índice lidas de uma vez ao percorrer um período
+
+    def __init__(self, caminho, caminho_indice, durabilidade):
+        self.caminho = caminho
+        self.caminho_indice = caminho_indice
+        self._lock = threading.Lock()
+        self._total = 0
+        self._ultima_data = float('-inf')
+        self._ordenado = True  # Datas do índice em ordem crescente (permite a busca binária)
+        self._recuperar_indice()
+        self._indice = open(caminho_indice, 'ab', buffering=0)
+        self.diario = DiarioRespostas(caminho, durabilidade, apos_lote=self._indexar_lote)
+
+    @staticmethod
+    def chave_nome(nome):
+        """Hash de 64 bits do nome sem diferença de maiúsculas/minúsculas e espaços repetidos"""
+        normalizado = ' '.join(nome.split()).casefold()
+        digest = hashlib.blake2b(normalizado.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little')
+
+    def _recuperar_indice(self):
+        """Carrega o índice e completa as entradas que faltarem (ex: queda de energia)"""
+        entradas = []
+        if os.path.exists(self.caminho_indice):
+            with open(self.caminho_indice, 'rb') as f:
+                dados = f.read()
+            dados = dados[:len(dados) - len(dados) % self.ENTRADA.size]
+            entradas = list(self.ENTRADA.iter_unpack(dados))
+
+        fim_indexado = 0
+        if entradas:
+            _, _, posicao, tamanho = entradas[-1]
+            fim_indexado = posicao + self.PREFIXO.size + tamanho
+
+        if os.path.exists(self.caminho):
+            with open(self.caminho, 'r+b') as f:
+                f.seek(fim_indexado)
+                posicao = fim_indexado
+                for registro, tamanho in _ler_registros_de(f):
+                    entradas.append(self._entrada(registro, posicao, tamanho))
+                    posicao += self.PREFIXO.size + tamanho
+                # Descarta um registro incompleto no final do arquivo
+                f.truncate(posicao)
+
+        with open(self.caminho_indice, 'wb') as f:
+            f.write(b''.join(self.ENTRADA.pack(*e) for e in entradas))
+
+        self._total = len(entradas)
+        self._acompanhar_ordem(entradas)
+
+    def _acompanhar_ordem(self, entradas):
+        for entrada in entradas:
+            if entrada[0] < self._ultima_data:
+                self._ordenado = False
+            self._ultima_data = entrada[0]
+
+    def _entrada(self, registro, posicao, tamanho):
+        data_hora = datetime.strptime(registro['data_hora'], '%Y-%m-%d %H:%M:%S').timestamp()
+        return (data_hora, self.chave_nome(registro['nome']), posicao, tamanho)
+
+    def salvar(self, registro):
+        self.salvar_varios([registro])
+
+    def salvar_varios(self, registros):
+        inicio = time.perf_counter()
+        itens = []
+        for registro in registros:
+            dados = json.dumps(registro, ensure_ascii=False).encode('utf-8')
+            itens.append((self.PREFIXO.pack(len(dados)) + dados, registro))
+        formatado = time.perf_counter()
+        self.diario.gravar_varios(itens)
+        metricas.registrar_salvar('formatacao', formatado - inicio)
+        metricas.registrar_salvar('gravacao', time.perf_counter() - formatado)
+
+    def _indexar_lote(self, posicao, lote):
+        """Chamado pelo diário após gravar um lote: acrescenta as entradas no índice"""
+        entradas = []
+        for pedido in lote:
+            tamanho = len(pedido.dados) - self.PREFIXO.size
+            entradas.append(self._entrada(pedido.meta, posicao, tamanho))
+            posicao += len(pedido.dados)
+        self._indice.write(b''.join(self.ENTRADA.pack(*e) for e in entradas))
+        with self._lock:
+            self._acompanhar_ordem(entradas)
+            self._total += len(entradas)
+
+    def contar(self):
+        return self._total
+
+    def iterar(self):
+        """Gera todas as respostas na ordem em que foram enviadas"""
+        if not os.path.exists(self.caminho):
+            return iter(())
+        return ler_registros(self.caminho)
+
+    def _ler_entrada(self, indice, numero):
+        indice.seek(numero * self.ENTRADA.size)
+        return self.ENTRADA.unpack(indice.read(self.ENTRADA.size))
+
+    def _ler_registro(self, dados, posicao, tamanho):
+        dados.seek(posicao + self.PREFIXO.size)
+        return json.loads(dados.read(tamanho))
+
+    def buscar_por_periodo(self, inicio, fim=None):
+        """Gera as respostas com data/hora entre inicio e fim (datetime ou None)"""
+        total = self.contar()
+        if total == 0 or not os.path.exists(self.caminho):
+            return  # respostas.dat só é criado no primeiro envio
+        with self._lock:
+            ordenado = self._ordenado
+        alvo = inicio.timestamp() if inicio else float('-inf')
+        limite = fim.timestamp() if fim else float('inf')
+        with open(self.caminho_indice, 'rb') as indice, open(self.caminho, 'rb') as dados:
+            baixo = 0
+            if ordenado:
+                # Busca binária pela primeira entrada a partir de inicio
+                alto = total
+                while baixo < alto:
+                    meio = (baixo + alto) // 2
+                    if self._ler_entrada(indice, meio)[0] < alvo:
+                        baixo = meio + 1
+                    else:
+                        alto = meio
+
+            indice.seek(baixo * self.ENTRADA.size)
+            for numero in range(baixo, total, self.ENTRADAS_POR_LEITURA):
+                bloco = indice.read(min(self.ENTRADAS_POR_LEITURA, total - numero) * self.ENTRADA.size)
+                for data_hora, _, posicao, tamanho in self.ENTRADA.iter_unpack(bloco):
+                    if data_hora > limite:
+                        if ordenado:
+                            return
+                    elif data_hora >= alvo:
+                        yield self._ler_registro(dados, posicao, tamanho)
+
+    def encerrar(self):
+        self.diario.encerrar()
+        self._indice.close()
+
+class ArmazenamentoSQLite:
+    """Grava as respostas em um banco SQLite (modo WAL)
+
+    Cada resposta enviada vira uma linha em submissoes e uma linha por
+    questão em respostas, permitindo consultas indexadas por nome, data,
+    questão e alternativa. As conexões de gravação ficam em um pool
+    reaproveitado pelas threads de atendimento e cada envio é gravado em uma
+    única transação; as leituras (exportação) abrem a sua própria conexão
+    somente leitura.
+    """
+
+    ESQUEMA = '''
+        CREATE TABLE IF NOT EXISTS perguntas (
+            questao INTEGER PRIMARY KEY,
+            texto TEXT NOT NULL,
+            tipo TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS submissoes (
+            id INTEGER PRIMARY KEY,
+            data_hora TEXT NOT NULL,
+            nome TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS respostas (
+            submissao_id INTEGER NOT NULL REFERENCES submissoes(id),
+            questao INTEGER NOT NULL,
+            resposta TEXT NOT NULL,
+            alternativa INTEGER,
+            PRIMARY KEY (submissao_id, questao)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_submissoes_data_hora ON submissoes(data_hora);
+        CREATE INDEX IF NOT EXISTS idx_submissoes_nome ON submissoes(nome COLLATE NOCASE);
+        CREATE INDEX IF NOT EXISTS idx_respostas_alternativa ON respostas(questao, alternativa);
+    '''
+    INSERIR_SUBMISSAO = 'INSERT INTO submissoes (data_hora, nome) VALUES (?, ?)'
+    INSERIR_RESPOSTA = 'INSERT INTO respostas (submissao_id, questao, resposta, alternativa) VALUES (?, ?, ?, ?)'
+    INSERIR_PERGUNTA = 'INSERT OR REPLACE INTO perguntas (questao, texto, tipo) VALUES (?, ?, ?)'
+    SINCRONIZACAO = {'nenhuma': 'OFF', 'lote': 'NORMAL', 'cada': 'FULL'}
+
+    def __init__(self, caminho, durabilidade, obter_perguntas, conexoes=4):
+        self.caminho = caminho
+        self.durabilidade = durabilidade
+        self.obter_perguntas = obter_perguntas
+        self._perguntas_gravadas = None  # QuestionLoader já copiado para a tabela perguntas
+        self._pool = queue.Queue()
+        for _ in range(conexoes):
+            self._pool.put(self._conectar())
+        with self._conexao() as con:
+            con.executescript(self.ESQUEMA)
+
+    def _conectar(self):
+        import sqlite3  # Só com ARMAZENAMENTO: sqlite
+        con = sqlite3.connect(self.caminho, timeout=30, isolation_level=None, check_same_thread=False)
+        con.execute('PRAGMA journal_mode=WAL')
+        con.execute(f'PRAGMA synchronous={self.SINCRONIZACAO[self.durabilidade]}')
+        con.execute('PRAGMA foreign_keys=ON')
+        return con
+
+    @contextmanager
+    def _conexao(self):
+        """Empresta uma conexão do pool"""
+        con = self._pool.get()
+        try:
+            yield con
+        finally:
+            self._pool.put(con)
+
+    def salvar(self, registro):
+        self.salvar_varios([registro])
+
+    def salvar_varios(self, registros):
+        """Grava as respostas em uma única transação"""
+        inicio = time.perf_counter()
+        perguntas = self.obter_perguntas()
+        linhas = [list(self._linhas_respostas(registro, perguntas)) for registro in registros]
+        formatado = time.perf_counter()
+        with self._conexao() as con:
+            con.execute('BEGIN IMMEDIATE')
+            try:
+                # Mantém a tabela de perguntas alinhada com perguntas.txt
+                if self._perguntas_gravadas is not perguntas:
+                    con.executemany(self.INSERIR_PERGUNTA, [
+                        (i, perguntas.get_question_text(i), perguntas.get_question_type(i))
+                        for i in range(perguntas.get_total_questions())
+                    ])
+                    self._perguntas_gravadas = perguntas
+                for registro, linhas_registro in zip(registros, linhas):
+                    submissao_id = con.execute(self.INSERIR_SUBMISSAO,
+                                               (registro['data_hora'], registro['nome'])).lastrowid
+                    con.executemany(self.INSERIR_RESPOSTA,
+                                    [(submissao_id,) + linha for linha in linhas_registro])
+                con.execute('COMMIT')
+            except BaseException:
+                con.execute('ROLLBACK')
+                raise
+        metricas.registrar_salvar('formatacao', formatado - inicio)
+        metricas.registrar_salvar('gravacao', time.perf_counter() - formatado)
+
+    def _linhas_respostas(self, registro, perguntas):
+        """(questão, resposta, alternativa) de cada resposta, sem o id da submissão"""
+        for i, resposta in enumerate(registro['respostas']):
+            alternativa = None
+            if perguntas.get_question_type(i) == 'multipla_escolha':
+                try:
+                    alternativa = int(resposta)
+                except ValueError:
+                    pass
+            yield (i, str(resposta), alternativa)
+
+    def iterar(self):
+        """Gera todas as respostas na ordem em que foram enviadas"""
+        return self.ler(self.caminho)
+
+    def buscar_por_periodo(self, inicio, fim=None):
+        """Gera as respostas com data/hora entre inicio e fim (datetime ou None), pelo índice de data_hora
+
+        A leitura usa uma conexão própria, somente leitura, fora do pool: uma
+        exportação longa não ocupa as conexões usadas para gravar os envios.
+        """
+        return self.ler(self.caminho, inicio and inicio.strftime('%Y-%m-%d %H:%M:%S'),
+                        fim and fim.strftime('%Y-%m-%d %H:%M:%S'))
+
+    @staticmethod
+    def filtro_periodo(inicio, fim):
+        """Cláusula WHERE e parâmetros para data/hora entre inicio e fim (texto ou None)"""
+        condicoes, parametros = [], []
+        if inicio is not None:
+            condicoes.append('s.data_hora >= ?')
+            parametros.append(inicio)
+        if fim is not None:
+            condicoes.append('s.data_hora <= ?')
+            parametros.append(fim)
+        return 'WHERE ' + ' AND '.join(condicoes) if condicoes else '', parametros
+
+    @classmethod
+    def ler(cls, caminho, inicio=None, fim=None):
+        """Gera as respostas de um respostas.db entre inicio e fim (texto ou None) sem abrir para gravação"""
+        import sqlite3
+        caminho = os.path.abspath(caminho).replace(os.sep, '/')
+        con = sqlite3.connect(f"file:{quote(caminho if caminho.startswith('/') else '/' + caminho)}?mode=ro",
+                              uri=True, timeout=30, check_same_thread=False)
+        try:
+            yield from cls._gerar_registros(con, *cls.filtro_periodo(inicio, fim))
+        finally:
+            con.close()
+
+    @staticmethod
+    def _gerar_registros(con, filtro, parametros):
+        cursor = con.execute(f'''
+            SELECT s.id, s.data_hora, s.nome, r.resposta
+            FROM submissoes s LEFT JOIN respostas r ON r.submissao_id = s.id
+            {filtro}
+            ORDER BY s.id, r.questao
+        ''', parametros)
+        registro = None
+        for submissao_id, data_hora, nome, resposta in cursor:
+            if registro is None or registro['id'] != submissao_id:
+                if registro is not None:
+                    del registro['id']
+                    yield registro
+                registro = {'id': submissao_id, 'data_hora': data_hora, 'nome': nome, 'respostas': []}
+            if resposta is not None:  # Envio sem nenhuma resposta (LEFT JOIN)
+                registro['respostas'].append(resposta)
+        if registro is not None:
+            del registro['id']
+            yield registro
+
+    def encerrar(self):
+        while not self._pool.empty():
+            self._pool.get().close()
+
+def _ler_registros_de(f):
+    """Gera (registro, tamanho) de um arquivo de registros a partir da posição atual"""
+    prefixo = ArmazenamentoRegistros.PREFIXO
+    while True:
+        cabecalho = f.read(prefixo.size)
+        if len(cabecalho) < prefixo.size:
+            return
+        tamanho, = prefixo.unpack(cabecalho)
+        dados = f.read(tamanho)
+        if len(dados) < tamanho:
+            return
+        yield json.loads(dados), tamanho
+
+def ler_registros(caminho):
+    """Gera todas as respostas de um arquivo de registros (respostas.dat)"""
+    with open(caminho, 'rb') as f:
+        for registro, _ in _ler_registros_de(f):
+            yield registro
+
+SEPARADOR_TXT = b'\n' + b'=' * 100 + b'\n'
+MARCADOR_RESPOSTA = b'\nRESPOSTA: '
+
+def ler_respostas_txt(caminho, perguntas=None):
+    """Gera as respostas de um respostas.txt sem carregar o arquivo inteiro
+
+    O arquivo é mapeado em memória (mmap) e percorrido de bloco em bloco;
+    só o bloco da resposta atual é copiado e decodificado. Se perguntas
+    (QuestionLoader) for informado, as alternativas de múltipla escolha
+    voltam a ser o índice enviado pelo formulário e os textos das perguntas
+    ajudam a separar respostas abertas que contenham "RESPOSTA: ".
+    """
+    with open(caminho, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from _ler_blocos_txt(mm, perguntas)
+
+def _ler_blocos_txt(dados, perguntas):
+    """Gera as respostas de um conteúdo no formato do respostas.txt (mmap ou bytes)"""
+    inicio = dados.find(SEPARADOR_TXT)
+    while inicio != -1:
+        fim_cabecalho = dados.find(SEPARADOR_TXT, inicio + len(SEPARADOR_TXT))
+        if fim_cabecalho == -1:
+            return
+        proximo = dados.find(SEPARADOR_TXT, fim_cabecalho + len(SEPARADOR_TXT))
+        cabecalho = dados[inicio + len(SEPARADOR_TXT):fim_cabecalho]
+        corpo = dados[fim_cabecalho + len(SEPARADOR_TXT):proximo if proximo != -1 else len(dados)]
+        yield _interpretar_bloco_txt(cabecalho, corpo, perguntas)
+        inicio = proximo
+
+def _ler_blocos_arquivo(f, perguntas, tamanho_leitura=1024 * 1024):
+    """Gera as respostas de um arquivo no formato do respostas.txt lido aos poucos (ex: .txt.gz)
+
+    Os blocos são separados como em _ler_blocos_txt, mas só a resposta atual
+    e o último trecho lido ficam em memória, qualquer que seja o tamanho do
+    arquivo descompactado.
+    """
+    dados = b''
+    fim_arquivo = False
+
+    def procurar(desde):
+        nonlocal dados, fim_arquivo
+        while True:
+            posicao = dados.find(SEPARADOR_TXT, desde)
+            if posicao != -1 or fim_arquivo:
+                return posicao
+            # O separador pode ter começado no final do trecho já lido
+            desde = max(desde, len(dados) - len(SEPARADOR_TXT) + 1)
+            parte = f.read(tamanho_leitura)
+            fim_arquivo = not parte
+            dados += parte
+
+    inicio = procurar(0)
+    while inicio != -1:
+        fim_cabecalho = procurar(inicio + len(SEPARADOR_TXT))
+        if fim_cabecalho == -1:
+            return
+        proximo = procurar(fim_cabecalho + len(SEPARADOR_TXT))
+        cabecalho = dados[inicio + len(SEPARADOR_TXT):fim_cabecalho]
+        corpo = dados[fim_cabecalho + len(SEPARADOR_TXT):proximo if proximo != -1 else len(dados)]
+        yield _interpretar_bloco_txt(cabecalho, corpo, perguntas)
+        if proximo == -1:
+            return
+        dados, inicio = dados[proximo:], 0
+
+def _interpretar_bloco_txt(cabecalho, corpo, perguntas):
+    registro = {'data_hora': '', 'nome': '', 'respostas': []}
+    total = None
+    for linha in cabecalho.decode('utf-8', errors='replace').split('\n'):
+        chave, _, valor = linha.partition(': ')
+        if chave == 'DATA/HORA':
+            registro['data_hora'] = valor
+        elif chave == 'NOME':
+            registro['nome'] = valor
+        elif chave == 'TOTAL DE RESPOSTAS':
+            total = int(valor.split('/')[0])
+    
+    # Cada resposta é "PERGUNTA\nRESPOSTA: texto\n\n"; o corpo começa com "\n"
+    corpo = b'\n' + corpo
+    marcadores = []
+    posicao = corpo.find(MARCADOR_RESPOSTA)
+    while posicao != -1:
+        inicio_pergunta = corpo.rfind(b'\n', 0, posicao) + 1
+        marcadores.append((inicio_pergunta, posicao + len(MARCADOR_RESPOSTA)))
+        posicao = corpo.find(MARCADOR_RESPOSTA, posicao + 1)
     
-    server = HTTPServer(('0.0.0.0', PORT), BigCardHandler)
+    if perguntas is not None and total is not None and len(marcadores) > total:
+        # Descarta "RESPOSTA: " que faz parte do texto de uma resposta aberta
+        esperados = [perguntas.get_question_text(i).encode('utf-8') for i in range(total)]
+        filtrados = []
+        for inicio_pergunta, inicio_resposta in marcadores:
+            i = len(filtrados)
+            pergunta = corpo[inicio_pergunta:inicio_resposta - len(MARCADOR_RESPOSTA)]
+            if i < total and pergunta == esperados[i]:
+                filtrados.append((inicio_pergunta, inicio_resposta))
+        marcadores = filtrados
+    
+    for i, (_, inicio_resposta) in enumerate(marcadores):
+        fim = marcadores[i + 1][0] if i + 1 < len(marcadores) else len(corpo)
+        texto = corpo[inicio_resposta:fim]
+        if texto.endswith(b'\n\n'):
+            texto = texto[:-2]
+        resposta = texto.decode('utf-8', errors='replace')
+        if perguntas is not None and perguntas.get_question_type(i) == 'multipla_escolha':
+            resposta = _indice_alternativa(perguntas.get_alternativas(i), resposta)
+        registro['respostas'].append(resposta)
+    
+    return registro
+
+def _indice_alternativa(alternativas, texto):
+    """Converte o texto gravado de uma alternativa de volta para o índice enviado"""
+    if texto in alternativas:
+        return str(alternativas.index(texto))
+    if texto.startswith('[Alternativa inválida: ') and texto.endswith(']'):
+        return texto[len('[Alternativa inválida: '):-1]
+    return texto
+
+def ler_respostas_salvas(config, pasta, obter_perguntas, inicio=None, fim=None):
+    """Gera as respostas de um exame com data/hora entre inicio e fim (datetime ou None)
+
+    Só lê os arquivos do armazenamento configurado: não recupera o índice,
+    não compacta segmentos nem reescreve o manifesto, então pode ser usado
+    com o servidor rodando (ex: --exportar-txt).
+    """
+    inicio = inicio.strftime('%Y-%m-%d %H:%M:%S') if inicio else None
+    fim = fim.strftime('%Y-%m-%d %H:%M:%S') if fim else None
+    if config.get_armazenamento() == 'sqlite':
+        caminho = os.path.join(pasta, DATABASE_FILE)
+        if os.path.exists(caminho):
+            yield from ArmazenamentoSQLite.ler(caminho, inicio, fim)
+        return
+
+    if config.get_armazenamento() == 'registros':
+        caminho = os.path.join(pasta, RECORDS_FILE)
+        fontes = [ler_registros(caminho)] if os.path.exists(caminho) else []
+    else:
+        perguntas = obter_perguntas()
+        fontes = []
+        segmentos = os.path.join(pasta, SEGMENTS_DIR)
+        if os.path.exists(os.path.join(segmentos, MANIFEST_FILE)):
+            fontes.append(SegmentosRespostas(segmentos, config.get_rotacao(), 0, somente_leitura=True)
+                          .iterar(perguntas, inicio, fim))
+        if os.path.exists(os.path.join(pasta, DATA_FILE)):
+            fontes.append(ler_respostas_txt(os.path.join(pasta, DATA_FILE), perguntas))
+    for fonte in fontes:
+        for registro in fonte:
+            if (inicio is None or registro['data_hora'] >= inicio) and (fim is None or registro['data_hora'] <= fim):
+                yield registro
+
+def criar_armazenamento(config, pasta, obter_perguntas):
+    """Cria, na pasta do exame, o armazenamento de respostas escolhido em config.txt"""
+    if config.get_armazenamento() == 'registros':
+        return ArmazenamentoRegistros(os.path.join(pasta, RECORDS_FILE), os.path.join(pasta, INDEX_FILE),
+                                      config.get_durabilidade())
+    if config.get_armazenamento() == 'sqlite':
+        return ArmazenamentoSQLite(os.path.join(pasta, DATABASE_FILE), config.get_durabilidade(), obter_perguntas)
+    return ArmazenamentoTexto(os.path.join(pasta, DATA_FILE), config.get_durabilidade(), obter_perguntas,
+                              config.get_rotacao(), config.get_tamanho_segmento() * 1024 * 1024)
+
+class EstatisticasRespostas:
+    """Contadores das respostas, atualizados a cada envio
+
+    Guarda o total de envios, os envios por hora e, para cada questão de
+    múltipla escolha, quantas vezes cada alternativa foi escolhida. Cada
+    envio custa apenas alguns incrementos; o arquivo de respostas só é lido
+    uma vez, ao iniciar o servidor, para reconstruir os contadores.
+    """
+
+    def __init__(self, obter_perguntas):
+        self.obter_perguntas = obter_perguntas
+        self._lock = threading.Lock()
+        self.total = 0
+        self.por_hora = {}  # 'AAAA-MM-DD HH' -> envios
+        self.alternativas = {}  # índice da questão -> contadores por alternativa
+        self.invalidas = {}  # índice da questão -> respostas fora das alternativas
+        self._multipla_escolha = (None, [])  # (QuestionLoader, índices das questões)
+
+    def _questoes_multipla_escolha(self, perguntas):
+        anteriores, indices = self._multipla_escolha
+        if anteriores is not perguntas:
+            indices = [i for i in range(perguntas.get_total_questions())
+                       if perguntas.get_question_type(i) == 'multipla_escolha']
+            self._multipla_escolha = (perguntas, indices)
+        return indices
+
+    def registrar(self, registro):
+        """Contabiliza uma resposta enviada"""
+        respostas = registro['respostas']
+        hora = registro['data_hora'][:13]
+        perguntas = self.obter_perguntas()
+        with self._lock:
+            self.total += 1
+            self.por_hora[hora] = self.por_hora.get(hora, 0) + 1
+            for i in self._questoes_multipla_escolha(perguntas):
+                if i >= len(respostas):
+                    break
+                contadores = self.alternativas.setdefault(i, [])
+                faltando = len(perguntas.get_alternativas(i)) - len(contadores)
+                if faltando > 0:
+                    contadores.extend([0] * faltando)
+                try:
+                    indice = int(respostas[i])
+                except ValueError:
+                    indice = -1
+                # Índices negativos (ex: "-1" de dados migrados) também são inválidos
+                if 0 <= indice < len(contadores):
+                    contadores[indice] += 1
+                else:
+                    self.invalidas[i] = self.invalidas.get(i, 0) + 1
+
+    def reconstruir(self, registros):
+        """Recalcula os contadores a partir das respostas já gravadas"""
+        for registro in registros:
+            self.registrar(registro)
+
+    def resumo(self):
+        """Dados para o endpoint /estatisticas"""
+        perguntas = self.obter_perguntas()
+        with self._lock:
+            questoes = []
+            for i in self._questoes_multipla_escolha(perguntas):
+                contadores = self.alternativas.get(i, [])
+                alternativas = perguntas.get_alternativas(i)
+                total = sum(contadores)
+                questoes.append({
+                    'questao': i + 1,
+                    'pergunta': perguntas.get_question_text(i),
+                    'total': total,
+                    'invalidas': self.invalidas.get(i, 0),
+                    'alternativas': [
+                        {
+                            'alternativa': texto,
+                            'respostas': contadores[j] if j < len(contadores) else 0,
+                            'percentual': round(100 * contadores[j] / total, 1) if total and j < len(contadores) else 0.0,
+                        }
+                        for j, texto in enumerate(alternativas)
+                    ],
+                })
+            return {
+                'total_respostas': self.total,
+                'respostas_por_hora': dict(sorted(self.por_hora.items())),
+                'questoes': questoes,
+            }
+
+GRUPO_DISCRIMINACAO = 0.27  # Fração da turma nos grupos de maior e menor nota (índice de discriminação)
+SEM_RESPOSTA = 255  # Valor na matriz de escolhas para resposta em branco, aberta ou inválida
+
+def corrigir_matriz(matriz, largura, gabarito):
+    """Corrige todos os envios de uma vez
+
+    matriz: bytearray com largura escolhas por envio (índice da alternativa
+    ou SEM_RESPOSTA); gabarito: [(índice da questão, alternativas corretas,
+    peso)]. Retorna (notas por envio, acertos por questão, discriminação
+    por questão): a discriminação é a diferença entre a fração de acertos
+    dos 27% com as maiores notas e a dos 27% com as menores.
+    """
+    if carregar_numpy() is not None:
+        return _corrigir_numpy(matriz, largura, gabarito)
+    return _corrigir_python(matriz, largura, gabarito)
+
+def _corrigir_numpy(matriz, largura, gabarito):
+    numpy = carregar_numpy()
+    envios = len(matriz) // largura
+    escolhas = numpy.frombuffer(bytes(matriz), dtype=numpy.uint8).reshape(envios, largura)
+    escolhas = escolhas[:, [indice for indice, _, _ in gabarito]]
+    # Tabela questão × alternativa → acertou (SEM_RESPOSTA nunca é correta)
+    tabela = numpy.zeros((len(gabarito), 256), dtype=bool)
+    for j, (_, corretas, _) in enumerate(gabarito):
+        tabela[j, list(corretas)] = True
+    acertos = tabela[numpy.arange(len(gabarito)), escolhas]
+    notas = acertos @ numpy.array([peso for _, _, peso in gabarito])
+    grupo = max(1, int(envios * GRUPO_DISCRIMINACAO))
+    ordem = numpy.argsort(notas, kind='stable')
+    discriminacao = acertos[ordem[-grupo:]].mean(axis=0) - acertos[ordem[:grupo]].mean(axis=0)
+    return notas.tolist(), acertos.sum(axis=0).tolist(), discriminacao.tolist()
+
+def _corrigir_python(matriz, largura, gabarito):
+    """Mesma correção sem NumPy: cada questão vira uma coluna de 0/1 com bytes.translate"""
+    envios = len(matriz) // largura
+    notas = [0.0] * envios
+    colunas = []
+    for indice, corretas, peso in gabarito:
+        tabela = bytes(1 if alternativa in corretas else 0 for alternativa in range(256))
+        coluna = matriz[indice::largura].translate(tabela)
+        colunas.append(coluna)
+        notas = [nota + peso * acerto for nota, acerto in zip(notas, coluna)]
+    grupo = max(1, int(envios * GRUPO_DISCRIMINACAO))
+    ordem = sorted(range(envios), key=notas.__getitem__)
+    inferiores, superiores = ordem[:grupo], ordem[-grupo:]
+    discriminacao = [(sum(map(coluna.__getitem__, superiores)) - sum(map(coluna.__getitem__, inferiores))) / grupo
+                     for coluna in colunas]
+    return notas, [sum(coluna) for coluna in colunas], discriminacao
+
+class CorrecaoRespostas:
+    """Escolhas de todos os envios em uma matriz compacta, corrigidas pelo gabarito
+
+    Cada envio ocupa uma linha de um bytearray, com um byte por questão (o
+    índice da alternativa escolhida). A matriz guarda as escolhas e não os
+    acertos: quando o gabarito do perguntas.txt é corrigido, a turma inteira
+    é corrigida de novo na próxima consulta, sem reler as respostas.
+    """
+
+    def __init__(self, obter_perguntas):
+        self.obter_perguntas = obter_perguntas
+        self._lock = threading.Lock()
+        self._matriz = bytearray()
+        self._largura = 0
+        self._envios = []  # (nome, data/hora) de cada linha
+
+    def registrar(self, registro):
+        """Acrescenta as escolhas de uma resposta enviada"""
+        respostas = registro['respostas']
+        with self._lock:
+            if len(respostas) > self._largura:
+                self._alargar(len(respostas))
+            linha = bytearray([SEM_RESPOSTA]) * self._largura
+            for i, resposta in enumerate(respostas):
+                if resposta.isascii() and resposta.isdigit() and int(resposta) < SEM_RESPOSTA:
+                    linha[i] = int(resposta)
+            self._matriz += linha
+            self._envios.append((registro['nome'], registro['data_hora']))
+
+    def _alargar(self, largura):
+        """Mais colunas na matriz (perguntas.txt ganhou questões)"""
+        anterior, self._largura = self._largura, largura
+        if anterior and self._matriz:
+            complemento = bytearray([SEM_RESPOSTA]) * (largura - anterior)
+            self._matriz = bytearray().join(self._matriz[inicio:inicio + anterior] + complemento
+                                            for inicio in range(0, len(self._matriz), anterior))
+        elif self._envios:
+            self._matriz = bytearray([SEM_RESPOSTA]) * (largura * len(self._envios))
+
+    def corrigir(self):
+        """Notas da turma e análise de cada questão com gabarito (endpoint /notas)
+
+        Retorna None se nenhuma questão do perguntas.txt tem gabarito.
+        """
+        perguntas = self.obter_perguntas()
+        total_questoes = perguntas.get_total_questions()
+        gabarito = [(i, frozenset(perguntas.get_corretas(i)), perguntas.get_peso(i))
+                    for i in range(total_questoes) if perguntas.get_corretas(i)]
+        if not gabarito:
+            return None
+        inicio = time.perf_counter()
+        with self._lock:
+            if self._largura < total_questoes:
+                self._alargar(total_questoes)
+            matriz, largura, envios = bytes(self._matriz), self._largura, list(self._envios)
+        if envios:
+            notas, acertos, discriminacao = corrigir_matriz(matriz, largura, gabarito)
+        else:
+            notas, acertos, discriminacao = [], [0] * len(gabarito), [0.0] * len(gabarito)
+
+        nota_maxima = sum(peso for _, _, peso in gabarito)
+        media = sum(notas) / len(notas) if notas else 0.0
+        desvio = math.sqrt(sum((nota - media) ** 2 for nota in notas) / len(notas)) if notas else 0.0
+        return {
+            'total_envios': len(envios),
+            'nota_maxima': nota_maxima,
+            'media': round(media, 2),
+            'desvio_padrao': round(desvio, 2),
+            'calculo': 'numpy' if carregar_numpy() is not None else 'python',
+            'tempo_ms': round((time.perf_counter() - inicio) * 1000, 2),
+            'questoes': [
+                {
+                    'questao': indice + 1,
+                    'pergunta': perguntas.get_question_text(indice),
+                    'peso': peso,
+                    # Fração da turma que acertou (quanto menor, mais difícil)
+                    'dificuldade': round(acertos[j] / len(envios), 3) if envios else 0.0,
+                    'discriminacao': round(discriminacao[j], 3),
+                }
+                for j, (indice, corretas, peso) in enumerate(gabarito)
+            ],
+            'participantes': [
+                {
+                    'nome': nome,
+                    'data_hora': data_hora,
+                    'nota': round(nota, 2),
+                    'percentual': round(100 * nota / nota_maxima, 1) if nota_maxima else 0.0,
+                }
+                for (nome, data_hora), nota in zip(envios, notas)
+            ],
+        }
+
+def formatar_resposta_txt(registro, perguntas):
+    """Formata uma resposta no layout do respostas.txt (bytes em UTF-8)"""
+    respostas = registro['respostas']
+    partes = [SEPARADOR_TXT, b'DATA/HORA: ', registro['data_hora'].encode('utf-8'),
+              b'\nNOME: ', registro['nome'].encode('utf-8'),
+              b'\nTOTAL DE RESPOSTAS: ', b'%d' % len(respostas), perguntas.rodape_total]
+    compiladas = perguntas.compiladas
+    for i, resposta in enumerate(respostas):
+        questao = compiladas[i] if i < len(compiladas) else QUESTAO_SEM_TEXTO
+        partes.append(questao.cabecalho)
+        if questao.alternativas is None:
+            partes.append(resposta.encode('utf-8'))
+            partes.append(b'\n\n')
+        else:
+            partes.append(questao.alternativa(resposta))
+    return b''.join(partes)
+
+FORMATOS_EXPORTACAO = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+PARTE_EXPORTACAO = 64 * 1024  # Bytes acumulados antes de enviar cada parte da exportação
+
+def interpretar_periodo(desde=None, ate=None):
+    """Converte desde/ate (AAAA-MM-DD ou AAAA-MM-DD HH:MM:SS) em (inicio, fim) para buscar_por_periodo
+
+    Uma data sem horário em ate inclui o dia inteiro. Levanta ValueError
+    se alguma das datas for inválida.
+    """
+    periodo = []
+    for texto, fim_do_dia in ((desde, False), (ate, True)):
+        if not texto:
+            periodo.append(None)
+            continue
+        texto = texto.strip().replace('T', ' ')
+        if len(texto) == 10:
+            data = datetime.strptime(texto, '%Y-%m-%d')
+            if fim_do_dia:
+                data = data.replace(hour=23, minute=59, second=59)
+        else:
+            data = datetime.strptime(texto, '%Y-%m-%d %H:%M:%S')
+        periodo.append(data)
+    return tuple(periodo)
+
+class _ColunasExportacao:
+    """Uma coluna por questão, com as alternativas já prontas para decodificar os índices"""
+    __slots__ = ('titulos', 'alternativas')
+
+    def __init__(self, perguntas):
+        total = perguntas.get_total_questions()
+        self.titulos = ['DATA/HORA', 'NOME'] + [perguntas.get_question_text(i) for i in range(total)]
+        self.alternativas = [
+            {str(j): alternativa for j, alternativa in enumerate(perguntas.get_alternativas(i))}
+            if perguntas.get_question_type(i) == 'multipla_escolha' else None
+            for i in range(total)
+        ]
+
+    def valores(self, registro):
+        """data/hora, nome e o texto de cada resposta (alternativas decodificadas)"""
+        valores = [registro['data_hora'], registro['nome']]
+        respostas = registro['respostas']
+        for i, alternativas in enumerate(self.alternativas):
+            resposta = respostas[i] if i < len(respostas) else ''
+            if alternativas is not None and resposta != '':
+                texto = alternativas.get(resposta)
+                if texto is None:
+                    try:
+                        texto = alternativas.get(str(int(resposta)))
+                    except ValueError:
+                        pass
+                resposta = texto if texto is not None else f"[Alternativa inválida: {resposta}]"
+            valores.append(resposta)
+        return valores
+
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+def celula_csv(valor):
+    """Texto digitado pelo participante que o Excel leria como fórmula ganha um apóstrofo na frente"""
+    return "'" + valor if valor.startswith(INICIO_FORMULA) else valor
+
+def exportar_csv(registros, perguntas):
+    """Gera as respostas em CSV, em partes de PARTE_EXPORTACAO bytes
+
+    Separado por ponto e vírgula e com BOM, para abrir direto no Excel em
+    português. Só uma parte fica em memória, qualquer que seja o total.
+    Células que começam como fórmula são escapadas (celula_csv).
+    """
+    colunas = _ColunasExportacao(perguntas)
+    buffer = io.StringIO()
+    buffer.write('\ufeff')
+    escritor = csv.writer(buffer, delimiter=';', lineterminator='\r\n')
+    escritor.writerow(colunas.titulos)
+    for registro in registros:
+        escritor.writerow([celula_csv(valor) for valor in colunas.valores(registro)])
+        if buffer.tell() >= PARTE_EXPORTACAO:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def exportar_jsonl(registros, perguntas):
+    """Gera as respostas em JSON Lines (um objeto por envio), em partes de PARTE_EXPORTACAO bytes"""
+    colunas = _ColunasExportacao(perguntas)
+    linhas, tamanho = [], 0
+    for registro in registros:
+        linha = json.dumps(dict(zip(colunas.titulos, colunas.valores(registro))), ensure_ascii=False) + '\n'
+        linhas.append(linha)
+        tamanho += len(linha)
+        if tamanho >= PARTE_EXPORTACAO:
+            yield ''.join(linhas).encode('utf-8')
+            linhas, tamanho = [], 0
+    if linhas:
+        yield ''.join(linhas).encode('utf-8')
+
+# Larguras dos caracteres 32-126 nas fontes padrão do PDF (milésimos do tamanho da fonte)
+LARGURAS_HELVETICA = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)
+LARGURAS_HELVETICA_NEGRITO = (
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+)
+
+class ModeloComprovante:
+    """Gera o comprovante de participação em PDF, no layout do antigo botão em jsPDF
+
+    Usa apenas as fontes padrão do PDF (Helvetica), sem bibliotecas externas.
+    Tudo o que não depende do participante (cabeçalho com a cor da
+    instituição, textos fixos, rodapé e os objetos do PDF) é montado uma
+    única vez no construtor; cada comprovante só acrescenta o nome, a data
+    e o horário.
+    """
+
+    LARGURA, ALTURA = 210, 297  # A4 em milímetros
+    PONTOS_POR_MM = 72 / 25.4
+
+    def __init__(self, instituicao, cargo, cor_rgb):
+        cor = ' '.join(f'{c / 255:.3f}' for c in cor_rgb)
+        fixo = [
+            # Cabeçalho com cor configurável
+            f'{cor} rg',
+            f'0 {self._y(35)} {self._pt(self.LARGURA)} {self._pt(35)} re f',
+            '1 1 1 rg',
+            self._texto(instituicao, 20, 26, negrito=True),
+            self._texto('Comprovante de Avaliação', 28, 12),
+            # Corpo
+            '0 0 0 rg',
+            self._texto('COMPROVANTE DE PARTICIPAÇÃO', 55, 14),
+            self._texto('Certificamos que', 75, 11),
+            self._texto('concluiu e enviou as respostas da', 105, 11),
+            self._texto('Avaliação de Treinamento Técnico', 113, 11),
+            self._texto(cargo, 121, 11),
+            # Rodapé
+            '0.392 0.392 0.392 rg',
+            self._texto('As respostas estão sendo analisadas.', 170, 9),
+            self._texto('Este documento é apenas um comprovante de participação.', 176, 9),
+            f'{cor} RG 0.567 w',
+            f'{self._pt(20)} {self._y(190)} m {self._pt(190)} {self._y(190)} l S',
+            self._texto(f'{instituicao} - Sistema de Avaliação de Treinamento', 195, 8),
+        ]
+        self._conteudo_fixo = '\n'.join(fixo).encode('cp1252', 'replace') + b'\n'
+
+        objetos = [
+            b'<< /Type /Catalog /Pages 2 0 R >>',
+            b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+            (f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self._pt(self.LARGURA)} {self._pt(self.ALTURA)}] '
+             f'/Resources << /Font << /F1 4 0 R /F2 5 0 R >> >> /Contents 6 0 R >>').encode('ascii'),
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+        ]
+        inicio = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+        self._posicoes = []
+        for numero, objeto in enumerate(objetos, 1):
+            self._posicoes.append(len(inicio))
+            inicio += b'%d 0 obj\n' % numero + objeto + b'\nendobj\n'
+        self._inicio = inicio
+
+    @classmethod
+    def de_config(cls, config):
+        return cls(config.get_instituicao(), config.get_cargo(), config.get_cor_rgb())
+
+    @classmethod
+    def _pt(cls, mm):
+        return f'{mm * cls.PONTOS_POR_MM:.2f}'
+
+    @classmethod
+    def _y(cls, mm):
+        # O PDF mede a altura a partir da base da página; o jsPDF, do topo
+        return cls._pt(cls.ALTURA - mm)
+
+    @staticmethod
+    def largura_texto(texto, tamanho, negrito=False):
+        """Largura do texto em pontos"""
+        larguras = LARGURAS_HELVETICA_NEGRITO if negrito else LARGURAS_HELVETICA
+        total = 0
+        for caractere in texto:
+            # Letras acentuadas têm a mesma largura da letra sem acento
+            codigo = ord(unicodedata.normalize('NFD', caractere)[0])
+            total += larguras[codigo - 32] if 32 <= codigo <= 126 else 556
+        return total * tamanho / 1000
+
+    @classmethod
+    def _texto(cls, texto, y, tamanho, negrito=False):
+        """Texto centralizado na página, na altura y (mm a partir do topo)"""
+        x = (cls.LARGURA * cls.PONTOS_POR_MM - cls.largura_texto(texto, tamanho, negrito)) / 2
+        escapado = texto.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+        fonte = 'F2' if negrito else 'F1'
+        return f'BT /{fonte} {tamanho} Tf {x:.2f} {cls._y(y)} Td ({escapado}) Tj ET'
+
+    def gerar(self, nome, data_hora):
+        """PDF (bytes) do comprovante de nome, enviado em data_hora (datetime)"""
+        variavel = '\n'.join([
+            '0 0 0 rg',
+            self._texto(nome, 90, 16, negrito=True),
+            '0.392 0.392 0.392 rg',
+            self._texto(f"Data: {data_hora.strftime('%d/%m/%Y')}", 145, 10),
+            self._texto(f"Horário: {data_hora.strftime('%H:%M:%S')}", 152, 10),
+        ]).encode('cp1252', 'replace')
+        conteudo = self._conteudo_fixo + variavel
+
+        partes = [self._inicio, b'6 0 obj\n<< /Length %d >>\nstream\n' % len(conteudo),
+                  conteudo, b'\nendstream\nendobj\n']
+        posicao_xref = sum(len(parte) for parte in partes)
+        xref = [b'xref\n0 7\n0000000000 65535 f \n']
+        xref += [b'%010d 00000 n \n' % posicao for posicao in self._posicoes + [len(self._inicio)]]
+        partes += xref
+        partes.append(b'trailer\n<< /Size 7 /Root 1 0 R >>\nstartxref\n%d\n%%EOF\n' % posicao_xref)
+        return b''.join(partes)
+
+def nome_arquivo_comprovante(nome, data_hora=None, numero=None):
+    """Nome de arquivo do comprovante, só com letras sem acento, números e _
+
+    numero (a ordem do envio) distingue dois envios com o mesmo nome no mesmo segundo.
+    """
+    sem_acento = unicodedata.normalize('NFKD', nome).encode('ascii', 'ignore').decode('ascii')
+    base = re.sub(r'[^A-Za-z0-9]+', '_', sem_acento).strip('_') or 'participante'
+    if data_hora:
+        base += data_hora.strftime('_%Y%m%d_%H%M%S')
+    if numero is not None:
+        base += f'_{numero:06d}'
+    return f'Comprovante_{base}.pdf'
+
+def salvar_resposta(data, exame_id=EXAME_PADRAO):
+    """Salva a resposta no armazenamento do exame"""
+    registro = {
+        'data_hora': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'nome': data['nome'],
+        'respostas': data['respostas'],
+    }
+    inicio = time.perf_counter()
+    dados = registro_exames.dados(exame_id)
+    dados.armazenamento.salvar(registro)
+    dados.estatisticas.registrar(registro)
+    dados.correcao.registrar(registro)
+    dados.copias.registrar(dados.busca.registrar(registro))
+    metricas.registrar_salvar('total', time.perf_counter() - inicio)
+
+    if exame_id:
+        print(f"✅ Nova resposta salva: {data['nome']} (exame {exame_id})")
+    else:
+        print(f"✅ Nova resposta salva: {data['nome']}")
+    return registro
+
+def get_formulario_html(config, perguntas, base=''):
+    """Gera o HTML do formulário dinamicamente com base nas perguntas carregadas"""
+    
+    # Obtém configurações
+    instituicao = config.get_instituicao()
+    cor = config.get_cor()
+    cor_rgb = config.get_cor_rgb()
+    cargo = config.get_cargo()
+    
+    # Dados usados por static/formulario.js ("</" escapado para não fechar o <script>)
+    avaliacao = json.dumps({
+        'totalQuestoes': perguntas.get_total_questions(),
+        'tiposQuestoes': [perguntas.get_question_type(i) for i in range(perguntas.get_total_questions())],
+        'base': base,
+        'instituicao': instituicao,
+        'cargo': cargo,
+        'corRgb': list(cor_rgb),
+    }, ensure_ascii=False).replace('</', '<\\/')
+    
+    # Gera o HTML das questões
+    questions_html = ""
+    for i in range(perguntas.get_total_questions()):
+        tipo = perguntas.get_question_type(i)
+        texto = perguntas.get_question_text(i)
+        
+        if tipo == 'multipla_escolha':
+            # Questão de múltipla escolha
+            alternativas = perguntas.get_alternativas(i)
+            questions_html += f'''
+      <div class="question">
+        <div class="question-title">{texto}</div>
+'''
+            for j, alt in enumerate(alternativas):
+                letra = alt[0].lower()
+                questions_html += f'''
+        <div class="radio-option">
+          <input type="radio" name="q{i}" value="{j}" id="q{i}{letra}">
+          <label for="q{i}{letra}">{alt}</label>
+        </div>
+'''
+            questions_html += '      </div>\n'
+        else:
+            # Questão aberta
+            questions_html += f'''
+      <div class="question">
+        <div class="question-title">{texto}</div>
+        <textarea id="q{i}" class="form-input" maxlength="{config.get_limite_resposta()}" placeholder="Digite sua resposta..."></textarea>
+      </div>
+'''
+    
+    # Template HTML completo
+    return f'''<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+  <meta charset="UTF-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1.0">
+  <title>BigCard - Avaliação de Treinamento</title>
+  <style>:root {{ --cor: {cor}; --cor-rgb: {cor_rgb[0]}, {cor_rgb[1]}, {cor_rgb[2]}; }}</style>
+  <link rel="stylesheet" href="{arquivos_estaticos.url('formulario.css')}">
+</head>
+<body>
+  <div class="header">
+    <div class="logo">{instituicao}</div>
+    <div class="subtitle">Avaliação de Treinamento Técnico</div>
+  </div>
+
+  <div class="container">
+    <!-- Formulário Inicial -->
+    <div id="formSection" class="card">
+      <h2 style="font-size: 24px; color: #2c3e50; margin-bottom: 20px;">Identificação</h2>
+      <label class="form-label">Nome Completo</label>
+      <input type="text" id="nome" class="form-input" placeholder="Digite seu nome completo">
+      <button onclick="iniciarAvaliacao()" class="btn btn-primary" style="margin-top: 20px;">
+        Iniciar Avaliação
+      </button>
+    </div>
+
+    <!-- Questionário -->
+    <div id="quizSection" class="hidden">
+      <div class="card destaque">
+        <p>
+          📝 Responda todas as {perguntas.get_total_questions()} questões abaixo
+        </p>
+      </div>
+
+{questions_html}
+
+      <div class="card">
+        <button id="btnEnviar" onclick="enviarRespostas()" class="btn btn-success">
+          Enviar Respostas
+        </button>
+      </div>
+    </div>
+
+    <!-- Resultado -->
+    <div id="resultSection" class="hidden">
+      <div class="card result-container">
+        <div class="result-icon">
+          <svg fill="none" stroke="currentColor" viewBox="0 0 24 24">
+            <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M5 13l4 4L19 7"/>
+          </svg>
+        </div>
+        <div class="result-title">Avaliação Enviada com Sucesso!</div>
+        <div class="result-subtitle">Suas respostas foram registradas e serão analisadas.</div>
+        <button onclick="baixarComprovante()" class="btn btn-primary">
+          📄 Baixar Comprovante em PDF
+        </button>
+      </div>
+    </div>
+
+  </div>
+
+  <script>const AVALIACAO = {avaliacao};</script>
+  <script src="{arquivos_estaticos.url('formulario.js')}"></script>
+</body>
+</html>'''
+
+def _interface_rota_padrao():
+    """Interface da rota padrão do Linux (/proc/net/route) ou None
+
+    É a interface por onde a máquina chega às outras redes, normalmente a
+    placa ligada à rede da empresa (e não docker0 ou uma VPN).
+    """
+    try:
+        with open('/proc/net/route', encoding='ascii') as f:
+            rotas = [linha.split() for linha in f.readlines()[1:]]
+    except OSError:
+        return None
+    # Destino 0.0.0.0 com a rota ativa (RTF_UP); a de menor métrica é a usada
+    padrao = [(int(rota[6]), rota[0]) for rota in rotas
+              if len(rota) > 6 and rota[1] == '00000000' and int(rota[3], 16) & 1]
+    return min(padrao)[1] if padrao else None
+
+def enderecos_locais():
+    """Endereços IPv4 desta máquina (sem o 127.0.0.1), sem enviar nada pela rede
+
+    No Linux cada interface de rede é consultada direto no sistema e o
+    endereço da interface da rota padrão vem primeiro (as demais, como
+    docker0 ou VPNs, ficam como alternativas); nos outros sistemas os
+    endereços vêm do nome da máquina. Sem nenhuma rede, retorna só 127.0.0.1.
+    """
+    enderecos = []
+    if fcntl is not None and sys.platform.startswith('linux'):
+        principal = _interface_rota_padrao()
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            for _, interface in socket.if_nameindex():
+                try:
+                    dados = fcntl.ioctl(s.fileno(), SIOCGIFADDR, struct.pack('256s', interface[:15].encode()))
+                except OSError:
+                    continue  # Interface sem IPv4 (ou desligada)
+                endereco = socket.inet_ntoa(dados[20:24])
+                if interface == principal:
+                    enderecos.insert(0, endereco)
+                else:
+                    enderecos.append(endereco)
+    if not enderecos:
+        try:
+            enderecos = [info[4][0] for info in socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET)]
+        except OSError:
+            pass
+    enderecos = [endereco for endereco in dict.fromkeys(enderecos) if not endereco.startswith('127.')]
+    return enderecos or ['127.0.0.1']
+
+def _data_argumento(texto):
+    """Data AAAA-MM-DD (ou AAAA-MM-DD HH:MM:SS) da linha de comando"""
+    try:
+        interpretar_periodo(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'data inválida: {texto} (use AAAA-MM-DD)')
+    return texto
+
+def main():
+    parser = argparse.ArgumentParser(description='BigCard Training - Sistema de Avaliação')
+    parser.add_argument('--motor', choices=MOTORES,
+                        help='motor do servidor (padrão: valor de MOTOR em config.txt)')
+    parser.add_argument('--exportar-txt', metavar='ARQUIVO',
+                        help=f'gera ARQUIVO no formato do {DATA_FILE} a partir do armazenamento configurado e sai')
+    parser.add_argument('--exame', default=EXAME_PADRAO, metavar='ID',
+                        help=f'exame (subpasta de {EXAMS_DIR}/) usado por --exportar-txt')
+    parser.add_argument('--desde', metavar='AAAA-MM-DD', type=_data_argumento,
+                        help='exporta só as respostas a partir desse dia')
+    parser.add_argument('--ate', metavar='AAAA-MM-DD', type=_data_argumento,
+                        help='exporta só as respostas até esse dia (inclusive)')
+    parser.add_argument('--porta', type=int, default=PORT,
+                        help=f'porta do servidor (padrão: {PORT})')
+    parser.add_argument('--processos', type=int, metavar='N',
+                        help='processos atendendo na porta (padrão: valor de PROCESSOS em config.txt)')
+    args = parser.parse_args()
+    porta = args.porta
+    
+    criar_aplicacao()
+    print(f"✅ Configurações carregadas:")
+    print(f"   • Instituição: {config_loader.get_instituicao()}")
+    print(f"   • Cor: {config_loader.get_cor()} (RGB: {config_loader.get_cor_rgb()})")
+    print(f"   • Cargo: {config_loader.get_cargo()}")
+    try:
+        perguntas = registro_exames.obter(EXAME_PADRAO).perguntas
+        print(f"✅ {perguntas.get_total_questions()} perguntas carregadas de {QUESTIONS_FILE}")
+    except Exception as e:
+        print(f"❌ ERRO ao carregar perguntas: {e}")
+        print(f"   Certifique-se que o arquivo '{QUESTIONS_FILE}' existe no mesmo diretório.")
+        sys.exit(1)
+    
+    if args.exportar_txt:
+        periodo = args.desde is not None or args.ate is not None
+        if config_loader.get_armazenamento() == 'texto' and config_loader.get_rotacao() == 'nenhuma' and not periodo:
+            print(f"⚠️  As respostas já estão em texto: {DATA_FILE}")
+            return
+        exame = registro_exames.obter(args.exame)
+        if exame is None:
+            print(f"❌ Exame não encontrado: {args.exame}")
+            return
+        pasta = registro_exames.pasta(exame.id)
+        destino = os.path.realpath(args.exportar_txt)
+        if destino in {os.path.realpath(os.path.join(pasta_dados, nome))
+                       for pasta_dados in (pasta, registro_exames.raiz)
+                       for nome in (DATA_FILE, RECORDS_FILE, INDEX_FILE, DATABASE_FILE)}:
+            # Apagaria as respostas gravadas, ou seria lido de novo como segmento na próxima inicialização
+            print(f"❌ {args.exportar_txt} é um arquivo de respostas do servidor; "
+                  f"escolha outro nome (ex: {EXPORT_FILE})")
+            return
+        # Só leitura: pode ser usado com o servidor gravando respostas ao mesmo tempo
+        registros = ler_respostas_salvas(config_loader, pasta, lambda: exame.perguntas,
+                                         *interpretar_periodo(args.desde, args.ate))
+        total = 0
+        with open(args.exportar_txt, 'wb') as f:
+            for registro in registros:
+                f.write(formatar_resposta_txt(registro, exame.perguntas))
+                total += 1
+        print(f"✅ {total} respostas exportadas para {args.exportar_txt}")
+        return
+    
+    enderecos = enderecos_locais()
+    local_ip = enderecos[0]
+    
+    # Abre o exame padrão já na inicialização (contabiliza as respostas existentes)
+    inicio = time.perf_counter()
+    dados = registro_exames.dados(EXAME_PADRAO)
+    print(f"📊 {dados.estatisticas.total} respostas contabilizadas em {time.perf_counter() - inicio:.2f}s")
+    
+    workers = config_loader.get_workers()
+    motor = args.motor or config_loader.get_motor()
+    processos = max(args.processos or config_loader.get_processos(), 1)
+    if processos > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+        print('⚠️  Este sistema não permite vários processos na mesma porta (SO_REUSEPORT); usando 1 processo')
+        processos = 1
+    if processos > 1:
+        server = ServidorPrefork(('0.0.0.0', porta), motor, workers, processos)
+    else:
+        server = criar_servidor(motor, ('0.0.0.0', porta), workers)
     
     print('\n' + '='*70)
     print('🚀 BIGCARD TRAINING - SERVIDOR PYTHON')
     print('='*70)
-    print(f'📱 FUNCIONÁRIO acessa: http://{local_ip}:{PORT}')
-    print(f'💾 Respostas salvas em: {DATA_FILE}')
+    print(f'📱 FUNCIONÁRIO acessa: http://{local_ip}:{porta}')
+    for outro in enderecos[1:]:
+        print(f'   (ou, em outra rede: http://{outro}:{porta})')
+    print(f'💾 Respostas salvas em: {dados.armazenamento.caminho} (durabilidade: {config_loader.get_durabilidade()})')
     print(f'📝 Perguntas carregadas de: {QUESTIONS_FILE}')
-    print(f'📂 Para ver respostas: abra o arquivo {DATA_FILE} no Bloco de Notas')
+    print(f'📚 Outros exames: http://{local_ip}:{porta}/exame/<pasta em {EXAMS_DIR}/>')
+    if processos > 1:
+        print(f'⚙️  Motor: {motor} ({processos} processos com {workers} workers cada; gravação no processo principal)')
+    else:
+        print(f'⚙️  Motor: {motor} ({workers} workers)')
+    if isinstance(dados.armazenamento, ArmazenamentoTexto) and dados.armazenamento.segmentos is None:
+        print(f'📂 Para ver respostas: abra o arquivo {DATA_FILE} no Bloco de Notas')
+    elif isinstance(dados.armazenamento, ArmazenamentoTexto):
+        print(f'📂 Para ver respostas: abra os arquivos .txt em {SEGMENTS_DIR}/ no Bloco de Notas '
+              f'ou python server.py --exportar-txt {EXPORT_FILE} --desde AAAA-MM-DD')
+    else:
+        print(f'📂 Para ver respostas: python server.py --exportar-txt {EXPORT_FILE}')
     print('='*70)
     print('✅ Servidor rodando! Pressione CTRL+C para parar')
     print('='*70 + '\n')
@@ -705,7 +4484,10 @@ def main():
         server.serve_forever()
     except KeyboardInterrupt:
         print('\n\n⏹️  Servidor parado!')
-        server.shutdown()
+    finally:
+        server.server_close()
+        registro_exames.encerrar()
+        print('💾 Respostas pendentes gravadas.')
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,224 @@
+// Configuração do exame (definida na página por get_formulario_html)
+const TOTAL_QUESTIONS = AVALIACAO.totalQuestoes;
+const QUESTION_TYPES = AVALIACAO.tiposQuestoes;
+let userData = {};
+
+function iniciarAvaliacao() {
+  const nome = document.getElementById('nome').value.trim();
+
+  if (!nome) {
+    alert('⚠️ Por favor, preencha seu nome completo!');
+    return;
+  }
+
+  // Identificador da avaliação: reenviar (ex: depois de uma queda do Wi-Fi)
+  // não grava as respostas duas vezes
+  userData = { nome, idEnvio: gerarIdEnvio() };
+  guardarSessao();
+  mostrarQuestionario();
+}
+
+function mostrarQuestionario() {
+  document.getElementById('formSection').classList.add('hidden');
+  document.getElementById('quizSection').classList.remove('hidden');
+  window.scrollTo(0, 0);
+}
+
+function gerarIdEnvio() {
+  // crypto.randomUUID() só existe em HTTPS; getRandomValues funciona também em HTTP
+  const bytes = crypto.getRandomValues(new Uint8Array(16));
+  return Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function enviarRespostas() {
+  const respostas = [];
+
+  for (let i = 0; i < TOTAL_QUESTIONS; i++) {
+    if (QUESTION_TYPES[i] === 'multipla_escolha') {
+      const radio = document.querySelector(`input[name="q${i}"]:checked`);
+      if (!radio) {
+        alert(`⚠️ Por favor, responda a questão ${i + 1}!`);
+        window.scrollTo(0, document.querySelector(`.question:nth-child(${i + 2})`).offsetTop - 100);
+        return;
+      }
+      respostas.push(radio.value);
+    } else {
+      const resposta = document.getElementById(`q${i}`).value.trim();
+      if (!resposta || resposta.length < 10) {
+        alert(`⚠️ Por favor, responda completamente a questão ${i + 1}!`);
+        window.scrollTo(0, document.getElementById(`q${i}`).offsetTop - 100);
+        return;
+      }
+      respostas.push(resposta);
+    }
+  }
+
+  const botao = document.getElementById('btnEnviar');
+  const textoBotao = botao.textContent;
+  botao.disabled = true;
+
+  try {
+    const response = await enviarComRetentativas(JSON.stringify({
+      nome: userData.nome,
+      respostas: respostas,
+      id_envio: userData.idEnvio
+    }), botao);
+
+    if (response.ok) {
+      userData.dataHora = (await response.json()).data_hora;
+      clearTimeout(temporizadorRascunho);
+      esquecerSessao();
+      mostrarResultado();
+    } else if (response.status === 400) {
+      const { erro } = await response.json();
+      alert(`❌ Envio recusado: ${erro}`);
+    } else if (response.status === 413) {
+      alert('❌ As respostas são longas demais. Resuma e tente novamente!');
+    } else if (response.status === 503) {
+      alert('⏳ O servidor continua ocupado. Aguarde um pouco e clique em Enviar de novo!');
+    } else {
+      alert('❌ Erro ao enviar. Tente novamente!');
+    }
+  } catch (error) {
+    alert('❌ Erro de conexão. Verifique se o servidor está rodando!');
+    console.error(error);
+  } finally {
+    botao.disabled = false;
+    botao.textContent = textoBotao;
+  }
+}
+
+// Servidor ocupado (503) ou conexão perdida: espera e tenta de novo, cada
+// vez esperando mais (o id_envio garante que nada é gravado duas vezes)
+const MAX_TENTATIVAS = 8;
+const ESPERA_MAXIMA = 30;
+
+async function enviarComRetentativas(corpo, botao) {
+  for (let tentativa = 1; ; tentativa++) {
+    let response = null;
+    try {
+      response = await fetch(`${AVALIACAO.base}/enviar`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: corpo
+      });
+    } catch (error) {
+      if (tentativa >= MAX_TENTATIVAS) throw error;
+    }
+    if (response && (response.status !== 503 || tentativa >= MAX_TENTATIVAS)) {
+      return response;
+    }
+
+    const base = Number(response && response.headers.get('Retry-After')) || 1;
+    // Espera aleatória para que todos os tablets não voltem no mesmo instante
+    const espera = Math.min(ESPERA_MAXIMA, base * 2 ** (tentativa - 1)) * (0.5 + Math.random());
+    for (let restante = Math.ceil(espera); restante > 0; restante--) {
+      botao.textContent = `⏳ Servidor ocupado, tentando de novo em ${restante}s...`;
+      await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+    botao.textContent = '⏳ Enviando...';
+  }
+}
+
+function mostrarResultado() {
+  document.getElementById('quizSection').classList.add('hidden');
+  document.getElementById('resultSection').classList.remove('hidden');
+  window.scrollTo(0, 0);
+}
+
+function baixarComprovante() {
+  // O PDF é gerado pelo servidor (mais rápido que gerar no navegador dos tablets)
+  const params = new URLSearchParams({ nome: userData.nome, data_hora: userData.dataHora });
+  window.location.href = `${AVALIACAO.base}/comprovante?${params}`;
+}
+
+// Rascunho no servidor: se o navegador recarregar a página no meio da
+// avaliação, as respostas voltam. No navegador fica só o identificador
+const CHAVE_SESSAO = `avaliacao:${AVALIACAO.base || '/'}`;
+const ESPERA_RASCUNHO = 2000;  // ms sem digitar antes de enviar o rascunho
+const LIMITE_KEEPALIVE = 60000;  // Bytes aceitos pelo navegador com keepalive
+let temporizadorRascunho = null;
+
+function guardarSessao() {
+  try {
+    localStorage.setItem(CHAVE_SESSAO, JSON.stringify({ nome: userData.nome, idEnvio: userData.idEnvio }));
+  } catch (error) {
+    // Navegação privada ou armazenamento cheio: segue sem recuperação
+  }
+}
+
+function esquecerSessao() {
+  try {
+    localStorage.removeItem(CHAVE_SESSAO);
+  } catch (error) {}
+}
+
+function respostasAtuais() {
+  const respostas = [];
+  for (let i = 0; i < TOTAL_QUESTIONS; i++) {
+    if (QUESTION_TYPES[i] === 'multipla_escolha') {
+      const radio = document.querySelector(`input[name="q${i}"]:checked`);
+      respostas.push(radio ? radio.value : '');
+    } else {
+      respostas.push(document.getElementById(`q${i}`).value);
+    }
+  }
+  return respostas;
+}
+
+function agendarRascunho() {
+  // Cada tecla reinicia a espera: só vai um rascunho quando a pessoa para de digitar
+  clearTimeout(temporizadorRascunho);
+  temporizadorRascunho = setTimeout(salvarRascunho, ESPERA_RASCUNHO);
+}
+
+function salvarRascunho(saindo = false) {
+  clearTimeout(temporizadorRascunho);
+  temporizadorRascunho = null;
+  if (!userData.idEnvio || userData.dataHora) return;
+  const corpo = JSON.stringify({ id_envio: userData.idEnvio, nome: userData.nome, respostas: respostasAtuais() });
+  fetch(`${AVALIACAO.base}/rascunho`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: corpo,
+    // keepalive: o envio continua mesmo com a página sendo fechada
+    keepalive: saindo && corpo.length < LIMITE_KEEPALIVE
+  }).catch(() => {});  // Sem conexão: o próximo rascunho leva tudo de novo
+}
+
+async function recuperarRascunho() {
+  let sessao = null;
+  try {
+    sessao = JSON.parse(localStorage.getItem(CHAVE_SESSAO));
+  } catch (error) {}
+  if (!sessao || !sessao.idEnvio) return;
+
+  let rascunho;
+  try {
+    const response = await fetch(`${AVALIACAO.base}/rascunho?id=${encodeURIComponent(sessao.idEnvio)}`);
+    if (response.status === 404) esquecerSessao();
+    if (!response.ok) return;
+    rascunho = await response.json();
+  } catch (error) {
+    return;
+  }
+
+  rascunho.respostas.slice(0, TOTAL_QUESTIONS).forEach((resposta, i) => {
+    if (QUESTION_TYPES[i] === 'multipla_escolha') {
+      const radio = document.querySelector(`input[name="q${i}"][value="${resposta}"]`);
+      if (radio) radio.checked = true;
+    } else {
+      document.getElementById(`q${i}`).value = resposta;
+    }
+  });
+  userData = { nome: sessao.nome, idEnvio: sessao.idEnvio };
+  document.getElementById('nome').value = sessao.nome;
+  mostrarQuestionario();
+}
+
+document.getElementById('quizSection').addEventListener('input', agendarRascunho);
+document.getElementById('quizSection').addEventListener('change', agendarRascunho);
+document.addEventListener('visibilitychange', () => {
+  if (document.visibilityState === 'hidden' && temporizadorRascunho) salvarRascunho(true);
+});
+recuperarRascunho();